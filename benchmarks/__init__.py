@@ -0,0 +1,5 @@
+"""
+    Benchmark del pacchetto itacovid.
+    Gli script vanno eseguiti dalla cartella principale del progetto come moduli, ad esempio:
+        python -m benchmarks.bench_analyze
+"""
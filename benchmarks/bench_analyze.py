@@ -0,0 +1,52 @@
+"""
+    Confronto tra l'implementazione originale di Analyzer.analyze (una maschera booleana per ogni regione e per ogni
+    statistica) e il motore a raggruppamento unico, al variare del numero di righe e del numero di gruppi.
+    Esecuzione:
+        python -m benchmarks.bench_analyze
+"""
+import argparse
+import timeit
+
+from itacovid.analyzer import Analyzer
+from benchmarks.synthetic import make_analysis_frame
+
+
+def legacy_analyze(df):
+    """
+        Implementazione originale di Analyzer.analyze, mantenuta solo come termine di paragone.
+    """
+    period = str(df['data'].max().date().strftime("%d/%m/%Y") + " - " + df['data'].min().date().strftime("%d/%m/%Y"))
+    regions = df['denominazione_regione'].unique()
+    column_list = list(df.columns[2:-1])
+
+    dict_with_results = {r: {'valori massimi': dict(df.loc[df.denominazione_regione == r, column_list].max()),
+                             'valori minimi': dict(df.loc[df.denominazione_regione == r, column_list].min()),
+                             'valori medi': dict(df.loc[df.denominazione_regione == r, column_list].mean()),
+                             'deviazione standard': dict(df.loc[df.denominazione_regione == r, column_list].std())} for r in regions}
+    dict_with_results['periodo'] = period
+    return dict_with_results
+
+
+def best_of(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--regions', type=int, nargs='+', default=[21, 107, 500])
+    parser.add_argument('--days', type=int, nargs='+', default=[120, 500, 1000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    analyzer = Analyzer()
+    print(f"{'gruppi':>8} {'giorni':>8} {'righe':>10} {'originale [s]':>14} {'groupby [s]':>12} {'speedup':>8}")
+    for n_regions in args.regions:
+        for n_days in args.days:
+            df = make_analysis_frame(n_regions=n_regions, n_days=n_days)
+            legacy = best_of(lambda: legacy_analyze(df), args.repeat)
+            grouped = best_of(lambda: analyzer.analyze(df, use_cache=False), args.repeat)
+            print(f'{n_regions:>8} {n_days:>8} {len(df):>10} {legacy:>14.4f} {grouped:>12.4f} {legacy / grouped:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
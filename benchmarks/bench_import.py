@@ -0,0 +1,56 @@
+"""
+    Tempo di avvio: per ogni scenario viene avviato un nuovo interprete Python che importa il pacchetto e accede a uno dei
+    nomi pubblici, misurando il tempo dell'import e quali dipendenze pesanti (pandas, matplotlib, ...) sono state caricate.
+    Esecuzione:
+        python -m benchmarks.bench_import
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SCENARIOS = [('import itacovid', ''),
+             ('itacovid.read_covid_dataset', 'itacovid.read_covid_dataset'),
+             ('itacovid.Analyzer', 'itacovid.Analyzer'),
+             ('itacovid.subset_by_region', 'itacovid.subset_by_region'),
+             ('itacovid.Graphics', 'itacovid.Graphics')]
+
+HEAVY_MODULES = ['numpy', 'pandas', 'matplotlib', 'matplotlib.pyplot', 'multiprocessing.shared_memory', 'sqlite3']
+
+_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import itacovid
+{access}
+seconds = time.perf_counter() - started
+print(json.dumps({{'seconds': seconds, 'modules': [m for m in {modules!r} if m in sys.modules]}}))
+'''
+
+
+def measure(access, repeat):
+    """
+        Restituisce il tempo migliore su repeat interpreti e le dipendenze pesanti caricate.
+    """
+    script = _SCRIPT.format(access=access, modules=HEAVY_MODULES)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True, cwd=root)
+        results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    return min(result['seconds'] for result in results), results[0]['modules']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'scenario':<32} {'tempo [s]':>10}  moduli caricati")
+    for name, access in SCENARIOS:
+        seconds, modules = measure(access, args.repeat)
+        print(f"{name:<32} {seconds:>10.3f}  {', '.join(modules) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+    Suite di benchmark delle funzioni pubbliche del pacchetto: lettura del dataset, funzioni subset_*, Analyzer.analyze,
+    save_results / load_results e metodi di Graphics, su dataset sintetici di diverse dimensioni.
+    Per ogni funzione vengono misurati il tempo migliore su più ripetizioni e il picco di memoria allocata (tracemalloc).
+    I risultati vengono stampati in tabella e, con --output, salvati in un file JSON insieme al commit corrente, così da
+    poter confrontare le prestazioni tra commit diversi.
+    Esecuzione:
+        python -m benchmarks.suite --regions 21 107 --days 120 1000 --missing-rate 0.05 --output risultati.json
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import timeit
+import tracemalloc
+from datetime import datetime
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from itacovid.analyzer import Analyzer
+from itacovid.backends import SQLiteBackend
+from itacovid.get_dataset import read_covid_dataset
+from itacovid.graphics import Graphics
+from itacovid.preaggregation import clear_aggregation_cache
+from itacovid.province import read_province_dataset, rollup_provinces
+from itacovid.snapshot import write_snapshot, open_snapshot
+from itacovid.subset import subset_by_region, subset_by_province, subset_by_month, subset_by_period
+from benchmarks.synthetic import region_names, write_region_csv, write_province_csv
+
+FILE_NAME = 'covid19_italy_region.csv'
+PROVINCE_FILE_NAME = 'covid19_italy_province.csv'
+GRAPHICS_METHODS = ['bar', 'barh', 'line', 'line_nuovi_positivi', 'line_variazione_totale_positivi',
+                    'pie_three_most_affected_regions', 'nested_pie_three_most_affected_regions']
+
+
+def _graphics_case(method):
+    def run(context):
+        # senza cache delle aggregazioni, per misurare il costo completo di ogni grafico
+        clear_aggregation_cache()
+        fig = getattr(Graphics, method)(context['df'])
+        plt.close(fig)
+    return 'Graphics.' + method, run
+
+
+def _save_results(context):
+    context['saves'] += 1
+    # save_results stampa un messaggio a ogni salvataggio
+    with contextlib.redirect_stdout(io.StringIO()):
+        context['analyzer'].save_results(context['results'], 'benchmark ' + str(context['saves']))
+
+
+def _save_results_batch(context):
+    context['saves'] += 1
+    batch = {'benchmark ' + str(context['saves']) + '.' + str(i): context['results'] for i in range(10)}
+    with contextlib.redirect_stdout(io.StringIO()):
+        context['analyzer'].save_results_batch(batch)
+
+
+def benchmark_cases():
+    """
+        Restituisce la lista di (nome, funzione) da misurare: ogni funzione riceve il contesto creato da make_context.
+    """
+    cases = [
+        ('read_covid_dataset (csv)', lambda context: read_covid_dataset(context['path'], FILE_NAME, use_cache=False)),
+        ('read_covid_dataset (cache)', lambda context: read_covid_dataset(context['path'], FILE_NAME)),
+        ('open_snapshot', lambda context: open_snapshot(context['snapshot'])),
+        ('subset_by_region', lambda context: subset_by_region(context['df'], *context['regions'])),
+        ('subset_by_month', lambda context: subset_by_month(context['df'], 'marzo', 'aprile')),
+        ('subset_by_period', lambda context: subset_by_period(context['df'], *context['period'])),
+        ('Analyzer.analyze', lambda context: context['analyzer'].analyze(context['df'], use_cache=False)),
+        ('Analyzer.analyze (cache)', lambda context: context['analyzer'].analyze(context['df'])),
+        ('Analyzer.analyze (snapshot)',
+         lambda context: context['analyzer'].analyze(context['snapshot_df'], use_cache=False)),
+        ('StatisticsCube', lambda context: context['analyzer'].statistics_cube(context['df'])),
+        ('StatisticsCube.window', lambda context: context['cube'].window(*context['period'])),
+        ('StatisticsCube.rolling (7 giorni)', lambda context: context['cube'].rolling(7)),
+        ('Analyzer.save_results', _save_results),
+        ('Analyzer.save_results_batch (10 risultati)', _save_results_batch),
+        ('Analyzer.load_results', lambda context: context['analyzer'].load_results()),
+        ('read_province_dataset (csv)',
+         lambda context: read_province_dataset(context['path'], PROVINCE_FILE_NAME, use_cache=False)),
+        ('subset_by_province', lambda context: subset_by_province(context['province_df'], *context['provinces'])),
+        ('Analyzer.analyze (province)',
+         lambda context: context['analyzer'].analyze(context['province_df'], use_cache=False)),
+        ('rollup_provinces', lambda context: rollup_provinces(context['province_df'])),
+        ('Analyzer.analyze (SQLite)', lambda context: context['analyzer'].analyze(context['backend'])),
+        ('subset_by_region + Analyzer.analyze (SQLite)',
+         lambda context: context['analyzer'].analyze(subset_by_region(context['backend'], *context['regions']))),
+        ('Graphics.bar (SQLite)', lambda context: plt.close(Graphics.bar(context['backend']))),
+    ]
+    return cases + [_graphics_case(method) for method in GRAPHICS_METHODS]
+
+
+def make_context(directory, n_regions, n_days, missing_rate, seed=0):
+    """
+        Scrive il dataset sintetico nella cartella indicata e prepara i dati comuni a tutti i benchmark.
+    """
+    write_region_csv(os.path.join(directory, FILE_NAME), n_regions=n_regions, n_days=n_days, seed=seed,
+                     missing_rate=missing_rate)
+    df = read_covid_dataset(directory, FILE_NAME)
+    # circa 5 province per regione, come nel file reale (107 province per 21 regioni)
+    write_province_csv(os.path.join(directory, PROVINCE_FILE_NAME), n_regions=n_regions, provinces_per_region=5,
+                       n_days=n_days, seed=seed)
+    province_df = read_province_dataset(directory, PROVINCE_FILE_NAME)
+    analyzer = Analyzer(directory, 'benchmark_results')
+    snapshot = write_snapshot(df, os.path.join(directory, 'snapshot'))
+    dates = df['data'].sort_values()
+    return {'path': directory,
+            'df': df,
+            'snapshot': snapshot,
+            'snapshot_df': open_snapshot(snapshot),
+            'backend': SQLiteBackend.from_csv(os.path.join(directory, 'covid.sqlite'), directory, FILE_NAME),
+            'regions': region_names(n_regions)[:2],
+            'province_df': province_df,
+            'provinces': ['Provincia 1', 'Provincia 2'],
+            'period': (dates.iloc[len(dates) // 4].strftime('%d/%m/%Y'), dates.iloc[len(dates) // 2].strftime('%d/%m/%Y')),
+            'analyzer': analyzer,
+            'results': analyzer.analyze(df),
+            'cube': analyzer.statistics_cube(df),
+            'saves': 0}
+
+
+def measure(func, context, repeat):
+    """
+        Restituisce il tempo migliore (in secondi) su repeat esecuzioni e il picco di memoria allocata (in byte) durante
+        un'esecuzione aggiuntiva: la memoria viene misurata a parte perchè tracemalloc rallenta l'esecuzione.
+    """
+    seconds = min(timeit.repeat(lambda: func(context), number=1, repeat=repeat))
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(context)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def _git_commit():
+    try:
+        output = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def run_suite(regions, days, missing_rate=0.0, repeat=3, only=None):
+    """
+        Esegue tutti i benchmark (o solo quelli il cui nome contiene una delle stringhe di only) per ogni combinazione
+        di numero di regioni e di giorni. Restituisce il dizionario che viene salvato in formato JSON.
+    """
+    cases = [(name, func) for name, func in benchmark_cases() if not only or any(text in name for text in only)]
+    records = []
+    for n_regions in regions:
+        for n_days in days:
+            with tempfile.TemporaryDirectory(prefix='itacovid-bench-') as directory:
+                context = make_context(directory, n_regions, n_days, missing_rate)
+                for name, func in cases:
+                    seconds, peak = measure(func, context, repeat)
+                    records.append({'benchmark': name, 'regions': n_regions, 'days': n_days,
+                                    'rows': len(context['df']), 'missing_rate': missing_rate,
+                                    'seconds': seconds, 'peak_memory_bytes': peak})
+                    print(f"{name:<50} {n_regions:>7} {n_days:>6} {len(context['df']):>9} {seconds:>10.4f} "
+                          f"{peak / 2 ** 20:>10.2f}")
+    return {'metadata': {'commit': _git_commit(),
+                         'timestamp': datetime.now().isoformat(timespec='seconds'),
+                         'python': platform.python_version(),
+                         'platform': platform.platform(),
+                         'pandas': pd.__version__,
+                         'numpy': np.__version__,
+                         'repeat': repeat},
+            'results': records}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--regions', type=int, nargs='+', default=[21, 107])
+    parser.add_argument('--days', type=int, nargs='+', default=[120, 1000])
+    parser.add_argument('--missing-rate', type=float, default=0.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='+', help='esegue solo i benchmark il cui nome contiene uno dei testi indicati')
+    parser.add_argument('--output', help='file JSON in cui salvare i risultati')
+    args = parser.parse_args(argv)
+
+    print(f"{'benchmark':<50} {'regioni':>7} {'giorni':>6} {'righe':>9} {'tempo [s]':>10} {'mem [MiB]':>10}")
+    started = time.perf_counter()
+    report = run_suite(args.regions, args.days, args.missing_rate, args.repeat, args.only)
+    print(f'Durata complessiva: {time.perf_counter() - started:.1f} s')
+
+    if args.output:
+        with open(args.output, 'w') as f_obj:
+            json.dump(report, f_obj, indent=2)
+
+
+if __name__ == '__main__':
+    main()
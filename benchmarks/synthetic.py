@@ -0,0 +1,168 @@
+"""
+    Generatore di dataset sintetici con lo stesso schema dei file covid19_italy_region.csv e covid19_italy_province.csv
+    scaricati da Kaggle.
+    Viene utilizzato dai benchmark per misurare le prestazioni del pacchetto a diverse scale (numero di regioni e di giorni).
+"""
+import numpy as np
+import pandas as pd
+
+REGION_NAMES = ['Abruzzo', 'Basilicata', 'P.A. Bolzano', 'Calabria', 'Campania', 'Emilia-Romagna',
+                'Friuli Venezia Giulia', 'Lazio', 'Liguria', 'Lombardia', 'Marche', 'Molise', 'Piemonte', 'Puglia',
+                'Sardegna', 'Sicilia', 'Toscana', 'P.A. Trento', 'Umbria', "Valle d'Aosta", 'Veneto']
+
+RAW_COLUMNS = ['SNo', 'Date', 'Country', 'RegionCode', 'RegionName', 'Latitude', 'Longitude', 'HospitalizedPatients',
+               'IntensiveCarePatients', 'TotalHospitalizedPatients', 'HomeConfinement', 'CurrentPositiveCases',
+               'NewPositiveCases', 'Recovered', 'Deaths', 'TotalPositiveCases', 'TestsPerformed']
+
+PROVINCE_RAW_COLUMNS = ['SNo', 'Date', 'Country', 'RegionCode', 'RegionName', 'ProvinceCode', 'ProvinceName',
+                        'ProvinceAbbreviation', 'Latitude', 'Longitude', 'TotalPositiveCases']
+
+# nome delle righe dei casi non ancora attribuiti a una provincia, uguale in tutte le regioni
+UNASSIGNED_PROVINCE = 'In fase di definizione/aggiornamento'
+
+
+def region_names(n_regions):
+    """
+        Restituisce i nomi di n_regions regioni: le prime 21 sono quelle reali, le successive sono generate.
+    """
+    names = REGION_NAMES[:n_regions]
+    names += ['Regione ' + str(i + 1) for i in range(len(names), n_regions)]
+    return names
+
+
+def make_region_frame(n_regions=21, n_days=120, start='2020-02-24', seed=0, missing_rate=0.0):
+    """
+        Crea un dataframe con le colonne originali del file covid19_italy_region.csv (intestazioni in inglese come su Kaggle),
+        con una riga per ogni giorno e per ogni regione, ordinato per data e poi per regione come il file originale.
+        Con missing_rate > 0 viene eliminata in modo casuale la frazione indicata delle righe (es. giorni in cui una
+        regione non ha comunicato i dati); il primo giorno di ogni regione viene sempre mantenuto.
+    """
+    rng = np.random.default_rng(seed)
+    names = region_names(n_regions)
+    n_rows = n_regions * n_days
+
+    # serie cumulative: incrementi giornalieri non negativi sommati lungo i giorni per ogni regione
+    new_cases = rng.poisson(rng.uniform(5, 500, n_regions), size=(n_days, n_regions))
+    total_cases = new_cases.cumsum(axis=0)
+    deaths = rng.binomial(total_cases, 0.02)
+    deaths = np.maximum.accumulate(deaths, axis=0)
+    recovered = np.maximum.accumulate(rng.binomial(total_cases - deaths, 0.5), axis=0)
+    recovered = np.minimum(recovered, total_cases - deaths)
+    current_positive = total_cases - deaths - recovered
+    hospitalized = rng.binomial(current_positive, 0.15)
+    intensive_care = rng.binomial(hospitalized, 0.1)
+    symptomatic = hospitalized - intensive_care
+    home_confinement = current_positive - hospitalized
+    tests = (total_cases * rng.uniform(5, 15, n_regions)).astype('int64').astype('float64')
+    # nei primi giorni il numero di casi testati non era disponibile
+    tests[:min(n_days, 30)] = np.nan
+
+    dates = pd.date_range(start, periods=n_days, freq='D') + pd.Timedelta(hours=18)
+    df = pd.DataFrame({
+        'SNo': np.arange(n_rows),
+        'Date': np.repeat(dates.strftime('%Y-%m-%dT%H:%M:%S').to_numpy(), n_regions),
+        'Country': 'ITA',
+        'RegionCode': np.tile(np.arange(1, n_regions + 1), n_days),
+        'RegionName': np.tile(names, n_days),
+        'Latitude': np.tile(rng.uniform(37, 47, n_regions).round(6), n_days),
+        'Longitude': np.tile(rng.uniform(7, 18, n_regions).round(6), n_days),
+        'HospitalizedPatients': symptomatic.ravel(),
+        'IntensiveCarePatients': intensive_care.ravel(),
+        'TotalHospitalizedPatients': hospitalized.ravel(),
+        'HomeConfinement': home_confinement.ravel(),
+        'CurrentPositiveCases': current_positive.ravel(),
+        'NewPositiveCases': new_cases.ravel(),
+        'Recovered': recovered.ravel(),
+        'Deaths': deaths.ravel(),
+        'TotalPositiveCases': total_cases.ravel(),
+        'TestsPerformed': tests.ravel(),
+    }, columns=RAW_COLUMNS)
+
+    if missing_rate > 0:
+        keep = rng.random(n_rows) >= missing_rate
+        keep[:n_regions] = True
+        df = df[keep].reset_index(drop=True)
+        df['SNo'] = np.arange(len(df))
+
+    return df
+
+
+def write_region_csv(path, **kwargs):
+    """
+        Scrive su file un dataset sintetico con lo schema del file covid19_italy_region.csv e ne restituisce il percorso.
+        Gli argomenti opzionali sono quelli di make_region_frame.
+    """
+    make_region_frame(**kwargs).to_csv(path, index=False)
+    return path
+
+
+def make_province_frame(n_regions=21, provinces_per_region=5, n_days=120, start='2020-02-24', seed=0):
+    """
+        Crea un dataframe con le colonne originali del file covid19_italy_province.csv: per ogni giorno e per ogni regione
+        una riga per ciascuna delle provinces_per_region province e una per i casi non ancora attribuiti a una provincia
+        (stesso nome in tutte le regioni, come nel file originale). Le righe sono ordinate per data, regione e provincia.
+    """
+    rng = np.random.default_rng(seed)
+    regions = region_names(n_regions)
+    per_region = provinces_per_region + 1
+    n_groups = n_regions * per_region
+    region_index = np.repeat(np.arange(n_regions), per_region)
+    names = [UNASSIGNED_PROVINCE if j == provinces_per_region else 'Provincia ' + str(i * provinces_per_region + j + 1)
+             for i in range(n_regions) for j in range(per_region)]
+    codes = [979 + i if j == provinces_per_region else i * provinces_per_region + j + 1
+             for i in range(n_regions) for j in range(per_region)]
+
+    # totale dei casi cumulativo per provincia; le righe non attribuite possono anche diminuire
+    total_cases = rng.poisson(rng.uniform(1, 100, n_groups), size=(n_days, n_groups)).cumsum(axis=0)
+    unassigned = np.arange(n_groups) % per_region == provinces_per_region
+    total_cases[:, unassigned] = rng.poisson(5, size=(n_days, n_regions))
+
+    dates = pd.date_range(start, periods=n_days, freq='D') + pd.Timedelta(hours=18)
+    return pd.DataFrame({
+        'SNo': np.arange(n_days * n_groups),
+        'Date': np.repeat(dates.strftime('%Y-%m-%dT%H:%M:%S').to_numpy(), n_groups),
+        'Country': 'ITA',
+        'RegionCode': np.tile(region_index + 1, n_days),
+        'RegionName': np.tile(np.array(regions)[region_index], n_days),
+        'ProvinceCode': np.tile(codes, n_days),
+        'ProvinceName': np.tile(names, n_days),
+        'ProvinceAbbreviation': np.tile(['' if name == UNASSIGNED_PROVINCE else 'P' + str(code)
+                                         for name, code in zip(names, codes)], n_days),
+        'Latitude': np.tile(rng.uniform(37, 47, n_groups).round(6), n_days),
+        'Longitude': np.tile(rng.uniform(7, 18, n_groups).round(6), n_days),
+        'TotalPositiveCases': total_cases.ravel(),
+    }, columns=PROVINCE_RAW_COLUMNS)
+
+
+def write_province_csv(path, **kwargs):
+    """
+        Scrive su file un dataset sintetico con lo schema del file covid19_italy_province.csv e ne restituisce il percorso.
+        Gli argomenti opzionali sono quelli di make_province_frame.
+    """
+    make_province_frame(**kwargs).to_csv(path, index=False)
+    return path
+
+
+def make_analysis_frame(n_regions=21, n_days=120, seed=0, missing_rate=0.0):
+    """
+        Crea direttamente un dataframe con le stesse colonne di quello restituito da read_covid_dataset, senza passare dal
+        file csv. Utile per misurare le funzioni di analisi indipendentemente dalla lettura del file.
+    """
+    raw = make_region_frame(n_regions=n_regions, n_days=n_days, seed=seed, missing_rate=missing_rate)
+    df = pd.DataFrame({
+        'data': pd.to_datetime(raw['Date']),
+        'denominazione_regione': raw['RegionName'].str.capitalize(),
+        'ricoverati_con_sintomi': raw['HospitalizedPatients'],
+        'terapia_intensiva': raw['IntensiveCarePatients'],
+        'totale_ospedalizzati': raw['TotalHospitalizedPatients'],
+        'isolamento_domiciliare': raw['HomeConfinement'],
+        'totale_positivi': raw['CurrentPositiveCases'],
+        'nuovi_positivi': raw['NewPositiveCases'],
+        'dimessi_guariti': raw['Recovered'],
+        'deceduti': raw['Deaths'],
+        'totale_casi': raw['TotalPositiveCases'],
+        'casi_testati': raw['TestsPerformed'].fillna(0).astype('int64'),
+    })
+    df.index = pd.Index(raw['SNo'].to_numpy(), name='sno')
+    df['variazione_totale_positivi'] = df.groupby('denominazione_regione', sort=False)['totale_positivi'].diff().fillna(0).astype('int64')
+    return df
@@ -1,4 +1,83 @@
-from .get_dataset import *
-from .analyzer import *
-from .subset import *
-from .graphics import *
\ No newline at end of file
+"""
+    I sottomoduli vengono importati solo al primo utilizzo di uno dei loro nomi (PEP 562, __getattr__ del modulo):
+    "import itacovid" non carica pandas nè matplotlib, e matplotlib viene caricato solo quando si utilizza Graphics
+    (o una funzione che disegna i grafici).
+"""
+import sys
+import types
+from importlib import import_module
+
+# nome pubblico -> sottomodulo in cui è definito
+_EXPORTS = {
+    'get_dataset': ['my_kaggle_api', 'download_covid_dataset', 'read_covid_dataset', 'read_covid_dataset_chunks'],
+    'check_csv_extension': ['check_csv_extension'],
+    'analyzer': ['Analyzer', 'analyzer'],
+    'aggregation': ['StatisticError', 'STATISTICS_LABELS', 'DEFAULT_STATISTICS', 'EXCLUDED_COLUMNS', 'analysis_columns',
+                    'normalize_statistics', 'grouped_statistics', 'MERGEABLE_STATISTICS', 'PartialStatistics'],
+    'subset': ['RegionError', 'MonthError', 'PeriodError', 'ProvinceError', 'ITA_MONTHS', 'subset_by_region',
+               'subset_by_province', 'subset_by_month', 'subset_by_period'],
+    'graphics': ['Graphics', 'NotEnoughRegionsError', 'DAILY_COLUMNS'],
+    'cache': ['cache_stats', 'reset_cache_stats', 'clear_cache'],
+    'deltas': ['daily_variation', 'growth_rate', 'rolling_window', 'WindowError'],
+    'schema': ['REGION_SCHEMA', 'PROVINCE_SCHEMA', 'SCHEMAS', 'schema_of', 'DatasetSchema', 'SCHEMA_VERSION',
+               'optimize_dtypes', 'memory_usage', 'memory_report', 'ColumnError'],
+    'dataset': ['CovidDataset'],
+    'province': ['read_province_dataset', 'read_province_dataset_chunks', 'download_province_dataset', 'rollup_provinces'],
+    'query': ['Query', 'as_frame'],
+    'sources': ['DatasetSource', 'LocalSource', 'KaggleSource', 'HttpSource', 'SourceError'],
+    'fetch': ['fetch_all', 'fetch_all_async', 'fetch_async'],
+    'update': ['update_covid_dataset', 'last_stored_date'],
+    'batch': ['batch_statistics', 'parallel_batch_statistics', 'SharedFrame'],
+    'results_store': ['ResultsStore', 'DuplicatedStringError', 'results_frame'],
+    'report': ['render_report', 'ChartError'],
+    'preaggregation': ['daily_totals', 'latest_snapshot', 'period_totals', 'aggregation_cache_stats',
+                       'clear_aggregation_cache', 'set_aggregation_cache_size'],
+    'resample': ['resample_totals', 'period_labels', 'FrequencyError', 'PERIOD_FREQUENCIES'],
+    'decimation': ['decimate', 'lttb_indices', 'minmax_indices', 'DecimationError'],
+    'instrumentation': ['profile', 'stage', 'instrumented', 'enable', 'disable', 'is_enabled', 'add_hook', 'remove_hook',
+                        'logging_hook', 'Trace'],
+    'cube': ['StatisticsCube'],
+    'result_cache': ['analyze_cache_stats', 'clear_analyze_cache', 'set_analyze_cache', 'frame_fingerprint'],
+    'backends': ['AnalyticsBackend', 'SQLBackend', 'SQLiteBackend', 'DuckDBBackend', 'BackendError'],
+    'snapshot': ['write_snapshot', 'open_snapshot', 'read_manifest', 'SnapshotError'],
+}
+
+_ATTRIBUTES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+# sottomoduli raggiungibili come attributi del pacchetto (itacovid.graphics, ...) anche prima di essere importati,
+# tranne quelli nascosti da un nome pubblico omonimo (analyzer, check_csv_extension)
+_SUBMODULES = (set(_EXPORTS) | {'cli'}) - set(_ATTRIBUTES)
+
+__all__ = list(_ATTRIBUTES)
+
+
+def __getattr__(name):
+    module = _ATTRIBUTES.get(name)
+    if module is None:
+        if name in _SUBMODULES:
+            # import_module imposta anche l'attributo del pacchetto, le chiamate successive non passano da qui
+            return import_module('.' + name, __name__)
+        raise AttributeError("module " + repr(__name__) + " has no attribute " + repr(name))
+    value = getattr(import_module('.' + module, __name__), name)
+    # memorizzo il valore, così __getattr__ viene chiamato solo al primo accesso
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+class _LazyPackage(types.ModuleType):
+    """
+        Quando viene importato un sottomodulo, Python imposta l'attributo omonimo del pacchetto al sottomodulo: per
+        itacovid.analyzer (l'istanza di Analyzer) e itacovid.check_csv_extension (la funzione) il sottomodulo
+        nasconderebbe il nome pubblico, che deve invece essere restituito da __getattr__ come con i vecchi "import *".
+    """
+    def __setattr__(self, name, value):
+        if name in _ATTRIBUTES and isinstance(value, types.ModuleType):
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _LazyPackage
@@ -0,0 +1,271 @@
+import json
+import pandas as pd
+
+
+class StatisticError(ValueError):
+    pass
+
+
+# etichette utilizzate nel dizionario dei risultati per ciascuna statistica disponibile
+STATISTICS_LABELS = {'max': 'valori massimi',
+                     'min': 'valori minimi',
+                     'mean': 'valori medi',
+                     'std': 'deviazione standard',
+                     'sum': 'somma',
+                     'count': 'conteggio',
+                     'median': 'mediana'}
+
+DEFAULT_STATISTICS = ('max', 'min', 'mean', 'std')
+
+# colonne escluse dalle statistiche: le chiavi (data, regione e provincia) e le colonne derivate variazione_totale_positivi
+# e variazione_totale_casi (province)
+EXCLUDED_COLUMNS = ('data', 'denominazione_regione', 'denominazione_provincia', 'variazione_totale_positivi',
+                    'variazione_totale_casi')
+
+
+def analysis_columns(df):
+    """
+        Colonne su cui calcolare le statistiche: tutte tranne data, denominazione_regione, denominazione_provincia,
+        variazione_totale_positivi e variazione_totale_casi.
+        Le colonne vengono escluse per nome e non per posizione, così l'analisi funziona anche su un dataframe con
+        solo alcune colonne (es. il risultato di una Query con columns).
+    """
+    return [column for column in df.columns if column not in EXCLUDED_COLUMNS]
+
+
+def _quantile_label(q):
+    return 'quantile ' + format(q * 100, 'g') + '%'
+
+
+def normalize_statistics(statistics=None):
+    """
+        La funzione prende in input una lista di statistiche e restituisce una lista di coppie (statistica, etichetta).
+        Sono accettati i nomi in inglese ('max', 'min', 'mean', 'std', 'sum', 'count', 'median'), le etichette in italiano
+        ('valori massimi', 'somma', ...) e i quantili, indicati come numero compreso tra 0 e 1 (0.25) oppure come stringa
+        ('q25', 'p90').
+        Se non si inserisce alcuna statistica vengono utilizzate quelle di default: massimo, minimo, media e deviazione standard.
+    """
+    if statistics is None:
+        statistics = DEFAULT_STATISTICS
+    elif isinstance(statistics, (str, float)):
+        statistics = [statistics]
+
+    labels_to_names = {label: name for name, label in STATISTICS_LABELS.items()}
+    normalized = []
+    for stat in statistics:
+        if isinstance(stat, str):
+            stat_name = stat.strip().lower()
+            if stat_name in labels_to_names:
+                stat_name = labels_to_names[stat_name]
+            if stat_name in STATISTICS_LABELS:
+                stat = (stat_name, STATISTICS_LABELS[stat_name])
+            elif stat_name[:1] in ('q', 'p') and stat_name[1:].replace('.', '', 1).isdigit():
+                stat = float(stat_name[1:]) / 100
+            else:
+                raise StatisticError('Statistica non riconosciuta: ' + str(stat) + '! Per favore inserisci una o più delle '
+                                     'seguenti statistiche:\n' + str(list(STATISTICS_LABELS)) + ' oppure un quantile (es. 0.25 o "q25")')
+        if isinstance(stat, (int, float)) and not isinstance(stat, bool):
+            if not 0 <= stat <= 1:
+                raise StatisticError('Il quantile deve essere compreso tra 0 e 1!')
+            stat = (float(stat), _quantile_label(float(stat)))
+        if stat not in normalized:
+            normalized.append(stat)
+
+    return normalized
+
+
+def grouped_statistics(df, by, columns, statistics=None):
+    """
+        La funzione calcola in un unico passaggio sul dataframe le statistiche richieste per ciascun gruppo della colonna
+        indicata in "by" (ad esempio denominazione_regione).
+        Il raggruppamento viene effettuato una sola volta su una chiave categorica e tutte le statistiche vengono
+        calcolate sullo stesso oggetto groupby, anzichè costruire una maschera booleana per ogni gruppo e per ogni statistica.
+
+        Restituisce un dizionario con la stessa struttura di Analyzer.analyze (senza la chiave 'periodo'):
+            {gruppo: {etichetta statistica: {colonna: valore}}}
+        I gruppi mantengono l'ordine con cui compaiono nel dataframe.
+    """
+    statistics = normalize_statistics(statistics)
+    columns = list(columns)
+
+    key = df[by]
+    if not isinstance(key.dtype, pd.CategoricalDtype):
+        key = key.astype('category')
+    groups = pd.unique(df[by])
+    grouped = df[columns].groupby(key, observed=True, sort=False)
+
+    named = [name for name, _ in statistics if isinstance(name, str)]
+    quantiles = [q for q, _ in statistics if not isinstance(q, str)]
+
+    frames = {}
+    if named:
+        aggregated = grouped.agg(named)
+        for name in named:
+            frames[name] = aggregated.xs(name, axis=1, level=1)
+    if quantiles:
+        quantile_df = grouped.quantile(quantiles)
+        for q in quantiles:
+            frames[q] = quantile_df.xs(q, level=-1)
+
+    dict_with_results = {g: {} for g in groups}
+    for name, label in statistics:
+        stat_dict = frames[name].reindex(groups).to_dict('index')
+        for g in groups:
+            dict_with_results[g][label] = stat_dict[g]
+
+    return dict_with_results
+
+
+def _wide_dtype(dtype):
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'int64'
+    return 'float64'
+
+
+# statistiche che possono essere calcolate a blocchi e poi unite senza rileggere i dati
+MERGEABLE_STATISTICS = ('max', 'min', 'mean', 'std', 'sum', 'count')
+
+
+class PartialStatistics():
+    """
+        Aggregati parziali per gruppo (conteggio, somma, somma dei quadrati degli scarti, minimo e massimo) che possono essere
+        aggiornati con nuovi blocchi di dati o uniti tra loro, ottenendo esattamente le stesse statistiche che si avrebbero
+        elaborando tutti i dati in una volta sola.
+        La varianza viene unita con la formula di Chan et al., numericamente stabile.
+        Esempio:
+            partial = PartialStatistics('denominazione_regione', column_list)
+            for chunk in chunks:
+                partial.update(chunk)
+            results = partial.results()
+    """
+    def __init__(self, by, columns, date='data'):
+        self.by = by
+        self.columns = list(columns)
+        self.date = date
+        self.groups = []
+        self.min_date = None
+        self.max_date = None
+        self._count = None
+        self._sum = None
+        self._m2 = None
+        self._min = None
+        self._max = None
+
+    def update(self, df):
+        """
+            Aggiorna gli aggregati con le righe del dataframe passato in input.
+        """
+        if len(df) == 0:
+            return self
+        # colonne allargate a int64 e float64: nei blocchi compatti (vedi optimize_dtypes) somme, minimi e massimi
+        # manterrebbero il tipo ristretto del blocco e l'unione con gli altri blocchi supererebbe il tipo senza errori
+        values = df[self.columns].astype({column: _wide_dtype(df[column].dtype) for column in self.columns})
+        grouped = values.groupby(df[self.by], observed=True, sort=False)
+        other = PartialStatistics(self.by, self.columns, self.date)
+        other.groups = list(pd.unique(df[self.by]))
+        if self.date in df.columns:
+            other.min_date, other.max_date = df[self.date].min(), df[self.date].max()
+        other._count = grouped.count()
+        other._sum = grouped.sum()
+        other._m2 = (grouped.var(ddof=0) * other._count).fillna(0)
+        other._min = grouped.min()
+        other._max = grouped.max()
+        # indice semplice (non categorico) per poter unire blocchi con gruppi diversi
+        for frame in (other._count, other._sum, other._m2, other._min, other._max):
+            frame.index = frame.index.astype(object)
+        return self.merge(other)
+
+    def merge(self, other):
+        """
+            Unisce agli aggregati quelli di un altro oggetto PartialStatistics (ad esempio calcolato su un altro blocco
+            o in un altro processo).
+        """
+        if other._count is None:
+            return self
+        if other.min_date is not None:
+            self.min_date = other.min_date if self.min_date is None else min(self.min_date, other.min_date)
+            self.max_date = other.max_date if self.max_date is None else max(self.max_date, other.max_date)
+        if self._count is None:
+            self.groups = list(other.groups)
+            self._count, self._sum, self._m2 = other._count, other._sum, other._m2
+            self._min, self._max = other._min, other._max
+            return self
+
+        known_groups = set(self.groups)
+        self.groups += [g for g in other.groups if g not in known_groups]
+        union = pd.Index(self.groups)
+        count_a = self._count.reindex(union, fill_value=0)
+        count_b = other._count.reindex(union, fill_value=0)
+        sum_a = self._sum.reindex(union, fill_value=0)
+        sum_b = other._sum.reindex(union, fill_value=0)
+        count = count_a + count_b
+
+        # formula di Chan: M2 = M2_a + M2_b + delta^2 * n_a * n_b / n
+        delta = sum_b / count_b - sum_a / count_a
+        correction = (delta ** 2 * count_a * count_b / count).fillna(0)
+        self._m2 = self._m2.reindex(union, fill_value=0) + other._m2.reindex(union, fill_value=0) + correction
+        self._count = count
+        self._sum = sum_a + sum_b
+        self._min = pd.concat([self._min, other._min]).groupby(level=0, sort=False).min().reindex(union)
+        self._max = pd.concat([self._max, other._max]).groupby(level=0, sort=False).max().reindex(union)
+        return self
+
+    def results(self, statistics=None):
+        """
+            Restituisce un dizionario con la stessa struttura di grouped_statistics.
+            Sono disponibili solo le statistiche che si possono unire a blocchi: massimo, minimo, media, deviazione
+            standard, somma e conteggio.
+        """
+        statistics = normalize_statistics(statistics)
+        for name, label in statistics:
+            if name not in MERGEABLE_STATISTICS:
+                raise StatisticError('La statistica "' + label + '" non può essere calcolata a blocchi! Statistiche '
+                                     'disponibili:\n' + str(list(MERGEABLE_STATISTICS)))
+        if self._count is None:
+            return {}
+
+        frames = {'max': self._max,
+                  'min': self._min,
+                  'sum': self._sum,
+                  'count': self._count,
+                  'mean': self._sum / self._count,
+                  'std': (self._m2 / (self._count - 1)).where(self._count > 1) ** 0.5}
+
+        dict_with_results = {g: {} for g in self.groups}
+        for name, label in statistics:
+            stat_dict = frames[name].reindex(self.groups).to_dict('index')
+            for g in self.groups:
+                dict_with_results[g][label] = stat_dict[g]
+
+        return dict_with_results
+
+    def save(self, file_path):
+        """
+            Memorizza gli aggregati parziali in un file json, per poterli aggiornare in seguito con i soli dati nuovi.
+        """
+        frames = {name: getattr(self, '_' + name) for name in ('count', 'sum', 'm2', 'min', 'max')}
+        my_data = {'by': self.by, 'columns': self.columns, 'date': self.date, 'groups': self.groups,
+                   'min_date': None if self.min_date is None else self.min_date.isoformat(),
+                   'max_date': None if self.max_date is None else self.max_date.isoformat(),
+                   'frames': {name: None if frame is None else frame.to_dict('split') for name, frame in frames.items()}}
+        with open(file_path, 'w') as f_obj:
+            json.dump(my_data, f_obj)
+
+    @classmethod
+    def load(cls, file_path):
+        """
+            Carica gli aggregati parziali memorizzati con il metodo save.
+        """
+        with open(file_path) as f_obj:
+            my_data = json.load(f_obj)
+
+        partial = cls(my_data['by'], my_data['columns'], my_data['date'])
+        partial.groups = my_data['groups']
+        if my_data['min_date'] is not None:
+            partial.min_date = pd.Timestamp(my_data['min_date'])
+            partial.max_date = pd.Timestamp(my_data['max_date'])
+        for name, frame in my_data['frames'].items():
+            if frame is not None:
+                frame = pd.DataFrame(frame['data'], index=pd.Index(frame['index'], dtype=object), columns=frame['columns'])
+            setattr(partial, '_' + name, frame)
+        return partial
@@ -2,12 +2,17 @@ import os
 import json
 import pandas as pd
 from .check_csv_extension import check_csv_extension
+from .aggregation import grouped_statistics, analysis_columns, normalize_statistics, PartialStatistics
+from .query import as_frame
+from .batch import batch_statistics, parallel_batch_statistics
+from .cube import StatisticsCube
+from .backends import AnalyticsBackend
+from .result_cache import cached_results
+from .schema import schema_of
+from .results_store import ResultsStore, DuplicatedStringError, results_store_path
+from .instrumentation import instrumented, stage
 from datetime import datetime
 import pprint
-import copy
-
-class DuplicatedStringError (ValueError):
-    pass
 
 class Analyzer():
     """
@@ -21,6 +26,7 @@ class Analyzer():
     def __init__(self, path_to_results = None, name_to_results = None):
          self._path_to_results = path_to_results
          self._name_to_results = name_to_results
+         self._results_store = None
 
     @property
     def path_to_results(self):
@@ -78,7 +84,8 @@ class Analyzer():
         self.path_to_results = my_data['path_to_results']
         self.name_to_results = my_data['name_to_results']
 
-    def analyze(self, df):
+    @instrumented('analyze')
+    def analyze(self, df, statistics=None, use_cache=True, by=None):
         """
             La funzione prende in input il dataframe definito dall'utente e resituisce un dizionario con:
                 -valori massimi;
@@ -86,20 +93,148 @@ class Analyzer():
                 -valori medi;
                 -deviazione standard
             delle principali serie contenute all'interno del dataframe e raggruppando i dati per Regione.
+            Il dataframe delle province (vedi read_province_dataset) viene raggruppato per Provincia; con by si può
+            indicare un'altra colonna di raggruppamento, es. by='denominazione_regione' per le regioni delle province.
+
+            In via opzionale è possibile indicare la lista delle statistiche da calcolare, ad esempio:
+                analyzer.analyze(df, statistics=['mean', 'sum', 'count', 0.25, 'q75'])
+            Tutte le statistiche vengono calcolate con un unico raggruppamento del dataframe (vedi grouped_statistics).
+
+            Al posto del dataframe è possibile passare un CovidDataset, una Query oppure un iteratore di dataframe (ad esempio quello restituito da
+            read_covid_dataset_chunks): in questo caso i blocchi vengono elaborati uno alla volta mantenendo in memoria solo
+            gli aggregati parziali e sono disponibili le statistiche massimo, minimo, media, deviazione standard, somma e conteggio.
+
+            Con un AnalyticsBackend (es. SQLiteBackend, anche filtrato con le funzioni subset_*) le statistiche vengono
+            calcolate nel database, senza caricare i dati in memoria; sono disponibili le stesse statistiche dei blocchi.
+
+            I risultati dei dataframe vengono memorizzati in una cache (vedi set_analyze_cache e analyze_cache_stats),
+            identificati dal contenuto del dataframe e dalle statistiche richieste: analizzare di nuovo gli stessi dati
+            non ripete il calcolo. Con use_cache=False la cache viene ignorata.
         """
-        period = str(df['data'].max().date().strftime("%d/%m/%Y") + " - " + df['data'].min().date().strftime("%d/%m/%Y"))
-        regions = df['denominazione_regione'].unique()
-        column_list = list(df.columns[2:-1])
+        if isinstance(df, AnalyticsBackend):
+            return self._analyze_backend(df, statistics, by)
+        df = as_frame(df)
+        if not isinstance(df, pd.DataFrame):
+            return self._analyze_chunks(df, statistics, by)
+
+        if by is None:
+            by = schema_of(df).group_column
+        if not use_cache:
+            return self._analyze_frame(df, statistics, by)
+        return cached_results(df, normalize_statistics(statistics), lambda: self._analyze_frame(df, statistics, by), by)
 
-        dict_with_results = {r: {'valori massimi': dict(df.loc[df.denominazione_regione == r, column_list].max()),
-                                 'valori minimi': dict(df.loc[df.denominazione_regione == r, column_list].min()),
-                                 'valori medi': dict(df.loc[df.denominazione_regione == r, column_list].mean()),
-                                 'deviazione standard': dict(df.loc[df.denominazione_regione == r, column_list].std())} for r in regions}
+    def _analyze_frame(self, df, statistics=None, by='denominazione_regione'):
+        period = self._period(df['data'].max(), df['data'].min())
+        column_list = analysis_columns(df)
+
+        with stage('aggregation', len(df)):
+            dict_with_results = grouped_statistics(df, by, column_list, statistics)
 
         dict_with_results['periodo'] = period
 
         return dict_with_results
 
+    def _analyze_backend(self, backend, statistics=None, by=None):
+        min_date, max_date = backend.date_range()
+        if min_date is None:
+            raise ValueError('Nessun dato da analizzare!')
+
+        with stage('aggregation'):
+            dict_with_results = backend.grouped_statistics(backend.schema.group_column if by is None else by,
+                                                           analysis_columns(backend), statistics)
+
+        dict_with_results['periodo'] = self._period(max_date, min_date)
+
+        return dict_with_results
+
+    @staticmethod
+    def _period(max_date, min_date):
+        return str(max_date.date().strftime("%d/%m/%Y") + " - " + min_date.date().strftime("%d/%m/%Y"))
+
+    def _analyze_chunks(self, chunks, statistics=None, by=None):
+        """
+            Versione a blocchi di analyze: aggiorna gli aggregati parziali con ogni blocco e alla fine restituisce lo stesso
+            dizionario che si otterrebbe analizzando tutti i dati in una volta sola.
+        """
+        partial = None
+        for chunk in chunks:
+            partial = self._update_partial(partial, chunk, by)
+
+        if partial is None or partial.min_date is None:
+            raise ValueError('Nessun dato da analizzare!')
+
+        return self._partial_results(partial, statistics)
+
+    def _update_partial(self, partial, df, by=None):
+        if len(df) == 0:
+            return partial
+        if partial is None:
+            partial = PartialStatistics(schema_of(df).group_column if by is None else by, analysis_columns(df))
+        return partial.update(df)
+
+    def _partial_results(self, partial, statistics=None):
+        dict_with_results = partial.results(statistics)
+        dict_with_results['periodo'] = self._period(partial.max_date, partial.min_date)
+        return dict_with_results
+
+    def analyze_incremental(self, df, partial=None, statistics=None):
+        """
+            Versione incrementale di analyze: prende in input i soli dati nuovi (ad esempio le righe restituite da
+            update_covid_dataset) e gli aggregati parziali calcolati in precedenza, e restituisce una coppia con il dizionario
+            dei risultati aggiornato (come quello di analyze) e i nuovi aggregati parziali.
+            Media e deviazione standard vengono aggiornate con le formule per media e varianza "in corsa", senza rileggere
+            i dati già analizzati. Gli aggregati possono essere memorizzati su file con partial.save e ricaricati con
+            PartialStatistics.load.
+            Esempio:
+                results, partial = analyzer.analyze_incremental(df)
+                ...
+                results, partial = analyzer.analyze_incremental(new_rows, partial)
+        """
+        df = as_frame(df)
+        chunks = [df] if isinstance(df, pd.DataFrame) else df
+        for chunk in chunks:
+            partial = self._update_partial(partial, chunk)
+
+        if partial is None or partial.min_date is None:
+            raise ValueError('Nessun dato da analizzare!')
+
+        return self._partial_results(partial, statistics), partial
+
+    @instrumented('analyze_batch')
+    def analyze_batch(self, df, specs, statistics=None, processes=None):
+        """
+            La funzione calcola le statistiche di analyze per un elenco di sottoinsiemi del dataframe in una sola volta.
+            Ogni sottoinsieme è indicato da una Query oppure da un dizionario con le chiavi opzionali:
+                - 'regions': lista di regioni;
+                - 'months': lista di mesi;
+                - 'period': coppia di date 'gg/mm/aaaa';
+                - 'columns': colonne da analizzare;
+                - 'name': nome del sottoinsieme nei risultati (di default la descrizione dei filtri).
+            Tutti i sottoinsiemi vengono analizzati con un unico raggruppamento dei dati. Con processes le interrogazioni
+            vengono invece suddivise tra più processi, che condividono il dataframe tramite memoria condivisa.
+            Restituisce un dataframe con le colonne: interrogazione, periodo, regione, statistica, colonna, valore.
+            Esempio:
+                specs = [{'months': [m], 'regions': [r]} for m in ('marzo', 'aprile') for r in ('Veneto', 'Lazio')]
+                analyzer.analyze_batch(df, specs)
+        """
+        if processes is not None and processes > 1:
+            return parallel_batch_statistics(df, specs, statistics, processes)
+        return batch_statistics(df, specs, statistics)
+
+    def statistics_cube(self, df, columns=None):
+        """
+            La funzione costruisce una sola volta il cubo delle statistiche (vedi StatisticsCube) del dataframe, da cui si
+            ottengono poi le statistiche di analyze su qualunque periodo, su finestre mobili di più giorni o per
+            settimana, mese e anno senza rileggere i dati.
+            Esempio:
+                cube = analyzer.statistics_cube(df)
+                for start, end in periods:
+                    results = cube.window(start, end)  # come analyzer.analyze(subset_by_period(df, start, end))
+                weekly = cube.calendar('W')
+        """
+        df = as_frame(df)
+        return StatisticsCube(df, columns, by=schema_of(df).group_column)
+
     def print_results(self, dictionary):
         """
             La funzione prende in input il dizionario con i risultati ottenuti dalla funzione analyze e restituisce una stampa dello stesso
@@ -107,59 +242,74 @@ class Analyzer():
         """
         return pprint.pprint(dictionary)
 
+    @property
+    def results_store(self):
+        """
+            Archivio dei risultati (vedi ResultsStore): un database SQLite nella cartella path_to_results con lo stesso nome
+            del file dei risultati ed estensione .sqlite.
+            Se esiste già un file csv dei risultati creato dalle versioni precedenti, alla prima apertura viene importato.
+            L'archivio viene creato una sola volta e riutilizzato finchè path_to_results e name_to_results non cambiano.
+        """
+        file_path = results_store_path(self.path_to_results, self.name_to_results)
+        if self._results_store is not None and self._results_store.file_path == file_path:
+            return self._results_store
+        store = ResultsStore(file_path)
+        legacy_path = os.path.join(self.path_to_results, self.name_to_results)
+        if not os.path.isfile(file_path) and os.path.isfile(legacy_path):
+            store.import_csv(legacy_path)
+        self._results_store = store
+        return store
+
+    @instrumented('save_results')
     def save_results(self, my_dict, my_unique_string=None):
         """
-            La funzione permette di memorizzare i risultati ottenuti in un file .csv prendendo in input il dizionario con i risultati ottenuti
+            La funzione permette di memorizzare i risultati ottenuti prendendo in input il dizionario con i risultati ottenuti
             dalla funzione analyze e in via opzionale il valore univoco che si vuole assegnare ai dati, se non specificato assegna il datatime dell'istante
             in cui si richiama la funzione.
+            I risultati vengono aggiunti all'archivio results_store, senza rileggere quelli già memorizzati.
 
-            Se il valore inserito per la memorizzazione dei dati è gia presente o è uguale all'header, comparirà un messaggio di errore!
+            Se il valore inserito per la memorizzazione dei dati è gia presente, comparirà un messaggio di errore!
         """
         try:
             if my_unique_string is None:
                 my_unique_string = datetime.now()
-            # se il file con i risultati già esiste verifico che il valore di unique_identification non sia già inserito!!!
-            elif os.path.isfile(os.path.join(self.path_to_results, self.name_to_results)):
-                unique_identification_list = pd.read_csv(os.path.join(self.path_to_results, self.name_to_results), usecols=[0], skiprows=[0], squeeze=True).unique()
-                if my_unique_string in unique_identification_list:
-                    raise DuplicatedStringError
-            # se il file con i risultati NON esiste verifico che il valore di unique_identification sia diverso dalla stringa 'unique_identification'
-            elif my_unique_string == 'unique_identification':
-                raise DuplicatedStringError
-
-            #effettuo una copia del dizionario per non modificare quello originale fornito dall'utente
-            dictionary = copy.deepcopy(my_dict)
-
-            period = dictionary.pop('periodo')
-            # faccio il pivoting di un livello dell'indice
-            df = pd.DataFrame(dictionary).T.stack().apply(pd.Series)
-            df = df.unstack(level=-1)
-            # assegno il nome alla colonna regioni
-            new_index_name = df.index.set_names('regioni') # --> in alternativa new_index_name=df3.index.rename('regioni')
-            df = df.reindex(new_index_name)
-            df = df.assign(periodo=period, unique_identification=my_unique_string).set_index(['periodo', 'unique_identification'], append=True).\
-                swaplevel(0, 2)
-                # in alternativa
-                # reorder the levels
-                # df.reorder_levels([1, 2, 0])
-
-            #se il file esiste deve appendere i risultati
-            if not os.path.isfile(os.path.join(self.path_to_results, self.name_to_results)):
-                df.to_csv(os.path.join(self.path_to_results, self.name_to_results), mode='a')
-            else:
-                df.to_csv(os.path.join(self.path_to_results, self.name_to_results), mode='a', header=False)
+            self.results_store.save(my_dict, my_unique_string)
 
         except DuplicatedStringError:
-            print('Hai inserito un valore già esistente!\nL\'identificativo per la memorizzazione deve essere univoco o comunque diverso dall\'header.\nSi consiglia di utilizzare i valori di default.' )
+            print('Hai inserito un valore già esistente!\nL\'identificativo per la memorizzazione deve essere univoco.\nSi consiglia di utilizzare i valori di default.' )
         else:
             return print('Salvataggio riuscito correttamente!')
 
-    def load_results(self):
+    @instrumented('save_results_batch')
+    def save_results_batch(self, results, prefix=None):
         """
-            La funzione permette di caricare i risultati memorizzati nel file .csv in un dataframe
+            La funzione memorizza più risultati con un'unica scrittura nell'archivio results_store. Si può indicare:
+                - un dizionario {identificativo: dizionario di analyze} oppure una lista di coppie (identificativo, dizionario);
+                - il dataframe restituito da analyze_batch: ogni interrogazione viene salvata con il suo nome come
+                  identificativo, preceduto da prefix se indicato.
+            Se uno degli identificativi è già presente non viene salvato nessun risultato e comparirà un messaggio di errore!
+            Esempio:
+                analyzer.save_results_batch(analyzer.analyze_batch(df, specs), prefix='analisi mensile')
         """
-        return pd.read_csv(os.path.join(self.path_to_results, self.name_to_results), index_col=[0, 1, 2], header=[0, 1])
+        try:
+            if isinstance(results, pd.DataFrame):
+                self.results_store.save_batch(results, prefix)
+            else:
+                self.results_store.save_many(results)
 
+        except DuplicatedStringError:
+            print('Hai inserito un valore già esistente!\nL\'identificativo per la memorizzazione deve essere univoco.\nSi consiglia di utilizzare i valori di default.' )
+        else:
+            return print('Salvataggio riuscito correttamente!')
+
+    @instrumented('load_results')
+    def load_results(self, unique_identification=None, period=None, regions=None):
+        """
+            La funzione permette di caricare i risultati memorizzati in un dataframe.
+            In via opzionale è possibile leggere solo i risultati di uno o più identificativi, periodi o regioni, ad esempio:
+                analyzer.load_results(unique_identification='mio salvataggio', regions=['Veneto'])
+        """
+        return self.results_store.load(unique_identification, period, regions)
 
 analyzer=Analyzer()
 
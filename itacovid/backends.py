@@ -0,0 +1,490 @@
+import os
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from .aggregation import StatisticError, MERGEABLE_STATISTICS, normalize_statistics
+from .get_dataset import read_covid_dataset_chunks
+from .resample import _check_frequency
+from .schema import REGION_SCHEMA, SCHEMAS, narrowest_integer
+from .subset import _check_regions, _check_provinces, _month_numbers, _parse_period, _check_period
+from .instrumentation import stage
+
+# tabella dei dati e tabella con le informazioni sullo schema (colonne, tipi, schema del dataset)
+TABLE_NAME = 'covid'
+META_TABLE_NAME = 'itacovid_meta'
+# colonne aggiunte al caricamento per filtrare e raggruppare per data con soli confronti tra interi, uguali in ogni
+# motore: data in nanosecondi, giorni, mesi e anni trascorsi dal 01/01/1970
+DATE_COLUMNS = ('giorno', 'mese', 'anno')
+PERIOD_KEYS = {'W': 'giorno - (giorno + 3) % 7', 'M': 'mese', 'Y': 'anno'}
+PERIOD_UNITS = {'W': 'datetime64[D]', 'M': 'datetime64[M]', 'Y': 'datetime64[Y]'}
+
+
+class BackendError(ValueError):
+    pass
+
+
+class AnalyticsBackend(ABC):
+    """
+        Motore su cui eseguire filtri e aggregazioni al posto di pandas, per dataset che non stanno in memoria.
+        Un oggetto AnalyticsBackend rappresenta i dati (già filtrati) su cui lavorare e può essere passato a:
+            - subset_by_region, subset_by_province, subset_by_month e subset_by_period, che restituiscono un nuovo
+              oggetto con il filtro aggiunto senza leggere i dati (come i metodi by_region, by_month, ... di CovidDataset);
+            - Analyzer.analyze, che calcola le statistiche nel motore (grouped_statistics e date_range);
+            - Graphics.bar, che calcola nel motore i totali per periodo (period_totals).
+        Con to_frame si ottiene il dataframe delle righe selezionate, uguale a quello che si otterrebbe da
+        read_covid_dataset con le stesse funzioni subset_*.
+        Le sottoclassi devono implementare tutti i metodi astratti (una sottoclasse incompleta non può essere
+        istanziata): vedi SQLBackend per i motori SQL.
+    """
+    @property
+    @abstractmethod
+    def schema(self):
+        pass
+
+    @property
+    @abstractmethod
+    def columns(self):
+        pass
+
+    @abstractmethod
+    def by_region(self, *regions):
+        pass
+
+    @abstractmethod
+    def by_province(self, *provinces):
+        pass
+
+    @abstractmethod
+    def by_month(self, *months):
+        pass
+
+    @abstractmethod
+    def by_period(self, start, end):
+        pass
+
+    @abstractmethod
+    def date_range(self):
+        pass
+
+    @abstractmethod
+    def grouped_statistics(self, by, columns, statistics=None):
+        pass
+
+    @abstractmethod
+    def period_totals(self, columns, freq='M', cumulative=True, by='denominazione_regione'):
+        pass
+
+    @abstractmethod
+    def to_frame(self, columns=None):
+        pass
+
+
+class SQLBackend(AnalyticsBackend):
+    """
+        Implementazione di AnalyticsBackend per un database SQL: ogni filtro aggiunge una condizione alla clausola WHERE
+        e ogni aggregazione è un'unica interrogazione GROUP BY, per cui i dati non passano mai da pandas e in memoria
+        arrivano solo i risultati (una riga per gruppo o per periodo).
+        Le date sono memorizzate come interi (vedi DATE_COLUMNS), così la stessa SQL funziona in tutti i motori.
+        Le sottoclassi indicano come creare il database (_open), come aprire la connessione per le interrogazioni
+        (_connect) e come inserire un blocco di righe (_insert).
+    """
+    def __init__(self, database):
+        self.database = database
+        self._conditions = []
+        self._params = []
+        meta = self._meta()
+        if meta is None:
+            raise BackendError('Il database ' + str(database) + ' non contiene il dataset! Per favore caricalo con '
+                               + type(self).__name__ + '.from_csv')
+        self._schema = SCHEMAS[meta['schema']]
+        self._columns = meta['columns']
+        self._kinds = meta['kinds']
+
+    @classmethod
+    @abstractmethod
+    def _open(cls, database):
+        pass
+
+    @abstractmethod
+    def _connect(self):
+        pass
+
+    @classmethod
+    @abstractmethod
+    def _insert(cls, connection, frame):
+        pass
+
+    def _execute(self, sql, params=()):
+        connection = self._connect()
+        try:
+            return connection.execute(sql, list(params)).fetchall()
+        finally:
+            connection.close()
+
+    def _meta(self):
+        try:
+            rows = self._execute('SELECT valore FROM ' + META_TABLE_NAME + " WHERE chiave = 'dataset'")
+        except OSError:
+            raise
+        except Exception:
+            # tabella inesistente: il messaggio (e il tipo di eccezione) dipende dal motore
+            return None
+        return json.loads(rows[0][0]) if rows else None
+
+    # caricamento dei dati
+
+    @classmethod
+    def from_csv(cls, database, path=None, name=None, schema=REGION_SCHEMA, chunksize=100000):
+        """
+            Carica nel database il file csv del dataset (regioni o province, vedi schema) e restituisce il backend.
+            Il file viene letto a blocchi con read_covid_dataset_chunks, con la stessa pulizia e le stesse colonne
+            derivate di read_covid_dataset, per cui in memoria resta un solo blocco alla volta. Se il database contiene
+            già il dataset viene sostituito.
+            Esempio:
+                backend = SQLiteBackend.from_csv('/Users/user_name/Desktop/covid.sqlite', '/Users/user_name/Desktop')
+        """
+        return cls.from_frames(database, read_covid_dataset_chunks(path, name, chunksize, compact=False, schema=schema),
+                               schema)
+
+    @classmethod
+    def from_frames(cls, database, frames, schema=REGION_SCHEMA):
+        """
+            Carica nel database un dataframe elaborato (es. quello di read_covid_dataset) o un iteratore di dataframe,
+            un blocco alla volta, e restituisce il backend.
+        """
+        if isinstance(frames, pd.DataFrame):
+            frames = [frames]
+        connection = cls._open(database)
+        try:
+            # un'unica transazione esplicita (BEGIN e COMMIT hanno lo stesso significato in tutti i motori): se il
+            # caricamento non riesce il database resta invariato
+            connection.execute('BEGIN')
+            connection.execute('DROP TABLE IF EXISTS ' + TABLE_NAME)
+            connection.execute('DROP TABLE IF EXISTS ' + META_TABLE_NAME)
+            columns = kinds = None
+            rows = 0
+            with stage('backend_load') as current:
+                for frame in frames:
+                    if columns is None:
+                        columns = list(frame.columns)
+                        kinds = {column: _kind(frame[column]) for column in columns}
+                        connection.execute(_create_table(columns, kinds))
+                    cls._insert(connection, _table_frame(frame, columns, kinds))
+                    rows += len(frame)
+                current.rows_out = rows
+            if columns is None:
+                raise BackendError('Nessun dato da caricare!')
+            for column in schema.category_columns + ['data']:
+                if column in columns:
+                    connection.execute('CREATE INDEX ' + TABLE_NAME + '_' + column + ' ON ' + TABLE_NAME +
+                                       ' (' + column + ')')
+            meta = {'schema': schema.name, 'columns': columns, 'kinds': kinds}
+            connection.execute('CREATE TABLE ' + META_TABLE_NAME + ' (chiave VARCHAR PRIMARY KEY, valore VARCHAR)')
+            connection.execute('INSERT INTO ' + META_TABLE_NAME + " VALUES ('dataset', ?)", [json.dumps(meta)])
+            connection.execute('COMMIT')
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+        return cls(database)
+
+    # filtri
+
+    def _where(self, condition, params):
+        backend = type(self).__new__(type(self))
+        backend.__dict__.update(self.__dict__)
+        backend._conditions = self._conditions + [condition]
+        backend._params = self._params + list(params)
+        return backend
+
+    def _where_sql(self):
+        if not self._conditions:
+            return ''
+        return ' WHERE ' + ' AND '.join('(' + condition + ')' for condition in self._conditions)
+
+    def _distinct(self, column):
+        return [row[0] for row in self._execute('SELECT DISTINCT ' + column + ' FROM ' + TABLE_NAME +
+                                                self._where_sql(), self._params)]
+
+    def _in(self, column, values):
+        return column + ' IN (' + ', '.join('?' * len(values)) + ')'
+
+    @property
+    def schema(self):
+        return self._schema
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def __len__(self):
+        return self._execute('SELECT COUNT(*) FROM ' + TABLE_NAME + self._where_sql(), self._params)[0][0]
+
+    def by_region(self, *regions):
+        """
+            Equivalente di subset_by_region: aggiunge il filtro per regione, senza leggere i dati.
+        """
+        regions = list(dict.fromkeys(map(lambda x: x.capitalize(), regions)))
+        _check_regions(regions, np.array(sorted(self._distinct('denominazione_regione'))))
+        return self._where(self._in('denominazione_regione', regions), regions)
+
+    def by_province(self, *provinces):
+        """
+            Equivalente di subset_by_province (solo per il dataset delle province).
+        """
+        if 'denominazione_provincia' not in self._columns:
+            raise BackendError('Il database non contiene il dataset delle province!')
+        provinces = list(dict.fromkeys(map(lambda x: x.capitalize(), provinces)))
+        _check_provinces(provinces, self._distinct('denominazione_provincia'))
+        return self._where(self._in('denominazione_provincia', provinces), provinces)
+
+    def by_month(self, *months):
+        """
+            Equivalente di subset_by_month: il numero del mese si ricava dai mesi trascorsi dal 01/01/1970.
+        """
+        month_numbers = _month_numbers(months)
+        return self._where(self._in('mese % 12 + 1', month_numbers), month_numbers)
+
+    def by_period(self, start, end):
+        """
+            Equivalente di subset_by_period (formato 'gg/mm/aaaa', estremi compresi).
+        """
+        start, end = _parse_period(start, end)
+        min_date, max_date = self.date_range()
+        if min_date is not None:
+            _check_period(start, end, min_date.date(), max_date.date())
+        return self._where('data >= ? AND data < ?', [pd.Timestamp(start).value,
+                                                      pd.Timestamp(end + timedelta(days=1)).value])
+
+    # aggregazioni
+
+    def date_range(self):
+        """
+            Restituisce la data minima e massima delle righe selezionate (None se non ci sono righe).
+        """
+        min_date, max_date = self._execute('SELECT MIN(data), MAX(data) FROM ' + TABLE_NAME + self._where_sql(),
+                                           self._params)[0]
+        if min_date is None:
+            return None, None
+        return pd.Timestamp(min_date), pd.Timestamp(max_date)
+
+    def grouped_statistics(self, by, columns, statistics=None):
+        """
+            Equivalente di aggregation.grouped_statistics calcolato nel motore: conteggio, somma, minimo e massimo con
+            un'unica interrogazione GROUP BY; per la deviazione standard una seconda passata somma i quadrati degli
+            scarti dalla media del gruppo (come pandas, senza la formula "somma dei quadrati meno quadrato della
+            somma", che perde precisione). La media è calcolata dalla somma esatta degli interi.
+            I gruppi mantengono l'ordine con cui compaiono nei dati, come in pandas.
+        """
+        statistics = normalize_statistics(statistics)
+        for name, label in statistics:
+            if name not in MERGEABLE_STATISTICS:
+                raise StatisticError('La statistica "' + label + '" non è disponibile nel database! Statistiche '
+                                     'disponibili:\n' + str(list(MERGEABLE_STATISTICS)))
+        columns = list(columns)
+        names = {name for name, _ in statistics}
+        where = self._where_sql()
+
+        if 'std' in names:
+            # seconda passata: le righe vengono unite alle medie del gruppo calcolate in una sottointerrogazione
+            sql = ('SELECT righe.' + by + ', MIN(righe.sno), ' + _aggregates(columns, 'righe.') + ', ' +
+                   ', '.join('SUM((righe.' + c + ' - medie.media_' + str(i) + ') * (righe.' + c + ' - medie.media_' +
+                             str(i) + '))' for i, c in enumerate(columns)) +
+                   ' FROM (SELECT * FROM ' + TABLE_NAME + where + ') AS righe JOIN (SELECT ' + by + ', ' +
+                   ', '.join('AVG(' + c + ') AS media_' + str(i) for i, c in enumerate(columns)) + ' FROM ' +
+                   TABLE_NAME + where + ' GROUP BY ' + by + ') AS medie ON righe.' + by + ' = medie.' + by +
+                   ' GROUP BY righe.' + by)
+            params = self._params + self._params
+        else:
+            sql = ('SELECT ' + by + ', MIN(sno), ' + _aggregates(columns) + ' FROM ' + TABLE_NAME + where +
+                   ' GROUP BY ' + by)
+            params = self._params
+
+        with stage('backend_aggregation') as current:
+            rows = self._execute(sql, params)
+            current.rows_out = len(rows)
+        rows.sort(key=lambda row: row[1])
+
+        n = len(columns)
+        dict_with_results = {}
+        for row in rows:
+            values = row[2:]
+            counts, sums, minima, maxima = (values[i * n:(i + 1) * n] for i in range(4))
+            frames = {'count': counts,
+                      'sum': [self._empty_sum(c, s) for c, s in zip(columns, sums)],
+                      'min': [np.nan if value is None else value for value in minima],
+                      'max': [np.nan if value is None else value for value in maxima],
+                      'mean': [s / k if k else np.nan for s, k in zip(sums, counts)]}
+            if 'std' in names:
+                squares = values[4 * n:5 * n]
+                frames['std'] = [float(np.sqrt(q / (k - 1))) if k > 1 else np.nan for q, k in zip(squares, counts)]
+            dict_with_results[row[0]] = {label: dict(zip(columns, frames[name])) for name, label in statistics}
+        return dict_with_results
+
+    def _empty_sum(self, column, value):
+        # come pandas, la somma di un gruppo senza valori è 0 (SQL restituisce NULL)
+        if value is not None:
+            return value
+        return 0.0 if self._kinds.get(column) == 'f' else 0
+
+    def period_totals(self, columns, freq='M', cumulative=True, by='denominazione_regione'):
+        """
+            Equivalente di resample_totals calcolato nel motore: con cumulative=True il massimo di ogni (periodo,
+            gruppo) e la somma per periodo sono un'unica interrogazione annidata; la differenza con il periodo
+            precedente viene calcolata sulle poche righe restituite (una per periodo).
+        """
+        _check_frequency(freq)
+        columns = list(columns)
+        key = PERIOD_KEYS[freq]
+        where = self._where_sql()
+        if cumulative:
+            sql = ('SELECT periodo, ' + ', '.join('SUM(' + c + ')' for c in columns) + ' FROM (SELECT ' + key +
+                   ' AS periodo, ' + by + ', ' + ', '.join('MAX(' + c + ') AS ' + c for c in columns) + ' FROM ' +
+                   TABLE_NAME + where + ' GROUP BY ' + key + ', ' + by + ') AS massimi GROUP BY periodo ORDER BY periodo')
+        else:
+            sql = ('SELECT ' + key + ' AS periodo, ' + ', '.join('SUM(' + c + ')' for c in columns) + ' FROM ' +
+                   TABLE_NAME + where + ' GROUP BY ' + key + ' ORDER BY periodo')
+
+        with stage('backend_aggregation') as current:
+            rows = self._execute(sql, self._params)
+            current.rows_out = len(rows)
+        periods = np.array([row[0] for row in rows], dtype=np.int64).astype(PERIOD_UNITS[freq])
+        index = pd.DatetimeIndex(periods.astype('datetime64[ns]')).to_period(freq).rename('data')
+        totals = pd.DataFrame([row[1:] for row in rows], index=index, columns=columns).fillna(0)
+        if not cumulative:
+            return totals
+        return totals - totals.shift(fill_value=0)
+
+    def to_frame(self, columns=None):
+        """
+            Restituisce il dataframe delle righe selezionate (con columns solo le colonne indicate, oltre a quelle
+            chiave), con indice, ordine delle righe e tipi compatti come read_covid_dataset. Come per le funzioni
+            subset_* le colonne di tipo categoria hanno le categorie di tutto il dataset, non solo quelle selezionate.
+        """
+        if columns is not None:
+            selected = set(self._schema.key_columns) | set(columns)
+            columns = [column for column in self._columns if column in selected]
+        else:
+            columns = self.columns
+        rows = self._execute('SELECT sno, ' + ', '.join(columns) + ' FROM ' + TABLE_NAME + self._where_sql() +
+                             ' ORDER BY sno', self._params)
+        df = pd.DataFrame.from_records(rows, columns=['sno'] + columns).set_index('sno')
+        for column in columns:
+            if column == 'data':
+                df[column] = pd.to_datetime(df[column].astype(np.int64), unit='ns')
+            elif self._kinds[column] == 'c':
+                categories = [row[0] for row in self._execute('SELECT DISTINCT ' + column + ' FROM ' + TABLE_NAME)]
+                df[column] = pd.Categorical(df[column], categories=sorted(categories))
+            elif self._kinds[column] == 'f':
+                df[column] = df[column].astype(np.float64)
+            else:
+                df[column] = narrowest_integer(df[column].astype(np.int64))
+        return df
+
+
+def _aggregates(columns, prefix=''):
+    # conteggio, somma, minimo e massimo di ogni colonna, in quest'ordine
+    return ', '.join(function + '(' + prefix + column + ')' for function in ('COUNT', 'SUM', 'MIN', 'MAX')
+                     for column in columns)
+
+
+def _kind(series):
+    if series.name == 'data':
+        return 'd'
+    if isinstance(series.dtype, pd.CategoricalDtype) or series.dtype == object:
+        return 'c'
+    return 'f' if pd.api.types.is_float_dtype(series.dtype) else 'i'
+
+
+def _create_table(columns, kinds):
+    # BIGINT, DOUBLE e VARCHAR: tipi comuni a SQLite e DuckDB (la data in nanosecondi non sta in un intero a 32 bit)
+    types = {'d': 'BIGINT', 'c': 'VARCHAR', 'f': 'DOUBLE', 'i': 'BIGINT'}
+    definitions = ['sno BIGINT'] + [column + ' ' + types[kinds[column]] for column in columns]
+    definitions += [column + ' BIGINT' for column in DATE_COLUMNS]
+    return 'CREATE TABLE ' + TABLE_NAME + ' (' + ', '.join(definitions) + ')'
+
+
+def _table_frame(frame, columns, kinds):
+    """
+        Prepara un blocco di righe per l'inserimento: indice come colonna sno, categorie come testo, date come interi
+        (nanosecondi, giorni, mesi e anni dal 01/01/1970) e valori mancanti come None (NULL in tutti i motori).
+    """
+    dates = frame['data'].to_numpy().astype('datetime64[ns]')
+    data = {'sno': frame.index.to_numpy().astype(np.int64)}
+    for column in columns:
+        kind = kinds[column]
+        if kind == 'd':
+            data[column] = dates.astype(np.int64)
+        elif kind == 'c':
+            data[column] = frame[column].astype(str).to_numpy(dtype=object)
+        elif kind == 'f':
+            values = frame[column].to_numpy(dtype=np.float64).astype(object)
+            values[np.isnan(frame[column].to_numpy(dtype=np.float64))] = None
+            data[column] = values
+        else:
+            data[column] = frame[column].to_numpy().astype(np.int64)
+    data['giorno'] = dates.astype('datetime64[D]').astype(np.int64)
+    data['mese'] = dates.astype('datetime64[M]').astype(np.int64)
+    data['anno'] = dates.astype('datetime64[Y]').astype(np.int64)
+    return pd.DataFrame(data)
+
+
+class SQLiteBackend(SQLBackend):
+    """
+        Backend SQLite: il dataset viene caricato in un file di database su disco (modulo sqlite3 della libreria
+        standard, nessuna dipendenza aggiuntiva), con gli indici su regione (provincia) e data.
+        Esempio:
+            backend = SQLiteBackend.from_csv('/Users/user_name/Desktop/covid.sqlite', '/Users/user_name/Desktop')
+            analyzer.analyze(subset_by_month(subset_by_region(backend, 'Veneto'), 'aprile'))
+            Graphics.bar(backend)
+    """
+    @classmethod
+    def _open(cls, database):
+        return sqlite3.connect(database)
+
+    def _connect(self):
+        if not os.path.isfile(self.database):
+            raise FileNotFoundError('Database non trovato: ' + str(self.database))
+        return sqlite3.connect(self.database)
+
+    @classmethod
+    def _insert(cls, connection, frame):
+        # tolist converte i valori numpy in int e float di Python, gli unici tipi numerici accettati da sqlite3
+        rows = zip(*(frame[column].tolist() for column in frame.columns))
+        connection.executemany('INSERT INTO ' + TABLE_NAME + ' (' + ', '.join(frame.columns) + ') VALUES (' +
+                               ', '.join('?' * len(frame.columns)) + ')', rows)
+
+
+class DuckDBBackend(SQLBackend):
+    """
+        Backend DuckDB: database colonnare su disco, più veloce di SQLite nelle aggregazioni su molte righe.
+        Richiede il pacchetto duckdb (pip install duckdb).
+        Sperimentale: i test confrontano i risultati con quelli di SQLiteBackend solo se duckdb è installato.
+        Esempio:
+            backend = DuckDBBackend.from_csv('/Users/user_name/Desktop/covid.duckdb', '/Users/user_name/Desktop')
+    """
+    @classmethod
+    def _open(cls, database):
+        # import locale: duckdb è una dipendenza opzionale, necessaria solo per questo backend
+        import duckdb
+        return duckdb.connect(database)
+
+    def _connect(self):
+        if not os.path.isfile(self.database):
+            raise FileNotFoundError('Database non trovato: ' + str(self.database))
+        import duckdb
+        return duckdb.connect(self.database, read_only=True)
+
+    @classmethod
+    def _insert(cls, connection, frame):
+        # il blocco viene letto direttamente dal dataframe, senza convertire le righe in tuple
+        connection.register('blocco', frame)
+        try:
+            connection.execute('INSERT INTO ' + TABLE_NAME + ' (' + ', '.join(frame.columns) + ') SELECT ' +
+                               ', '.join(frame.columns) + ' FROM blocco')
+        finally:
+            connection.unregister('blocco')
@@ -0,0 +1,199 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from .aggregation import normalize_statistics, analysis_columns
+from .dataset import CovidDataset
+from .query import Query, as_frame
+from .schema import schema_of
+
+# colonne del dataframe "tidy" con i risultati delle analisi in blocco
+RESULT_COLUMNS = ['interrogazione', 'periodo', 'regione', 'statistica', 'colonna', 'valore']
+
+
+def _prepare_specs(specs):
+    """
+        Converte le specifiche (Query o dizionari, vedi Query.from_spec) in Query e assegna a ciascuna un nome:
+        la chiave 'name' del dizionario se presente, altrimenti la descrizione dei filtri.
+    """
+    queries, names = [], []
+    for spec in specs:
+        query = Query.from_spec(spec)
+        queries.append(query)
+        names.append(spec['name'] if isinstance(spec, dict) and 'name' in spec else query.describe())
+    return queries, names
+
+
+def _as_dataset(df):
+    if isinstance(df, CovidDataset):
+        return df
+    return CovidDataset(as_frame(df))
+
+
+def _positions_array(positions):
+    if isinstance(positions, slice):
+        return np.arange(positions.start, positions.stop)
+    return positions
+
+
+def _grouped_batch(dataset, queries, names, statistics=None):
+    """
+        Calcola le statistiche di tutte le interrogazioni con un unico raggruppamento: le righe selezionate da ciascuna
+        interrogazione (posizioni già note grazie agli indici del CovidDataset) vengono concatenate con il numero
+        dell'interrogazione come chiave aggiuntiva e poi raggruppate per (interrogazione, regione), o per
+        (interrogazione, provincia) con il dataframe delle province, come in Analyzer.analyze.
+    """
+    statistics = normalize_statistics(statistics)
+    df = dataset.df
+    columns = analysis_columns(df)
+
+    positions = [_positions_array(query.positions(dataset)) for query in queries]
+    lengths = np.array([len(p) for p in positions])
+    if not lengths.sum():
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    all_positions = np.concatenate(positions)
+    spec_ids = np.repeat(np.arange(len(queries)), lengths)
+
+    selected = df.iloc[all_positions]
+    regions = selected[schema_of(df).group_column].to_numpy()
+    grouped = selected[columns].groupby([spec_ids, regions], sort=False)
+
+    parts = []
+    named = [name for name, _ in statistics if isinstance(name, str)]
+    if named:
+        wide = grouped.agg(named).rename_axis(['id', 'regione']).rename_axis(['colonna', 'statistica'], axis=1)
+        parts.append(wide.melt(value_name='valore', ignore_index=False).reset_index())
+    quantiles = [q for q, _ in statistics if not isinstance(q, str)]
+    if quantiles:
+        wide = grouped.quantile(quantiles).rename_axis(['id', 'regione', 'statistica'])
+        parts.append(wide.melt(var_name='colonna', value_name='valore', ignore_index=False).reset_index())
+    result = pd.concat(parts, ignore_index=True)
+
+    # periodo di ciascuna interrogazione, come in Analyzer.analyze: "data massima - data minima"
+    dates = selected['data'].to_numpy()
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    non_empty = lengths > 0
+    max_dates = np.maximum.reduceat(dates, starts[non_empty])
+    min_dates = np.minimum.reduceat(dates, starts[non_empty])
+    periods = {spec_id: pd.Timestamp(max_date).strftime('%d/%m/%Y') + ' - ' + pd.Timestamp(min_date).strftime('%d/%m/%Y')
+               for spec_id, max_date, min_date in zip(np.flatnonzero(non_empty), max_dates, min_dates)}
+
+    labels = dict(statistics)
+    order = {label: i for i, (_, label) in enumerate(statistics)}
+    result['statistica'] = result['statistica'].map(labels)
+    result['periodo'] = result['id'].map(periods)
+    result['interrogazione'] = result['id'].map(dict(enumerate(names)))
+
+    # se un'interrogazione indica le colonne, mantengo solo quelle
+    for spec_id, query in enumerate(queries):
+        if query._columns is not None:
+            result = result[(result['id'] != spec_id) | result['colonna'].isin(query._columns)]
+
+    result['_ordine'] = result['statistica'].map(order)
+    result = result.sort_values(['id', '_ordine'], kind='stable')
+    return result[RESULT_COLUMNS].reset_index(drop=True)
+
+
+def batch_statistics(df, specs, statistics=None):
+    """
+        La funzione calcola le statistiche di Analyzer.analyze per un elenco di interrogazioni (Query o dizionari con le
+        chiavi 'regions', 'months', 'period', 'columns' e 'name') con un unico raggruppamento dei dati.
+        Restituisce un dataframe "tidy" con una riga per interrogazione, regione (o provincia), statistica e colonna.
+    """
+    queries, names = _prepare_specs(specs)
+    return _grouped_batch(_as_dataset(df), queries, names, statistics)
+
+
+class SharedFrame():
+    """
+        Copia delle colonne di un dataframe in blocchi di memoria condivisa (multiprocessing.shared_memory), che i processi
+        figli possono utilizzare senza ricevere una copia dei dati: ogni processo ricostruisce il dataframe a partire dagli
+        stessi blocchi di memoria.
+        Le colonne di tipo categoria vengono condivise come codici numerici, le categorie sono passate nel descrittore.
+    """
+    def __init__(self, blocks, descriptor):
+        self._blocks = blocks
+        self.descriptor = descriptor
+
+    @classmethod
+    def from_frame(cls, df):
+        blocks, columns = [], []
+        for column in df.columns:
+            series = df[column]
+            categories = None
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                categories = list(series.cat.categories)
+                values = series.cat.codes.to_numpy()
+            else:
+                values = series.to_numpy()
+            block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+            blocks.append(block)
+            columns.append({'name': column, 'block': block.name, 'dtype': values.dtype.str, 'length': len(values),
+                            'categories': categories})
+        return cls(blocks, {'columns': columns})
+
+    @staticmethod
+    def attach(descriptor):
+        """
+            Ricostruisce il dataframe a partire dal descrittore, senza copiare i dati numerici.
+            Restituisce il dataframe e i blocchi di memoria, che devono restare aperti finchè il dataframe viene utilizzato.
+        """
+        blocks, data = [], {}
+        for column in descriptor['columns']:
+            # i processi figli condividono il resource tracker del processo principale, che elimina i blocchi con close
+            block = shared_memory.SharedMemory(name=column['block'])
+            blocks.append(block)
+            values = np.ndarray((column['length'],), dtype=np.dtype(column['dtype']), buffer=block.buf)
+            if column['categories'] is not None:
+                values = pd.Categorical.from_codes(values, column['categories'])
+            data[column['name']] = values
+        return pd.DataFrame(data, copy=False), blocks
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+_worker_state = {}
+
+
+def _init_worker(descriptor):
+    df, blocks = SharedFrame.attach(descriptor)
+    _worker_state['blocks'] = blocks
+    _worker_state['dataset'] = CovidDataset(df)
+
+
+def _worker_batch(queries, names, statistics):
+    return _grouped_batch(_worker_state['dataset'], queries, names, statistics)
+
+
+def parallel_batch_statistics(df, specs, statistics=None, processes=None):
+    """
+        Come batch_statistics, ma le interrogazioni vengono suddivise tra più processi. Il dataframe viene condiviso tramite
+        memoria condivisa (vedi SharedFrame) e non viene copiato in ogni processo; ogni processo esegue un unico
+        raggruppamento sulle interrogazioni che gli sono state assegnate.
+    """
+    queries, names = _prepare_specs(specs)
+    if not queries:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    dataset = _as_dataset(df)
+    # colonne chiave dello schema (date e categorie), necessarie ai filtri delle interrogazioni e al raggruppamento
+    frame = dataset.df[schema_of(dataset.df).key_columns + analysis_columns(dataset.df)]
+
+    n_workers = processes or os.cpu_count() or 1
+    groups = [group for group in np.array_split(np.arange(len(queries)), n_workers) if len(group)]
+
+    shared = SharedFrame.from_frame(frame)
+    try:
+        with ProcessPoolExecutor(len(groups), initializer=_init_worker, initargs=(shared.descriptor,)) as executor:
+            futures = [executor.submit(_worker_batch, [queries[i] for i in group], [names[i] for i in group], statistics)
+                       for group in groups]
+            parts = [future.result() for future in futures]
+    finally:
+        shared.close()
+
+    return pd.concat(parts, ignore_index=True)
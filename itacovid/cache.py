@@ -0,0 +1,180 @@
+import os
+import json
+import hashlib
+import shutil
+import pandas as pd
+from .schema import SCHEMA_VERSION, REGION_SCHEMA
+
+# da incrementare ogni volta che cambia l'elaborazione effettuata da read_covid_dataset, in modo da invalidare la cache
+CACHE_VERSION = 2
+CACHE_DIR_NAME = '.itacovid_cache'
+
+_cache_stats = {'hits': 0, 'misses': 0, 'writes': 0}
+
+
+def cache_stats():
+    """
+        La funzione restituisce un dizionario con il numero di letture trovate in cache (hits), il numero di letture per cui
+        è stato necessario rielaborare il file csv (misses) e il numero di scritture della cache (writes).
+    """
+    return dict(_cache_stats)
+
+
+def reset_cache_stats():
+    """
+        La funzione azzera i contatori restituiti da cache_stats.
+    """
+    for key in _cache_stats:
+        _cache_stats[key] = 0
+
+
+def default_cache_dir(path):
+    """
+        Di default la cache viene memorizzata nella cartella nascosta .itacovid_cache accanto al file csv.
+    """
+    return os.path.join(path, CACHE_DIR_NAME)
+
+
+def clear_cache(cache_dir):
+    """
+        La funzione elimina la cartella della cache con tutto il suo contenuto.
+    """
+    if os.path.isdir(cache_dir):
+        shutil.rmtree(cache_dir)
+
+
+def file_hash(file_path, block_size=1 << 20):
+    """
+        La funzione calcola l'hash sha256 del contenuto del file leggendolo a blocchi.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f_obj:
+        for block in iter(lambda: f_obj.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_signature(file_path, with_hash=True):
+    """
+        La funzione restituisce un dizionario con percorso assoluto, dimensione, data di ultima modifica e (opzionalmente)
+        hash del contenuto del file: sono le informazioni con cui viene identificata una voce della cache.
+    """
+    stat = os.stat(file_path)
+    signature = {'path': os.path.abspath(file_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        signature['sha256'] = file_hash(file_path)
+    return signature
+
+
+def _cache_paths(file_path, cache_dir):
+    key = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:16]
+    base = os.path.join(cache_dir, os.path.splitext(os.path.basename(file_path))[0] + '-' + key)
+    return base + '.feather', base + '.json'
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f_obj:
+            return json.load(f_obj)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(meta, meta_path):
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w') as f_obj:
+        json.dump(meta, f_obj)
+    os.replace(tmp_path, meta_path)
+
+
+def _is_valid(meta, file_path, meta_path, schema=REGION_SCHEMA):
+    """
+        Verifica che la voce della cache corrisponda al file csv attuale.
+        Se dimensione e data di modifica coincidono la voce è valida; se cambia solo la data di modifica viene confrontato
+        l'hash del contenuto (ad esempio un file copiato o "toccato" senza modifiche) e in caso positivo la voce viene aggiornata.
+    """
+    if meta is None or meta.get('version') != CACHE_VERSION or meta.get('schema_version') != SCHEMA_VERSION:
+        return False
+    # le voci scritte prima dello schema delle province non indicano lo schema: sono tutte dello schema delle regioni
+    if meta.get('schema', REGION_SCHEMA.name) != schema.name:
+        return False
+    signature = file_signature(file_path, with_hash=False)
+    if signature['path'] != meta['path'] or signature['size'] != meta['size']:
+        return False
+    if signature['mtime_ns'] == meta['mtime_ns']:
+        return True
+    if file_hash(file_path) != meta['sha256']:
+        return False
+    meta['mtime_ns'] = signature['mtime_ns']
+    try:
+        _write_json(meta, meta_path)
+    except OSError:
+        # cartella in sola lettura: la voce resta valida, verrà confrontato di nuovo l'hash alla prossima lettura
+        pass
+    return True
+
+
+def _compact(df):
+    """
+        Riduce lo spazio occupato su disco: le stringhe diventano categorie e gli interi vengono ridotti al tipo più piccolo
+        che può contenerli. I tipi originali vengono memorizzati nei metadati per essere ripristinati in lettura.
+    """
+    df = df.reset_index()
+    for column in df.columns:
+        if df[column].dtype == object:
+            df[column] = df[column].astype('category')
+        elif pd.api.types.is_integer_dtype(df[column].dtype):
+            df[column] = pd.to_numeric(df[column], downcast='integer')
+    return df
+
+
+def load_cached_frame(file_path, cache_dir, columns=None, schema=REGION_SCHEMA):
+    """
+        La funzione restituisce il dataframe elaborato memorizzato in cache per il file csv indicato, oppure None se la cache
+        non esiste, non è più valida o se il pacchetto pyarrow non è installato.
+        Se si indicano le colonne vengono lette dal file Feather solo quelle (più l'indice).
+    """
+    data_path, meta_path = _cache_paths(file_path, cache_dir)
+    meta = _read_meta(meta_path)
+    if not os.path.isfile(data_path) or not _is_valid(meta, file_path, meta_path, schema):
+        _cache_stats['misses'] += 1
+        return None
+    try:
+        df = pd.read_feather(data_path, columns=None if columns is None else [meta['index']] + list(columns))
+    except ImportError:
+        _cache_stats['misses'] += 1
+        return None
+
+    df = df.astype({column: dtype for column, dtype in meta['dtypes'].items() if column in df.columns}).set_index(meta['index'])
+    df.index = df.index.astype(meta['index_dtype'])
+    _cache_stats['hits'] += 1
+    return df
+
+
+def store_cached_frame(df, file_path, cache_dir, schema=REGION_SCHEMA):
+    """
+        La funzione memorizza in formato Feather il dataframe elaborato a partire dal file csv indicato.
+        Se il pacchetto pyarrow non è installato o la cartella della cache non è scrivibile (es. cartella dei dati in sola
+        lettura) la cache viene semplicemente ignorata e la funzione restituisce False.
+    """
+    data_path, meta_path = _cache_paths(file_path, cache_dir)
+    tmp_path = data_path + '.tmp'
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _compact(df).to_feather(tmp_path)
+        os.replace(tmp_path, data_path)
+
+        meta = file_signature(file_path)
+        meta['version'] = CACHE_VERSION
+        meta['schema_version'] = SCHEMA_VERSION
+        meta['schema'] = schema.name
+        meta['index'] = df.index.name
+        meta['index_dtype'] = str(df.index.dtype)
+        meta['dtypes'] = {column: str(dtype) for column, dtype in df.dtypes.items()}
+        _write_json(meta, meta_path)
+    except (ImportError, OSError):
+        if os.path.isfile(tmp_path):
+            os.remove(tmp_path)
+        return False
+    _cache_stats['writes'] += 1
+    return True
@@ -0,0 +1,242 @@
+"""
+    Interfaccia a riga di comando del pacchetto, pensata per l'esecuzione pianificata (es. cron) senza notebook:
+        python -m itacovid update --path /dati --source kaggle
+        python -m itacovid snapshot --path /dati --output-dir /dati/snapshot
+        python -m itacovid analyze --path /dati --regions Veneto Lazio --months aprile --save aprile-2020
+        python -m itacovid charts --path /dati --charts line bar --regions Veneto --output-dir /dati/grafici
+    Tutti i percorsi vengono indicati come opzioni, senza file di configurazione; i grafici vengono generati senza
+    interfaccia grafica e la cache del dataset (vedi read_covid_dataset) viene riutilizzata tra un'esecuzione e l'altra.
+
+    Codici di uscita:
+        0 esecuzione riuscita;
+        1 errore imprevisto;
+        2 argomenti non validi;
+        3 dati richiesti non validi (regione, mese, periodo, colonna, identificativo dei risultati, ...);
+        4 file o sorgente dei dati non disponibile.
+"""
+import argparse
+import json
+import os
+import sys
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_INVALID_INPUT = 3
+EXIT_IO = 4
+
+
+def _add_dataset_options(parser):
+    parser.add_argument('--path', default=None, help='cartella del file csv (di default la cartella corrente)')
+    parser.add_argument('--name', default=None, help='nome del file csv (di default covid19_italy_region.csv)')
+    parser.add_argument('--no-cache', action='store_true', help='non utilizza la cache del dataset elaborato')
+    parser.add_argument('--cache-dir', default=None, help='cartella della cache (di default .itacovid_cache)')
+    parser.add_argument('--snapshot', default=None,
+                        help='legge il dataset dallo snapshot indicato (vedi write_snapshot) anzichè dal file csv')
+
+
+def _add_subset_options(parser):
+    parser.add_argument('--regions', nargs='+', help='regioni da selezionare')
+    parser.add_argument('--months', nargs='+', help='mesi da selezionare (in italiano)')
+    parser.add_argument('--period', nargs=2, metavar=('INIZIO', 'FINE'), help="periodo da selezionare ('gg/mm/aaaa')")
+
+
+def _read_dataset(args):
+    if getattr(args, 'snapshot', None) is not None:
+        from .snapshot import open_snapshot
+        return open_snapshot(args.snapshot)
+    from .get_dataset import read_covid_dataset
+    return read_covid_dataset(args.path, args.name, use_cache=not args.no_cache, cache_dir=args.cache_dir)
+
+
+def _subset_spec(args):
+    return {'regions': args.regions, 'months': args.months, 'period': args.period}
+
+
+def _subset(args, df):
+    from .query import Query
+    return Query.from_spec(_subset_spec(args)).execute(df)
+
+
+def _source(value):
+    from .sources import KaggleSource, LocalSource, HttpSource
+    if value == 'kaggle':
+        return KaggleSource()
+    if value.startswith(('http://', 'https://')):
+        return HttpSource(value)
+    return LocalSource(value)
+
+
+def _write_output(text, output):
+    if output is None:
+        sys.stdout.write(text + '\n')
+    else:
+        with open(output, 'w') as f_obj:
+            f_obj.write(text)
+
+
+def cmd_download(args):
+    from .get_dataset import download_covid_dataset
+    download_covid_dataset(args.path, args.name)
+    return EXIT_OK
+
+
+def cmd_update(args):
+    from .update import update_covid_dataset
+    new_rows = update_covid_dataset(_source(args.source), args.path, args.name, use_cache=not args.no_cache,
+                                    cache_dir=args.cache_dir)
+    print('Righe aggiunte: ' + str(len(new_rows)))
+    return EXIT_OK
+
+
+def cmd_read(args):
+    from .schema import memory_usage
+    df = _subset(args, _read_dataset(args))
+    info = {'righe': len(df),
+            'regioni': int(df['denominazione_regione'].nunique()),
+            'data minima': None if df.empty else df['data'].min().strftime('%d/%m/%Y'),
+            'data massima': None if df.empty else df['data'].max().strftime('%d/%m/%Y'),
+            'memoria (byte)': int(memory_usage(df))}
+    if args.csv is not None:
+        df.to_csv(args.csv)
+    _write_output(json.dumps(info, indent=2, ensure_ascii=False), args.output)
+    return EXIT_OK
+
+
+def cmd_snapshot(args):
+    from .snapshot import write_snapshot
+    print(write_snapshot(_read_dataset(args), args.output_dir))
+    return EXIT_OK
+
+
+def cmd_analyze(args):
+    from .analyzer import Analyzer
+    if args.cache_results is not None:
+        from .result_cache import set_analyze_cache
+        set_analyze_cache(directory=args.cache_results)
+    analyzer = Analyzer(args.results_path, args.results_name)
+    results = analyzer.analyze(_subset(args, _read_dataset(args)), statistics=args.statistics)
+    if args.save is not None:
+        # salvo direttamente nell'archivio per ottenere l'errore (e il codice di uscita) in caso di identificativo duplicato
+        analyzer.results_store.save(results, args.save)
+    _write_output(json.dumps(results, indent=2, ensure_ascii=False, default=float), args.output)
+    return EXIT_OK
+
+
+def cmd_results(args):
+    from .analyzer import Analyzer
+    analyzer = Analyzer(args.results_path, args.results_name)
+    results = analyzer.load_results(args.id, args.period_label, args.regions)
+    if args.output is None:
+        sys.stdout.write(results.to_string() + '\n')
+    else:
+        results.to_csv(args.output)
+    return EXIT_OK
+
+
+def cmd_charts(args):
+    from .report import render_report
+    spec = _subset_spec(args)
+    if args.label is not None:
+        spec['name'] = args.label
+    jobs = [(chart, spec) for chart in args.charts]
+    paths = render_report(_read_dataset(args), jobs, args.output_dir, formats=args.formats, processes=args.processes)
+    for files in paths:
+        for file_path in files:
+            print(file_path)
+    return EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='itacovid', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trace', default=None, help='salva in formato JSON i tempi di ogni fase (vedi profile)')
+    commands = parser.add_subparsers(dest='command', metavar='COMANDO')
+    commands.required = True
+
+    download = commands.add_parser('download', help='scarica il dataset da Kaggle')
+    download.add_argument('--path', default=None)
+    download.add_argument('--name', default=None)
+    download.set_defaults(func=cmd_download)
+
+    update = commands.add_parser('update', help='aggiunge al file locale solo le righe nuove')
+    _add_dataset_options(update)
+    update.add_argument('--source', default='kaggle',
+                        help="'kaggle', l'indirizzo http(s) del file o di un mirror (terminato da '/') oppure la cartella "
+                             "o il file csv di un mirror locale")
+    update.set_defaults(func=cmd_update)
+
+    read = commands.add_parser('read', help='legge il dataset (o un suo sottoinsieme) e ne stampa un riepilogo')
+    _add_dataset_options(read)
+    _add_subset_options(read)
+    read.add_argument('--csv', default=None, help='salva le righe selezionate nel file csv indicato')
+    read.add_argument('--output', default=None, help='file in cui salvare il riepilogo in formato JSON')
+    read.set_defaults(func=cmd_read)
+
+    snapshot = commands.add_parser('snapshot', help='pubblica il dataset elaborato come snapshot mappabile in memoria')
+    _add_dataset_options(snapshot)
+    snapshot.add_argument('--output-dir', required=True, help='cartella dello snapshot')
+    snapshot.set_defaults(func=cmd_snapshot)
+
+    analyze = commands.add_parser('analyze', help='calcola le statistiche per regione')
+    _add_dataset_options(analyze)
+    _add_subset_options(analyze)
+    analyze.add_argument('--statistics', nargs='+', default=None, help="statistiche da calcolare (es. max min mean q75)")
+    analyze.add_argument('--save', metavar='ID', default=None, help='salva i risultati con l\'identificativo indicato')
+    analyze.add_argument('--results-path', default=None, help='cartella dell\'archivio dei risultati')
+    analyze.add_argument('--results-name', default=None, help='nome del file dei risultati')
+    analyze.add_argument('--output', default=None, help='file in cui salvare i risultati in formato JSON')
+    analyze.add_argument('--cache-results', default=None,
+                         help='cartella della cache su disco dei risultati, riutilizzata tra un\'esecuzione e l\'altra')
+    analyze.set_defaults(func=cmd_analyze)
+
+    results = commands.add_parser('results', help='legge i risultati salvati')
+    results.add_argument('--results-path', default=None)
+    results.add_argument('--results-name', default=None)
+    results.add_argument('--id', nargs='+', default=None, help='identificativi da leggere')
+    results.add_argument('--period-label', nargs='+', default=None, help="periodi da leggere ('gg/mm/aaaa - gg/mm/aaaa')")
+    results.add_argument('--regions', nargs='+', default=None)
+    results.add_argument('--output', default=None, help='file csv in cui salvare i risultati')
+    results.set_defaults(func=cmd_results)
+
+    charts = commands.add_parser('charts', help='genera i grafici senza interfaccia grafica')
+    _add_dataset_options(charts)
+    _add_subset_options(charts)
+    charts.add_argument('--charts', nargs='+', required=True, help='grafici da generare (es. line bar barh)')
+    charts.add_argument('--output-dir', required=True)
+    charts.add_argument('--formats', nargs='+', default=['png'], choices=['png', 'svg'])
+    charts.add_argument('--processes', type=int, default=1)
+    charts.add_argument('--label', default=None, help='nome del sottoinsieme nei nomi dei file')
+    charts.set_defaults(func=cmd_charts)
+
+    return parser
+
+
+def _exit_code(error):
+    if isinstance(error, (OSError, ImportError)):
+        # ImportError: pacchetto kaggle non installato
+        return EXIT_IO
+    if isinstance(error, ValueError):
+        # tutte le eccezioni del pacchetto sui dati richiesti (RegionError, PeriodError, DuplicatedStringError, ...)
+        return EXIT_INVALID_INPUT
+    return EXIT_ERROR
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    # senza display: matplotlib legge il backend dalla variabile d'ambiente al momento dell'import
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+
+    try:
+        if args.trace is None:
+            return args.func(args)
+        from .instrumentation import profile
+        with profile() as trace:
+            try:
+                return args.func(args)
+            finally:
+                trace.save(args.trace)
+    except Exception as error:
+        sys.stderr.write('Errore: ' + type(error).__name__ + ': ' + str(error) + '\n')
+        return _exit_code(error)
@@ -0,0 +1,236 @@
+import numpy as np
+import pandas as pd
+from .aggregation import StatisticError, MERGEABLE_STATISTICS, analysis_columns, normalize_statistics
+from .deltas import WindowError
+from .query import as_frame
+from .resample import _check_frequency
+from .subset import _check_regions, _parse_period, _check_period
+from .instrumentation import instrumented, stage
+
+
+def _check_statistics(statistics):
+    statistics = normalize_statistics(statistics)
+    for name, label in statistics:
+        if name not in MERGEABLE_STATISTICS:
+            raise StatisticError('La statistica "' + label + '" non è disponibile nel cubo! Statistiche '
+                                 'disponibili:\n' + str(list(MERGEABLE_STATISTICS)))
+    return statistics
+
+
+def _prefix(values, dtype):
+    prefix = np.zeros(len(values) + 1, dtype=dtype)
+    np.cumsum(values, out=prefix[1:])
+    return prefix
+
+
+def _sparse_table(values, function):
+    """
+        Tabella sparsa per minimo o massimo su intervalli: il livello j contiene in posizione i il risultato sulle righe
+        [i, i + 2^j). Le posizioni finali di ogni livello (dove l'intervallo uscirebbe dall'array) non vengono mai lette.
+    """
+    levels = [values]
+    span = 1
+    while 2 * span <= len(values):
+        previous = levels[-1]
+        level = previous.copy()
+        level[:len(values) - 2 * span + 1] = function(previous[:len(values) - 2 * span + 1],
+                                                      previous[span:len(values) - span + 1])
+        levels.append(level)
+        span *= 2
+    return np.stack(levels)
+
+
+class StatisticsCube():
+    """
+        Cubo delle statistiche per regione costruito con un unico ordinamento del dataframe (per regione e per data), da
+        cui si ottengono le statistiche di Analyzer.analyze su qualunque finestra temporale senza rileggere i dati:
+            - conteggio, somma, media e deviazione standard dalle somme cumulative (prefix sum) di valori e quadrati,
+              in tempo costante per finestra;
+            - minimo e massimo da una tabella sparsa (sparse table), in tempo costante per finestra;
+            - gli estremi di una finestra di date si trovano con una ricerca binaria (O(log n)).
+        Sono disponibili le statistiche che si possono calcolare a blocchi: massimo, minimo, media, deviazione standard,
+        somma e conteggio.
+        Esempio:
+            cube = StatisticsCube(df)
+            cube.window('01/04/2020', '30/04/2020', regions=['Veneto'])  # come analyze(subset_by_period(...))
+            cube.rolling(7)                                              # finestre mobili di 7 giorni
+            cube.calendar('W')                                           # settimane di calendario
+    """
+    @instrumented('StatisticsCube')
+    def __init__(self, df, columns=None, by='denominazione_regione', date='data'):
+        df = as_frame(df)
+        self.by = by
+        self.date = date
+        self.columns = analysis_columns(df) if columns is None else list(columns)
+
+        with stage('cube_sort', len(df)):
+            # i gruppi mantengono l'ordine con cui compaiono nel dataframe, come in analyze
+            codes, groups = pd.factorize(df[by])
+            dates = df[date].to_numpy()
+            days = dates.astype('datetime64[D]').astype(np.int64)
+            order = np.lexsort((days, codes))
+            self.groups = list(groups)
+            self._codes = codes[order]
+            self._dates = dates[order]
+            self._days = days[order]
+            self._positions = order
+            self._bounds = np.searchsorted(self._codes, np.arange(len(self.groups) + 1))
+            # chiave unica (gruppo, giorno) crescente: i giorni di ogni gruppo occupano un intervallo distinto della chiave
+            self._day0 = int(self._days.min()) if len(days) else 0
+            self._span = int(self._days.max()) - self._day0 + 2 if len(days) else 1
+            self._key = self._codes.astype(np.int64) * self._span + (self._days - self._day0)
+
+        with stage('cube_build', len(df)):
+            self._tables = {column: self._build_column(df[column].to_numpy()[order]) for column in self.columns}
+
+    def _build_column(self, values):
+        is_float = pd.api.types.is_float_dtype(values.dtype)
+        valid = ~np.isnan(values) if is_float else np.ones(len(values), dtype=bool)
+        filled = np.where(valid, values, 0)
+
+        # i quadrati vengono accumulati sugli scarti dalla media della regione, per limitare gli errori di arrotondamento;
+        # per le colonne intere scarti e quadrati sono interi e le somme cumulative esatte
+        counts = np.bincount(self._codes, weights=valid, minlength=len(self.groups))
+        sums = np.bincount(self._codes, weights=filled, minlength=len(self.groups))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shift = np.where(counts > 0, sums / counts, 0.0)[self._codes]
+        if is_float:
+            deviations, dtype = np.where(valid, values - shift, 0.0), np.float64
+        else:
+            deviations, dtype = values.astype(np.int64) - np.rint(shift).astype(np.int64), np.int64
+
+        # per minimo e massimo ignoro i valori mancanti (fmin, fmax) come fa pandas
+        minimum, maximum = (np.fmin, np.fmax) if is_float else (np.minimum, np.maximum)
+        return {'count': _prefix(valid, np.int64),
+                'sum': _prefix(filled, np.float64 if is_float else np.int64),
+                'deviation': _prefix(deviations, dtype),
+                'square': _prefix(deviations ** 2, dtype),
+                'min': _sparse_table(values, minimum),
+                'max': _sparse_table(values, maximum)}
+
+    def _query(self, first, last, statistics):
+        """
+            Statistiche delle finestre di righe [first, last) (array di posizioni nell'ordinamento del cubo, finestre
+            non vuote e interne a un solo gruppo). Restituisce un dizionario {(etichetta, colonna): array dei valori}.
+        """
+        length = last - first
+        level = np.floor(np.log2(np.maximum(length, 1))).astype(np.int64)
+        tail = last - (1 << level)
+        names = dict(statistics)
+        values = {}
+        for column, table in self._tables.items():
+            count = table['count'][last] - table['count'][first]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                stats = {'count': count}
+                if 'sum' in names or 'mean' in names:
+                    stats['sum'] = table['sum'][last] - table['sum'][first]
+                    stats['mean'] = np.where(count > 0, stats['sum'] / count, np.nan)
+                if 'std' in names:
+                    deviation = (table['deviation'][last] - table['deviation'][first]).astype(np.float64)
+                    square = (table['square'][last] - table['square'][first]).astype(np.float64)
+                    variance = np.maximum(count * square - deviation ** 2, 0) / (count * (count - 1))
+                    stats['std'] = np.where(count > 1, np.sqrt(variance), np.nan)
+            # minimo e massimo: due intervalli di lunghezza 2^level (sovrapposti) che coprono la finestra
+            if 'min' in names:
+                stats['min'] = np.fmin(table['min'][level, first], table['min'][level, tail])
+            if 'max' in names:
+                stats['max'] = np.fmax(table['max'][level, first], table['max'][level, tail])
+            for name, label in statistics:
+                values[(label, column)] = stats[name]
+        return values
+
+    def _day(self, value):
+        return int(np.datetime64(value, 'D').astype(np.int64)) - self._day0
+
+    @property
+    def min_date(self):
+        return pd.Timestamp(np.datetime64(int(self._days.min()), 'D')).date()
+
+    @property
+    def max_date(self):
+        return pd.Timestamp(np.datetime64(int(self._days.max()), 'D')).date()
+
+    def window(self, start, end, regions=None, statistics=None):
+        """
+            Restituisce le statistiche del periodo indicato (formato 'gg/mm/aaaa', estremi compresi) con la stessa
+            struttura del dizionario di Analyzer.analyze: il risultato coincide con quello di
+            analyzer.analyze(subset_by_period(df, start, end)), eventualmente filtrato per regione, ma viene calcolato
+            con due ricerche binarie per regione invece di una scansione del dataframe.
+        """
+        statistics = _check_statistics(statistics)
+        start, end = _parse_period(start, end)
+        _check_period(start, end, self.min_date, self.max_date)
+        if regions is None:
+            codes = np.arange(len(self.groups))
+        else:
+            regions = list(map(lambda x: x.capitalize(), regions))
+            _check_regions(regions, np.array(self.groups))
+            codes = np.array([self.groups.index(region) for region in dict.fromkeys(regions)])
+
+        base = codes.astype(np.int64) * self._span
+        first = np.searchsorted(self._key, base + self._day(start), side='left')
+        last = np.searchsorted(self._key, base + self._day(end), side='right')
+        non_empty = last > first
+        if not non_empty.any():
+            raise ValueError('Nessun dato da analizzare!')
+        codes, first, last = codes[non_empty], first[non_empty], last[non_empty]
+        # regioni nell'ordine in cui compaiono nelle righe del periodo, come in analyze
+        appearance = np.argsort(self._positions[first], kind='stable')
+        codes, first, last = codes[appearance], first[appearance], last[appearance]
+
+        values = {key: array.tolist() for key, array in self._query(first, last, statistics).items()}
+        dict_with_results = {}
+        for i, code in enumerate(codes):
+            dict_with_results[self.groups[code]] = {label: {column: values[(label, column)][i] for column in self.columns}
+                                                    for _, label in statistics}
+
+        # periodo come in analyze: "data massima - data minima" delle righe selezionate
+        max_day, min_day = self._days[last - 1].max(), self._days[first].min()
+        dict_with_results['periodo'] = (pd.Timestamp(np.datetime64(int(max_day), 'D')).strftime('%d/%m/%Y') + ' - ' +
+                                        pd.Timestamp(np.datetime64(int(min_day), 'D')).strftime('%d/%m/%Y'))
+        return dict_with_results
+
+    def _frame(self, first, last, index, statistics):
+        values = self._query(first, last, statistics)
+        columns = pd.MultiIndex.from_tuples(list(values), names=['statistica', 'colonna'])
+        return pd.DataFrame(values, index=index, columns=columns)
+
+    def rolling(self, days=7, statistics=None):
+        """
+            Restituisce per ogni regione e per ogni data le statistiche degli ultimi "days" giorni di calendario (giorno
+            corrente compreso), ad esempio 7, 14 o 28. Come in rolling_window, se mancano dei giorni le statistiche vengono
+            calcolate sui soli valori disponibili.
+            Il dataframe restituito ha indice (regione, data) e colonne (statistica, colonna), es.
+                cube.rolling(14)['valori medi']['nuovi_positivi']
+        """
+        if int(days) < 1:
+            raise WindowError('La finestra deve essere di almeno un giorno!')
+        statistics = _check_statistics(statistics)
+        # l'inizio della finestra non può precedere la prima riga della regione
+        first = np.maximum(np.searchsorted(self._key, self._key - int(days) + 1, side='left'),
+                           self._bounds[self._codes])
+        last = np.arange(1, len(self._key) + 1)
+        return self._frame(first, last, self._index(self._dates), statistics)
+
+    def calendar(self, freq='M', statistics=None):
+        """
+            Restituisce per ogni regione le statistiche di ogni settimana ('W'), mese ('M') o anno ('Y') di calendario.
+            Il dataframe restituito ha indice (regione, primo giorno del periodo) e colonne (statistica, colonna).
+        """
+        _check_frequency(freq)
+        statistics = _check_statistics(statistics)
+        dates = pd.DatetimeIndex(self._days.astype('datetime64[D]'))
+        period_starts = dates.to_period(freq).start_time.to_numpy().astype('datetime64[D]').astype(np.int64)
+
+        # un blocco di righe per ogni coppia (regione, periodo): le righe sono già ordinate per regione e per data, per
+        # cui un blocco inizia dove cambia la regione o l'inizio del periodo (confrontati separatamente: il primo
+        # periodo può iniziare prima del primo giorno dei dati)
+        changes = (self._codes[1:] != self._codes[:-1]) | (period_starts[1:] != period_starts[:-1])
+        first = np.flatnonzero(np.concatenate(([True], changes)))
+        last = np.append(first[1:], len(period_starts))
+        starts = period_starts[first].astype('datetime64[D]').astype('datetime64[ns]')
+        return self._frame(first, last, self._index(starts, first), statistics)
+
+    def _index(self, dates, positions=None):
+        codes = self._codes if positions is None else self._codes[positions]
+        return pd.MultiIndex.from_arrays([pd.Categorical.from_codes(codes, self.groups), dates], names=[self.by, self.date])
@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from .get_dataset import read_covid_dataset
+from .subset import _check_regions, _check_provinces, _month_numbers, _parse_period, _check_period
+
+
+class CovidDataset():
+    """
+        Dataset con gli indici per regione e per data costruiti una sola volta al caricamento, in modo che i filtri per
+        regione, mese e periodo diventino delle ricerche (slice o posizioni già note) anzichè una scansione completa
+        del dataframe.
+            - le righe sono ordinate per data (come nel file originale di Kaggle);
+            - per ogni regione (e, nel dataset delle province, per ogni provincia) vengono memorizzate le posizioni delle
+              sue righe;
+            - per ogni mese di ogni anno vengono memorizzati l'inizio e la fine del corrispondente blocco di righe.
+        Le funzioni subset_by_region, subset_by_month e subset_by_period accettano anche un oggetto CovidDataset e in
+        quel caso utilizzano gli indici. Il dataframe filtrato mantiene l'ordine cronologico delle righe.
+        Esempio:
+            dataset = CovidDataset.read('/Users/user_name/Desktop', 'covid_dataset')
+            veneto_df = subset_by_region(dataset, 'Veneto')
+    """
+    def __init__(self, df):
+        dates = df['data'].to_numpy()
+        if not (dates[1:] >= dates[:-1]).all():
+            order = np.argsort(dates, kind='stable')
+            df = df.iloc[order]
+            dates = dates[order]
+        self.df = df
+        self._dates = dates
+
+        # posizioni delle righe di ogni regione (quelle delle province vengono calcolate al primo utilizzo)
+        self._group_positions = {}
+        self._region_positions = self.group_positions('denominazione_regione')
+
+        # inizio e fine dei blocchi di righe di ciascun mese (anno compreso), nell'ordine cronologico
+        year_months = dates.astype('datetime64[M]')
+        unique_months = np.unique(year_months)
+        starts = np.searchsorted(year_months, unique_months, side='left')
+        ends = np.searchsorted(year_months, unique_months, side='right')
+        month_numbers = unique_months.astype(np.int64) % 12 + 1
+        self._month_blocks = list(zip(month_numbers.tolist(), starts.tolist(), ends.tolist()))
+
+    @classmethod
+    def read(cls, path=None, name=None, **kwargs):
+        """
+            Carica il dataset con read_covid_dataset (stessi argomenti) e costruisce gli indici.
+        """
+        return cls(read_covid_dataset(path, name, **kwargs))
+
+    def group_positions(self, column):
+        """
+            Restituisce un dizionario {nome: posizioni (ordinate) delle righe} per la colonna indicata (regione o
+            provincia), calcolato una sola volta: un ordinamento stabile per codice mantiene le posizioni crescenti, per
+            cui il costo non dipende dal numero dei gruppi.
+        """
+        positions = self._group_positions.get(column)
+        if positions is None:
+            codes, groups = pd.factorize(self.df[column])
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(groups) + 1))
+            positions = {group: order[bounds[i]:bounds[i + 1]] for i, group in enumerate(groups)}
+            self._group_positions[column] = positions
+        return positions
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def regions(self):
+        return list(self._region_positions)
+
+    @property
+    def provinces(self):
+        return list(self.group_positions('denominazione_provincia'))
+
+    @property
+    def min_date(self):
+        return pd.Timestamp(self._dates[0]).date()
+
+    @property
+    def max_date(self):
+        return pd.Timestamp(self._dates[-1]).date()
+
+    def region_positions(self, *regions):
+        """
+            Restituisce le posizioni (ordinate) delle righe delle regioni indicate.
+        """
+        regions = list(map(lambda x: x.capitalize(), regions))
+        _check_regions(regions, np.array(self.regions))
+        return self._positions(self._region_positions, regions)
+
+    def province_positions(self, *provinces):
+        """
+            Restituisce le posizioni (ordinate) delle righe delle province indicate (solo per il dataset delle province).
+        """
+        provinces = list(map(lambda x: x.capitalize(), provinces))
+        positions = self.group_positions('denominazione_provincia')
+        _check_provinces(provinces, list(positions))
+        return self._positions(positions, provinces)
+
+    @staticmethod
+    def _positions(group_positions, names):
+        positions = [group_positions[name] for name in dict.fromkeys(names)]
+        if len(positions) == 1:
+            return positions[0]
+        return np.sort(np.concatenate(positions))
+
+    def month_positions(self, *months):
+        """
+            Restituisce le posizioni (ordinate) delle righe dei mesi indicati, di qualunque anno.
+        """
+        month_numbers = set(_month_numbers(months))
+        blocks = [np.arange(start, end) for month, start, end in self._month_blocks if month in month_numbers]
+        if not blocks:
+            return np.arange(0)
+        return np.concatenate(blocks)
+
+    def period_bounds(self, start, end):
+        """
+            Restituisce la posizione della prima riga e quella successiva all'ultima riga del periodo indicato
+            (formato 'gg/mm/aaaa', estremi compresi).
+        """
+        start, end = _parse_period(start, end)
+        _check_period(start, end, self.min_date, self.max_date)
+        first = np.searchsorted(self._dates, np.datetime64(start), side='left')
+        last = np.searchsorted(self._dates, np.datetime64(end + timedelta(days=1)), side='left')
+        return int(first), int(last)
+
+    def by_region(self, *regions):
+        """
+            Equivalente di subset_by_region: restituisce solo le righe già note delle regioni indicate.
+        """
+        return self.df.iloc[self.region_positions(*regions)]
+
+    def by_province(self, *provinces):
+        """
+            Equivalente di subset_by_province: restituisce solo le righe già note delle province indicate.
+        """
+        return self.df.iloc[self.province_positions(*provinces)]
+
+    def by_month(self, *months):
+        """
+            Equivalente di subset_by_month: restituisce i blocchi di righe dei mesi indicati.
+        """
+        return self.df.iloc[self.month_positions(*months)]
+
+    def by_period(self, start, end):
+        """
+            Equivalente di subset_by_period: le righe del periodo sono un unico blocco contiguo trovato con una ricerca binaria.
+        """
+        first, last = self.period_bounds(start, end)
+        return self.df.iloc[first:last]
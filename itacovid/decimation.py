@@ -0,0 +1,93 @@
+import numpy as np
+
+DECIMATION_METHODS = ('lttb', 'minmax')
+# punti minimi per serie: lttb mantiene primo e ultimo punto più almeno un gruppo, minmax almeno un gruppo (minimo e
+# massimo) oltre al primo e all'ultimo punto
+MIN_POINTS = {'lttb': 3, 'minmax': 4}
+
+
+class DecimationError(ValueError):
+    pass
+
+
+def lttb_indices(x, y, n_out):
+    """
+        Algoritmo Largest-Triangle-Three-Buckets: restituisce le posizioni degli n_out punti della serie (x, y) che ne
+        conservano meglio la forma. Il primo e l'ultimo punto vengono sempre mantenuti; i punti intermedi vengono divisi
+        in n_out - 2 gruppi e di ogni gruppo viene scelto il punto che forma il triangolo di area massima con il punto
+        scelto nel gruppo precedente e con la media del gruppo successivo.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    edges = np.append(edges, n)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2]
+        mean_x, mean_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs((x[previous] - mean_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (mean_y - y[previous]))
+        previous = start + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        selected[i + 1] = previous
+    return selected
+
+
+def minmax_indices(y, n_buckets):
+    """
+        Divide la serie in n_buckets gruppi di punti consecutivi (es. uno per colonna di pixel) e restituisce le posizioni
+        del minimo e del massimo di ogni gruppo, oltre al primo e all'ultimo punto: i picchi non vengono mai persi.
+    """
+    n = len(y)
+    if 2 * n_buckets >= n or n_buckets < 1:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    buckets = np.repeat(np.arange(n_buckets), np.diff(np.linspace(0, n, n_buckets + 1).astype(np.int64)))
+    # ordinando per (gruppo, valore) il minimo di ogni gruppo è il primo elemento e il massimo l'ultimo
+    order = np.lexsort((y, buckets))
+    starts = np.searchsorted(buckets[order], np.arange(n_buckets), side='left')
+    ends = np.searchsorted(buckets[order], np.arange(n_buckets), side='right') - 1
+    return np.unique(np.concatenate(([0, n - 1], order[starts], order[ends])))
+
+
+def decimate(df, max_points, method='lttb'):
+    """
+        La funzione riduce il numero di righe di un dataframe di serie temporali (indice: date, una colonna per serie)
+        prima di disegnarlo, senza modificarne la forma:
+            - 'lttb': per ogni serie vengono scelti i punti con l'algoritmo Largest-Triangle-Three-Buckets;
+            - 'minmax': per ogni serie vengono mantenuti il minimo e il massimo di gruppi di punti consecutivi.
+        Vengono mantenute le righe scelte per almeno una serie, così tutte le serie restano allineate sulle stesse date:
+        max_points viene diviso tra le serie, per cui il dataframe restituito (e quindi ogni linea del grafico) ha al
+        massimo max_points righe.
+        Se il dataframe ha al massimo max_points righe viene restituito invariato.
+    """
+    if method not in DECIMATION_METHODS:
+        raise DecimationError('Metodo non disponibile: ' + str(method) + '! Per favore inserisci uno dei seguenti '
+                              'metodi:\n' + str(list(DECIMATION_METHODS)))
+    if max_points is None or len(df) <= max_points:
+        return df
+
+    n_series = max(len(df.columns), 1)
+    points = max_points // n_series
+    if points < MIN_POINTS[method]:
+        raise DecimationError('Con ' + str(n_series) + ' serie il metodo ' + method + ' richiede almeno ' +
+                              str(MIN_POINTS[method] * n_series) + ' punti (max_points)!')
+
+    x = df.index.to_numpy()
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('datetime64[ns]').astype(np.int64)
+    positions = []
+    for column in df.columns:
+        y = df[column].to_numpy()
+        if method == 'lttb':
+            positions.append(lttb_indices(x, y, points))
+        else:
+            # minimo e massimo di ogni gruppo, più il primo e l'ultimo punto
+            positions.append(minmax_indices(y, (points - 2) // 2))
+    return df.iloc[np.unique(np.concatenate(positions))]
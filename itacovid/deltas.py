@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+
+class WindowError(ValueError):
+    pass
+
+
+def _sorted_arrays(df, column, by, date):
+    """
+        Ordina le righe per gruppo e per data e restituisce:
+            - l'ordinamento applicato (per riportare i risultati nell'ordine originale del dataframe);
+            - il codice numerico del gruppo, il giorno (come intero) e il valore della colonna, già ordinati.
+        L'ordinamento è l'unica operazione non lineare, tutti i calcoli successivi sono vettoriali sugli array.
+    """
+    codes = pd.factorize(df[by])[0]
+    days = df[date].to_numpy().astype('datetime64[D]').astype(np.int64)
+    order = np.lexsort((days, codes))
+    values = df[column].to_numpy()
+    return order, codes[order], days[order], values[order]
+
+
+def _group_starts(codes):
+    """
+        Restituisce un array booleano che vale True sulla prima riga di ogni gruppo (gli array devono essere ordinati).
+    """
+    starts = np.ones(len(codes), dtype=bool)
+    starts[1:] = codes[1:] != codes[:-1]
+    return starts
+
+
+def _restore_order(order, sorted_values, index, name):
+    result = np.empty_like(sorted_values)
+    result[order] = sorted_values
+    return pd.Series(result, index=index, name=name)
+
+
+def daily_variation(df, column, by='denominazione_regione', date='data'):
+    """
+        La funzione calcola per ogni riga la variazione della colonna indicata rispetto al giorno precedente della stessa
+        regione (o del gruppo indicato in "by"): le righe vengono abbinate in base a regione e data e non in base alla loro
+        posizione nel file, per cui il risultato è corretto anche se mancano dei giorni o l'ordine delle regioni cambia.
+        Per il primo giorno disponibile di ogni regione la variazione vale 0.
+        Restituisce una Series allineata all'indice del dataframe.
+        Esempio:
+            df['variazione_totale_positivi'] = daily_variation(df, 'totale_positivi')
+    """
+    order, codes, _, values = _sorted_arrays(df, column, by, date)
+    variation = np.zeros_like(values)
+    if len(values):
+        variation[1:] = values[1:] - values[:-1]
+        variation[_group_starts(codes)] = 0
+
+    return _restore_order(order, variation, df.index, 'variazione_' + column)
+
+
+def growth_rate(df, column, by='denominazione_regione', date='data'):
+    """
+        La funzione calcola per ogni riga il tasso di crescita della colonna indicata rispetto al giorno precedente della
+        stessa regione: (valore - valore precedente) / valore precedente.
+        Per il primo giorno di ogni regione o se il valore precedente è 0 il risultato è NaN.
+    """
+    order, codes, _, values = _sorted_arrays(df, column, by, date)
+    values = values.astype(np.float64)
+    rate = np.full(len(values), np.nan)
+    if len(values):
+        previous = values[:-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate[1:] = np.where(previous != 0, (values[1:] - previous) / previous, np.nan)
+        rate[_group_starts(codes)] = np.nan
+
+    return _restore_order(order, rate, df.index, 'crescita_' + column)
+
+
+def rolling_window(df, column, window=7, how='sum', by='denominazione_regione', date='data'):
+    """
+        La funzione calcola per ogni riga la somma ('sum') o la media ('mean') della colonna indicata sugli ultimi "window"
+        giorni di calendario (giorno corrente compreso) della stessa regione.
+        La finestra è definita sulle date e non sul numero di righe: se mancano dei giorni la media viene calcolata solo sui
+        valori disponibili. I valori mancanti (NaN) vengono ignorati.
+        Il calcolo usa le somme cumulative per gruppo e una ricerca binaria dell'inizio della finestra.
+        Esempio:
+            df['nuovi_positivi_7gg'] = rolling_window(df, 'nuovi_positivi', window=7, how='mean')
+    """
+    if how not in ('sum', 'mean'):
+        raise WindowError("Il parametro how deve essere 'sum' oppure 'mean'!")
+    if int(window) < 1:
+        raise WindowError('La finestra deve essere di almeno un giorno!')
+    window = int(window)
+
+    order, codes, days, values = _sorted_arrays(df, column, by, date)
+    values = values.astype(np.float64)
+    valid = ~np.isnan(values)
+    if not len(values):
+        return pd.Series(values, index=df.index, name=column + '_' + how + '_' + str(window))
+
+    # chiave unica (gruppo, giorno) crescente: tra un gruppo e il successivo lascio uno spazio maggiore della finestra
+    # così la ricerca dell'inizio della finestra non può mai ricadere nel gruppo precedente
+    days = days - days.min()
+    key = codes.astype(np.int64) * (days.max() + window + 1) + days
+    first = np.searchsorted(key, key - window + 1, side='left')
+    last = np.arange(1, len(key) + 1)
+
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    result = sums[last] - sums[first]
+    if how == 'mean':
+        n_values = counts[last] - counts[first]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = np.where(n_values > 0, result / n_values, np.nan)
+
+    return _restore_order(order, result, df.index, column + '_' + how + '_' + str(window))
@@ -0,0 +1,79 @@
+import os
+import json
+import asyncio
+from .sources import REGION_FILE_NAME, _sha256
+from .instrumentation import stage
+
+
+def _requests(requests):
+    # ogni richiesta è una sorgente (file della regione) oppure una coppia (sorgente, nome del file)
+    return [request if isinstance(request, tuple) else (request, REGION_FILE_NAME) for request in requests]
+
+
+def _read_state(state_path):
+    if state_path is None or not os.path.isfile(state_path):
+        return {}
+    try:
+        with open(state_path) as f_obj:
+            return json.load(f_obj)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_state(state, state_path):
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w') as f_obj:
+        json.dump(state, f_obj, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+async def fetch_async(source, file_name=REGION_FILE_NAME):
+    """
+        Versione asincrona di source.fetch: se la sorgente non definisce un proprio metodo fetch_async, il download
+        (bloccante) viene eseguito in un thread, così più sorgenti possono essere scaricate contemporaneamente.
+    """
+    if hasattr(source, 'fetch_async'):
+        return await source.fetch_async(file_name)
+    return await asyncio.to_thread(source.fetch, file_name)
+
+
+async def fetch_all_async(requests, state_path=None, max_concurrency=4):
+    """
+        Versione asincrona di fetch_all, da utilizzare all'interno di un ciclo di eventi già attivo.
+    """
+    requests = _requests(requests)
+    state = _read_state(state_path)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch_one(source, file_name):
+        async with semaphore:
+            file_path = await fetch_async(source, file_name)
+            sha256 = await asyncio.to_thread(_sha256, file_path)
+        key = source.key(file_name)
+        return {'key': key, 'file_name': file_name, 'path': file_path, 'sha256': sha256,
+                'changed': state.get(key) != sha256}
+
+    with stage('fetch', len(requests)) as current:
+        results = await asyncio.gather(*(fetch_one(source, file_name) for source, file_name in requests))
+        current.rows_out = sum(result['changed'] for result in results)
+
+    if state_path is not None:
+        state.update({result['key']: result['sha256'] for result in results})
+        _write_state(state, state_path)
+    return results
+
+
+def fetch_all(requests, state_path=None, max_concurrency=4):
+    """
+        La funzione recupera contemporaneamente (al massimo max_concurrency alla volta) i file richiesti da una o più
+        sorgenti (vedi sources: KaggleSource, HttpSource, LocalSource). Ogni richiesta è una sorgente, per il file delle
+        regioni, oppure una coppia (sorgente, nome del file).
+        Restituisce, nello stesso ordine delle richieste, un dizionario per file con percorso locale ('path'), hash sha256
+        del contenuto ('sha256') e 'changed', che indica se il contenuto è cambiato rispetto al recupero precedente:
+        gli hash vengono memorizzati nel file JSON state_path (se indicato), così i file invariati possono essere saltati.
+        Esempio:
+            results = fetch_all([HttpSource('https://mirror.example.org/covid/'), LocalSource('/Users/user_name/mirror')],
+                                state_path='/Users/user_name/Desktop/fetch_state.json')
+            changed = [result['path'] for result in results if result['changed']]
+    """
+    return asyncio.run(fetch_all_async(requests, state_path, max_concurrency))
@@ -1,6 +1,10 @@
 import os
 import pandas as pd
 from .check_csv_extension import check_csv_extension
+from .deltas import daily_variation
+from .schema import REGION_SCHEMA, optimize_dtypes, expand_dtypes
+from .cache import default_cache_dir, load_cached_frame, store_cached_frame
+from .instrumentation import instrumented, stage
 
 def my_kaggle_api(username, key):
     """
@@ -25,29 +29,86 @@ def download_covid_dataset(path=None, name=None):
             download_covid_dataset(path='C:/Users/user_name/Desktop', name='covid_dataset.csv')
             download_covid_dataset(path='C:\\Users\\User_name\\Desktop', name='covid_dataset.csv')
     """
-    from kaggle.api.kaggle_api_extended import KaggleApi
-    #Ho inserito qui l'import delle API di Kaggle perchè voglio che vengano importate solo se si tenta un download.
+    from .sources import KaggleSource
+    #Le API di Kaggle vengono importate da KaggleSource solo se si tenta un download.
     #Se il file su cui si vuole lavorare è già in nostro possesso basta richiamare solamente la funzione: read_covid_dataset
     #Inoltre se effettuassi l'import prima di definire le variabili d'ambiente con l'username e key di Kaggle mi darebbe un errore
 
-    api = KaggleApi()
-    api.authenticate()
-
-    #api.dataset_download_file(dataset='sudalairajkumar/covid19-in-italy', file_name='covid19_italy_region.csv', path=path, force=True)
-    #non so perchè ma a volte con questa funzione il file scaricato ha un nome diverso
-    api.dataset_download_files(dataset='sudalairajkumar/covid19-in-italy', path=path, force=True, unzip=True)
-    #non potendo usare la funzione per scaricare il singolo file, rimuovo i file in più scaricati
     if path is None:
         path = os.getcwd()
-    os.remove(os.path.join(path,"covid19_italy_province.csv"))
+    #viene scaricato solo il file delle regioni, non l'intero archivio con anche il file delle province
+    file_path = KaggleSource(download_dir=path).fetch()
 
     if name is not None:
-        os.replace(os.path.join(path, 'covid19_italy_region.csv'), os.path.join(path, check_csv_extension(name)))
+        os.replace(file_path, os.path.join(path, check_csv_extension(name)))
         #in alternativa ci sarebbe anche la possibilità di usare "move" dal modulo shutil: from shutil import move
         #move(os.path.join(path, 'covid19_italy_region.csv'), os.path.join(path, check_csv_extension(name)))
         #uso move anzichè os.rename perche su windows non supporta la svorascrittura del file se già esistente
 
-def read_covid_dataset(path=None, name=None):
+def _dataset_file_path(path, name, default_name=REGION_SCHEMA.file_name):
+    if path is None:
+        path = os.getcwd()
+    if name is None:
+        name = default_name
+    else:
+        name = check_csv_extension(name)
+    return path, os.path.join(path, name)
+
+def _capitalize_regions(regions):
+    """
+        Converte i nomi delle regioni con l'iniziale maiuscola. Se la colonna è di tipo categoria vengono rinominate
+        direttamente le categorie, senza elaborare ogni singola riga.
+    """
+    if isinstance(regions.dtype, pd.CategoricalDtype):
+        new_categories = [c.capitalize() for c in regions.cat.categories]
+        if len(set(new_categories)) == len(new_categories):
+            return regions.cat.rename_categories(new_categories)
+        return regions.astype(str).str.capitalize().astype('category')
+    unique_regions = regions.unique()
+    return regions.replace(dict(zip(unique_regions, list(map(lambda x: x.capitalize(), unique_regions)))))
+
+def _unique_group_names(df, schema):
+    """
+        Nel file delle province le righe non ancora attribuite a una provincia hanno lo stesso nome in tutte le regioni
+        (es. 'In fase di definizione/aggiornamento'): a questi nomi viene aggiunta la regione tra parentesi, così ogni
+        serie è identificata dal solo nome della provincia (es. 'In fase di definizione/aggiornamento (veneto)').
+    """
+    group, parent = schema.group_column, schema.parent_column
+    pairs = df[[parent, group]].drop_duplicates()
+    repeated = pairs.loc[pairs[group].duplicated(keep=False), group].unique()
+    if not len(repeated):
+        return df
+    names = df[group].astype(object)
+    mask = names.isin(repeated)
+    names[mask] = names[mask] + ' (' + df.loc[mask, parent].astype(str) + ')'
+    # di nuovo con l'iniziale maiuscola (e il resto minuscolo), come i nomi inseriti dall'utente nei filtri
+    df[group] = _capitalize_regions(names.astype('category'))
+    return df
+
+def _clean_columns(df, schema=REGION_SCHEMA):
+    """
+        Pulizia delle colonne comune alla lettura completa e a quella a blocchi: le colonne non utilizzate vengono scartate
+        e le date convertite già in lettura (vedi schema.REGION_SCHEMA), qui vengono sostituiti i valori mancanti (es. di
+        casi_testati) e i nomi delle regioni (e delle province) vengono scritti con l'iniziale maiuscola.
+    """
+    for column, value in schema.fill_values.items():
+        if column not in df.columns:
+            continue
+        filled = df[column].fillna(value)
+        if pd.api.types.is_float_dtype(filled.dtype) and (filled % 1 == 0).all():
+            filled = filled.astype('int64')
+        df[column] = filled
+
+    for column in schema.category_columns:
+        if column in df.columns:
+            df[column] = _capitalize_regions(df[column])
+    if schema.parent_column is not None and schema.parent_column in df.columns:
+        df = _unique_group_names(df, schema)
+    return df
+
+@instrumented('read_covid_dataset')
+def read_covid_dataset(path=None, name=None, use_cache=True, cache_dir=None, compact=True, columns=None,
+                       schema=REGION_SCHEMA):
     """
         Inserire sottoforma di stringa l'eventuale percorso e il nome del file (includere l'estensione .csv è opzionale)
         che si vuole caricare in un dataframe.
@@ -59,48 +120,121 @@ def read_covid_dataset(path=None, name=None):
         Esempio in ambiente WINDOWS:
             df=read_covid_dataset('C:/Users/user_name/Desktop', 'covid_dataset')
             df=read_covid_dataset('C:\\Users\\user_name\\Desktop', 'covid_dataset')
+
+        Il dataframe elaborato viene memorizzato in una cache su disco (formato Feather, nella cartella nascosta .itacovid_cache
+        accanto al file csv o in quella indicata con cache_dir) e le letture successive lo caricano direttamente da lì.
+        La cache viene invalidata automaticamente quando il file csv cambia (percorso, dimensione, data di modifica e hash del
+        contenuto). Per disattivarla usare use_cache=False; le statistiche di utilizzo sono restituite da cache_stats().
+        La cache richiede il pacchetto opzionale pyarrow: se non è installato il file viene semplicemente riletto ogni volta.
+
+        Dal file vengono lette solo le colonne necessarie (vedi schema.REGION_SCHEMA), le date vengono convertite in lettura,
+        i nomi delle regioni sono memorizzati come categorie e i conteggi con il tipo intero più piccolo in grado di contenerli.
+        Con compact=False vengono restituiti i tipi di dato "classici" (stringhe e int64).
+        La memoria occupata prima e dopo la conversione si può confrontare con memory_report.
+
+        Con columns si possono indicare le sole colonne di interesse (oltre a data e denominazione_regione, sempre presenti):
+        le altre non vengono lette dal file csv, o dalla cache se disponibile.
+
+        Con schema=PROVINCE_SCHEMA viene letto il file delle province (vedi read_province_dataset).
     """
-    if path is None:
-        path = os.getcwd()
-    if name is None:
-        name = 'covid19_italy_region.csv'
-    else:
-        name = check_csv_extension(name)
+    path, file_path = _dataset_file_path(path, name, schema.file_name)
+
+    usecols = None
+    if columns is not None:
+        usecols = schema.required_columns(columns)
+        # colonne finali: quelle chiave più quelle richieste, nell'ordine del dataframe completo
+        selected = set(schema.key_columns) | set(columns)
+        columns = [c for c in schema.usecols + list(schema.derived_columns) if c in selected]
+
+    df = None
+    if use_cache:
+        if cache_dir is None:
+            cache_dir = default_cache_dir(path)
+        with stage('cache_load') as current:
+            df = load_cached_frame(file_path, cache_dir, columns, schema)
+            current.rows_out = None if df is None else len(df)
+
+    if df is None:
+        # con la cache attiva leggo comunque tutte le colonne, così il file elaborato potrà servire anche le letture successive
+        with stage('parse_csv') as current:
+            # la conversione delle date avviene in lettura (vedi schema.REGION_SCHEMA) ed è compresa in questa fase
+            df = pd.read_csv(file_path, **schema.read_options(None if use_cache else usecols))
+            current.rows_out = len(df)
+        with stage('clean_columns', len(df)) as current:
+            df = _clean_columns(df, schema)
+            current.rows_out = len(df)
+
+        # variazione giornaliera calcolata per regione e per data (vedi deltas.daily_variation)
+        with stage('derived_columns', len(df)) as current:
+            df, _ = _add_derived_columns(df, schema=schema)
+            current.rows_out = len(df)
+        with stage('optimize_dtypes', len(df)) as current:
+            df = optimize_dtypes(df)
+            current.rows_out = len(df)
+
+        if use_cache:
+            with stage('cache_store', len(df)):
+                store_cached_frame(df, file_path, cache_dir, schema)
+
+        if columns is not None:
+            df = df[columns]
+
+    if not compact:
+        df = expand_dtypes(df)
+
+    return df
+
+def read_covid_dataset_chunks(path=None, name=None, chunksize=100000, compact=True, schema=REGION_SCHEMA):
+    """
+        Versione a blocchi di read_covid_dataset, pensata per file troppo grandi per essere caricati interamente in memoria.
+        Restituisce un iteratore di dataframe di al massimo "chunksize" righe, con le stesse colonne e la stessa pulizia
+        del dataframe restituito da read_covid_dataset.
+        La variazione giornaliera dei positivi viene calcolata anche a cavallo tra due blocchi, mantenendo in memoria
+        solamente l'ultima riga di ogni regione: il file deve quindi essere in ordine cronologico come quello di Kaggle.
 
-    df = pd.read_csv(os.path.join(path, name),
-                            names=['sno', 'data', 'stato', 'codice_regione', 'denominazione_regione', 'lat', 'long',
-                                   'ricoverati_con_sintomi', 'terapia_intensiva', 'totale_ospedalizzati',
-                                   'isolamento_domiciliare',
-                                   'totale_positivi', 'nuovi_positivi', 'dimessi_guariti', 'deceduti', 'totale_casi',
-                                   'casi_testati'],
-                            header=0,
-                            index_col='sno')
-
-    df['data'] = pd.to_datetime(df['data'])
-    df = df.fillna({'casi_testati': 0}, downcast='infer')
-    # uso l'opzione downcast='infer' per far sì che in automatico assegni il tipo di dati appropriato
-    df = df.drop(['stato', 'codice_regione', 'lat', 'long'], axis=1)
-
-    def total_variation_of_positives(tot_pos):
-        """
-           Funzione che aggiunge al dataframe la colonna con la variazione giornaliera del numero toatale dei positivi
-        """
-        var_pos = []
-        i = 0
-        n_regions = 21
-        while i < len(tot_pos):
-            if i < 21:
-                var_pos.append(0)
-            else:
-                x = tot_pos[i]
-                y = tot_pos[i - n_regions]
-                var_pos.append(x - y)
-            i += 1
-        return var_pos
-
-    df['variazione_totale_positivi'] = total_variation_of_positives(df['totale_positivi'])
-    unique_regions=df['denominazione_regione'].unique()
-    df['denominazione_regione'] = df['denominazione_regione'].\
-        replace(dict(zip(unique_regions, list(map(lambda x: x.capitalize(), unique_regions)))))
-
-    return df
\ No newline at end of file
+        L'iteratore può essere passato direttamente alle funzioni subset_* e ad Analyzer.analyze.
+        Esempio:
+            chunks = read_covid_dataset_chunks('/Users/user_name/Desktop', 'covid_dataset', chunksize=50000)
+            results = analyzer.analyze(subset_by_region(chunks, 'Veneto'))
+    """
+    _, file_path = _dataset_file_path(path, name, schema.file_name)
+    last_rows = None
+
+    with pd.read_csv(file_path, chunksize=chunksize, **schema.read_options()) as reader:
+        for chunk in reader:
+            with stage('clean_columns', len(chunk)) as current:
+                chunk = _clean_columns(chunk, schema)
+                current.rows_out = len(chunk)
+            with stage('derived_columns', len(chunk)) as current:
+                chunk, last_rows = _add_derived_columns(chunk, last_rows, schema)
+                current.rows_out = len(chunk)
+
+            yield optimize_dtypes(chunk) if compact else chunk
+
+def _add_derived_columns(df, last_rows=None, schema=REGION_SCHEMA):
+    """
+        Aggiunge al dataframe le colonne derivate (variazioni giornaliere) tenendo conto dell'ultima riga di ogni regione
+        già elaborata in precedenza (last_rows), ad esempio nel blocco precedente o nel dataset già memorizzato.
+        Restituisce il dataframe e le nuove "ultime righe" di ogni regione, da usare per il blocco successivo.
+    """
+    sources = [source for source in schema.derived_columns.values() if source in df.columns]
+    key_columns = schema.key_columns + sources
+
+    # aggiungo in testa l'ultima riga di ogni regione del blocco precedente per calcolare la variazione del primo giorno
+    with_previous = pd.concat([last_rows, df[key_columns]], ignore_index=True)
+    n_previous = 0 if last_rows is None else len(last_rows)
+    for derived, source in schema.derived_columns.items():
+        if source in sources:
+            df[derived] = daily_variation(with_previous, source, by=schema.group_column).to_numpy()[n_previous:]
+
+    return df, _last_rows(with_previous, schema)
+
+def _last_rows(df, schema=REGION_SCHEMA):
+    """
+        Restituisce l'ultima riga (in ordine di data) di ogni regione, con le sole colonne necessarie per calcolare le
+        colonne derivate delle righe successive.
+    """
+    sources = [source for source in schema.derived_columns.values() if source in df.columns]
+    df = df[schema.key_columns + sources].reset_index(drop=True)
+    last_positions = df.groupby(schema.group_column, sort=False, observed=True)['data'].idxmax()
+    return df.loc[last_positions.to_numpy()]
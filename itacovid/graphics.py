@@ -1,6 +1,15 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from .preaggregation import daily_totals, latest_snapshot, period_totals
+from .resample import PERIOD_FREQUENCIES, period_labels
+from .decimation import decimate
+from .instrumentation import instrumented
+
+# colonne dei totali giornalieri usate dai grafici a linee
+DAILY_COLUMNS = {'line': ['dimessi_guariti', 'deceduti', 'totale_positivi'],
+                 'line_nuovi_positivi': ['nuovi_positivi'],
+                 'line_variazione_totale_positivi': ['variazione_totale_positivi']}
 
 
 class NotEnoughRegionsError(ValueError):
@@ -11,45 +20,17 @@ class Graphics():
     def __init__(self):
         pass
 
-    @staticmethod
-    def __data_mining_for_barh_and_pie(df):
-        """
-           1. Filtro i dati alla data di ultimo aggiornamento;
-           2. Mantengo solo le colonne d'interesse;
-           3. Setto l'indice sulla colonna denomianzione_regione;
-           4. Ordino in maniera discendente in base al totale dei casi;
-        """
-        df = df[df.data == df.data.max()]
-        df = df[['denominazione_regione', 'totale_positivi', 'dimessi_guariti', 'deceduti', 'totale_casi']]
-        df = df.set_index('denominazione_regione').sort_values('totale_casi', ascending=False)
-
-        return df
-
     @classmethod
-    def bar(cls, df):
+    @instrumented('Graphics.bar')
+    def bar(cls, df, freq='M'):
         """
            Prende in input un dataframe e ritorna un grafico a barre con il numero dei deceduti e il totale dei casi,
-           suddivisi per mese.
+           suddivisi per mese. In via opzionale si possono suddividere per settimana (freq='W') o per anno (freq='Y'):
+           i periodi tengono conto dell'anno, per cui lo stesso mese di anni diversi viene mostrato separatamente.
         """
-        grouped_df=df.groupby([df['data'].dt.strftime("%m"), 'denominazione_regione'])
-        monthly_df=grouped_df.agg({'deceduti': max, 'totale_casi': max}).groupby(['data']).\
-            agg({'deceduti': sum, 'totale_casi': sum})
-
-        def sub_row(row):
-            """
-               Effettua una trasformazione ai dati contenuti nel dataframe sottraendo al valore di ogni riga quello
-               della riga riferita al mese precedente per far si che i valori si riferiscano esclusivamente al mese
-               indicato e non abbiano dati riferiti anche ai mesi precedenti:
-            """
-            new_row = [row[0]]
-            for i in range(1, row.count()):
-                new_row.append(row[i] - row[i - 1])
-            return new_row
-
-        monthly_df['deceduti'] = sub_row(monthly_df['deceduti'])
-        monthly_df['totale_casi'] = sub_row(monthly_df['totale_casi'])
-
-        labels = monthly_df.index.to_numpy()
+        monthly_df = period_totals(df, freq)
+
+        labels = period_labels(monthly_df.index, freq)
         deceased = monthly_df['deceduti'].to_numpy()
         total_cases = monthly_df['totale_casi'].to_numpy()
 
@@ -61,10 +42,10 @@ class Graphics():
         ax.bar(x + width / 2, total_cases, width, label='Totale casi')
 
         # Add some text for labels, title and custom x-axis tick labels, etc.
-        ax.set_title('Deceduti e totale dei casi suddivisi per mese')
+        ax.set_title('Deceduti e totale dei casi suddivisi per ' + PERIOD_FREQUENCIES[freq][1])
         ax.set_xticks(x)
         ax.set_xticklabels(labels)
-        ax.set_xlabel('Mesi')
+        ax.set_xlabel(PERIOD_FREQUENCIES[freq][0])
         ax.legend()
 
         fig.tight_layout()
@@ -72,6 +53,7 @@ class Graphics():
         return fig
 
     @classmethod
+    @instrumented('Graphics.barh')
     def barh(cls, df):
         """
            Prende in input un dataframe e ritorna un grafico a barre orizzantali con i seguenti dati per ogni Regione
@@ -80,7 +62,7 @@ class Graphics():
             - dimessi_guariti
             - deceduti
         """
-        df = cls.__data_mining_for_barh_and_pie(df)
+        df = latest_snapshot(df)
         fig = df.plot.barh(y=['totale_positivi', 'dimessi_guariti', 'deceduti'], stacked=True, figsize=(15, 8))
         plt.close(fig.figure)
         #con plt.close evito di stampare due volte la stessa figura, lascio che stampi la get_figure()
@@ -88,38 +70,47 @@ class Graphics():
         return fig
 
     @classmethod
-    def line(cls, df):
+    @instrumented('Graphics.line')
+    def line(cls, df, max_points=None, method='lttb'):
         """
            Prende in input un dataframe e ritorna un grafico a linee con i seguenti dati per singolo giorno
            presente nel dataframe:
             - totale_positivi
             - dimessi_guariti
             - deceduti
+           In via opzionale si può indicare il numero massimo di punti da disegnare per ogni serie (max_points) e il
+           metodo con cui sceglierli ('lttb' o 'minmax', vedi decimate): tutte le serie vengono disegnate sulle stesse
+           date, al massimo max_points, per cui con serie molto lunghe il tempo di disegno e la dimensione dei file
+           svg restano costanti.
         """
-        fig = df.groupby('data').agg(sum).loc[:,['dimessi_guariti', 'deceduti', 'totale_positivi']].plot(kind='line', figsize=(10,5))
+        fig = decimate(daily_totals(df, DAILY_COLUMNS['line']), max_points, method).plot(kind='line', figsize=(10,5))
         plt.close(fig.figure)
         #con plt.close evito di stampare due volte la stessa figura, lascio che stampi la get_figure()
         fig = fig.get_figure()
         return fig
 
     @classmethod
-    def line_nuovi_positivi(cls, df):
+    @instrumented('Graphics.line_nuovi_positivi')
+    def line_nuovi_positivi(cls, df, max_points=None, method='lttb'):
         """
            Prende in input un dataframe e ritorna un grafico con l'andamento dei nuovi positivi per ogni giorno.
+           Per max_points e method vedi line.
         """
-        fig = df.groupby('data').agg(sum).plot(kind='line', y=['nuovi_positivi'], figsize=(10,5), color='m', linestyle='dashdot', grid=True)
+        fig = decimate(daily_totals(df, DAILY_COLUMNS['line_nuovi_positivi']), max_points, method).plot(kind='line', y=['nuovi_positivi'], figsize=(10,5), color='m', linestyle='dashdot', grid=True)
         plt.close(fig.figure)
         #con plt.close evito di stampare due volte la stessa figura, lascio che stampi la get_figure()
         fig = fig.get_figure()
         return fig
 
     @classmethod
-    def line_variazione_totale_positivi(cls, df):
+    @instrumented('Graphics.line_variazione_totale_positivi')
+    def line_variazione_totale_positivi(cls, df, max_points=None, method='lttb'):
         """
            Prende in input un dataframe e ritorna un grafico con l'andamento dei nuovi positivi per ogni giorno.
+           Per max_points e method vedi line.
         """
         with plt.style.context('dark_background'):
-            fig = df.groupby('data').agg(sum).plot(kind='line', y=['variazione_totale_positivi'], figsize=(10,5),
+            fig = decimate(daily_totals(df, DAILY_COLUMNS['line_variazione_totale_positivi']), max_points, method).plot(kind='line', y=['variazione_totale_positivi'], figsize=(10,5),
               color='orange', linestyle='dotted', linewidth=2, grid=True)
             plt.close(fig.figure)
             # con plt.close evito di stampare due volte la stessa figura, lascio che stampi la get_figure()
@@ -127,6 +118,7 @@ class Graphics():
             return fig
 
     @classmethod
+    @instrumented('Graphics.pie_three_most_affected_regions')
     def pie_three_most_affected_regions(cls, df):
         """
            Prende in input un dataframe e per le prime tre Regioni più colpite in base al totale dei casi ritorna
@@ -135,10 +127,10 @@ class Graphics():
             - dimessi_guariti
             - deceduti
         """
-        if len(df['denominazione_regione'].unique())<3:
+        df = latest_snapshot(df)
+        if len(df) < 3:
             raise NotEnoughRegionsError('Not enough Regions available in the dataframe! Please use another dataframe')
 
-        df = cls.__data_mining_for_barh_and_pie(df)
         df = df.head(3).T.drop('totale_casi',axis=0)
 
         my_colors = ['#227c9d', '#17c3b2', '#ffcb77']
@@ -149,6 +141,7 @@ class Graphics():
         return fig
 
     @classmethod
+    @instrumented('Graphics.nested_pie_three_most_affected_regions')
     def nested_pie_three_most_affected_regions(cls, df):
         """
            Prende in input un dataframe e per le prime tre Regioni più colpite in base al totale dei casi ritorna
@@ -157,10 +150,10 @@ class Graphics():
             - dimessi_guariti
             - deceduti
         """
-        if len(df['denominazione_regione'].unique()) < 3:
+        df = latest_snapshot(df)
+        if len(df) < 3:
             raise NotEnoughRegionsError('Not enough Regions available in the dataframe! Please use another dataframe')
 
-        df = cls.__data_mining_for_barh_and_pie(df)
         nested_df=df.head(3)
         total_cases = nested_df['totale_casi'].to_numpy()
         labels_cases = nested_df.columns[:-1].tolist()
@@ -0,0 +1,231 @@
+import json
+import logging
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+# stato globale della strumentazione: finchè enabled è False le funzioni strumentate non misurano nulla
+# started_tracing: tracemalloc è stato avviato da enable (e va quindi fermato da disable)
+_state = {'enabled': False, 'memory': False, 'started_tracing': False}
+_hooks = []
+_stack = []
+
+
+class _NullStage():
+    """
+        Fase usata quando la strumentazione è disattivata: non misura nulla, così il costo è solo quello del controllo
+        del flag e dell'ingresso nel blocco with.
+    """
+    rows_out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage():
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self._children_peak = 0
+
+    def __enter__(self):
+        self.depth = len(_stack)
+        self.parent = _stack[-1].name if _stack else None
+        self._memory = _state['memory'] and tracemalloc.is_tracing()
+        if self._memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # il picco raggiunto finora dalla fase esterna va conservato prima di azzerarlo
+            if _stack:
+                _stack[-1]._children_peak = max(_stack[-1]._children_peak, peak)
+            tracemalloc.reset_peak()
+            self._start_memory = current
+        _stack.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        seconds = time.perf_counter() - self._start
+        _stack.pop()
+        memory_delta = None
+        if self._memory:
+            _, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self._children_peak)
+            memory_delta = peak - self._start_memory
+            if _stack:
+                _stack[-1]._children_peak = max(_stack[-1]._children_peak, peak)
+        record = {'stage': self.name, 'parent': self.parent, 'depth': self.depth, 'seconds': seconds,
+                  'rows_in': self.rows_in, 'rows_out': self.rows_out, 'peak_memory_delta': memory_delta,
+                  'error': None if exc_type is None else exc_type.__name__}
+        for hook in list(_hooks):
+            hook(record)
+        return False
+
+
+def stage(name, rows_in=None):
+    """
+        Restituisce il context manager che misura una fase dell'elaborazione (tempo, righe in ingresso e in uscita, picco
+        di memoria). Le righe in uscita si indicano assegnando l'attributo rows_out all'oggetto restituito.
+        Se la strumentazione è disattivata non viene misurato nulla.
+        Esempio:
+            with stage('parse', rows_in=len(df)) as current:
+                ...
+                current.rows_out = len(result)
+    """
+    if not _state['enabled']:
+        return _NULL_STAGE
+    return _Stage(name, rows_in)
+
+
+def _rows(obj):
+    # righe di un dataframe (o di un CovidDataset); None per gli altri oggetti (percorsi, iteratori, dizionari, ...)
+    shape = getattr(obj, 'shape', None)
+    if shape is not None:
+        return shape[0]
+    df = getattr(obj, 'df', None)
+    return None if df is None else len(df)
+
+
+def instrumented(name):
+    """
+        Decoratore che misura l'intera esecuzione di una funzione come una fase: le righe in ingresso sono quelle del
+        primo argomento dataframe, quelle in uscita quelle del risultato (se è un dataframe).
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state['enabled']:
+                return func(*args, **kwargs)
+            rows_in = next((rows for rows in map(_rows, args) if rows is not None), None)
+            with _Stage(name, rows_in) as current:
+                result = func(*args, **kwargs)
+                current.rows_out = _rows(result)
+            return result
+        return wrapper
+    return decorator
+
+
+def add_hook(hook):
+    """
+        Registra una funzione che viene chiamata con il dizionario di ogni fase misurata (vedi logging_hook).
+    """
+    _hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def logging_hook(logger=None, level=logging.INFO):
+    """
+        Restituisce un hook che scrive ogni fase misurata nel logger indicato (di default il logger 'itacovid').
+        Esempio:
+            add_hook(logging_hook())
+            enable()
+    """
+    logger = logger or logging.getLogger('itacovid')
+
+    def hook(record):
+        logger.log(level, '%s%s: %.4f s, righe %s -> %s, memoria %s', '  ' * record['depth'], record['stage'],
+                   record['seconds'], record['rows_in'], record['rows_out'], record['peak_memory_delta'])
+    return hook
+
+
+def enable(memory=False):
+    """
+        Attiva la strumentazione per tutte le chiamate successive (ad es. in un job pianificato). Con memory=True viene
+        misurato anche il picco di memoria di ogni fase tramite tracemalloc, che rallenta sensibilmente l'esecuzione.
+    """
+    _state['enabled'] = True
+    _state['memory'] = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _state['started_tracing'] = True
+
+
+def disable():
+    """
+        Disattiva la strumentazione. tracemalloc viene fermato solo se era stato avviato da enable: se era già attivo
+        (avviato dal chiamante) resta attivo.
+    """
+    _state['enabled'] = False
+    if _state['started_tracing'] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _state['started_tracing'] = False
+    _state['memory'] = False
+
+
+def is_enabled():
+    return _state['enabled']
+
+
+class Trace():
+    """
+        Elenco delle fasi misurate all'interno di profile().
+    """
+    def __init__(self):
+        self.records = []
+
+    def __call__(self, record):
+        self.records.append(record)
+
+    def total(self, name):
+        """
+            Tempo complessivo (in secondi) delle fasi con il nome indicato.
+        """
+        return sum(record['seconds'] for record in self.records if record['stage'] == name)
+
+    def to_frame(self):
+        import pandas as pd
+        # import locale: il modulo di strumentazione non deve dipendere da pandas per essere importato
+        return pd.DataFrame(self.records)
+
+    def save(self, file_path):
+        """
+            Salva le fasi misurate in un file JSON.
+        """
+        with open(file_path, 'w') as f_obj:
+            json.dump(self.records, f_obj, indent=2)
+
+
+@contextmanager
+def profile(memory=False, hooks=()):
+    """
+        Context manager che attiva la strumentazione solo all'interno del blocco with e restituisce un oggetto Trace con
+        le fasi misurate. In via opzionale si possono indicare altri hook a cui inviare le fasi (es. logging_hook()).
+        Esempio:
+            with profile(memory=True) as trace:
+                df = read_covid_dataset()
+                analyzer.analyze(subset_by_region(df, 'Veneto'))
+            trace.save('trace.json')
+    """
+    previous = dict(_state)
+    trace = Trace()
+    hooks = [trace] + list(hooks)
+    for hook in hooks:
+        add_hook(hook)
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    _state['enabled'] = True
+    _state['memory'] = memory
+    try:
+        yield trace
+    finally:
+        _state.update(previous)
+        if started_tracing:
+            tracemalloc.stop()
+        for hook in hooks:
+            remove_hook(hook)
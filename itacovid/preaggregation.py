@@ -0,0 +1,177 @@
+import os
+import weakref
+from collections import OrderedDict
+import pandas as pd
+from .dataset import CovidDataset
+from .backends import AnalyticsBackend
+from .query import Query, as_frame
+from .resample import resample_totals
+from .result_cache import frame_fingerprint
+from .instrumentation import stage
+
+# colonne dell'ultimo giorno usate da Graphics.barh e dai grafici a torta
+SNAPSHOT_COLUMNS = ['totale_positivi', 'dimessi_guariti', 'deceduti', 'totale_casi']
+# colonne dei totali per periodo usate da Graphics.bar
+MONTHLY_COLUMNS = ['deceduti', 'totale_casi']
+
+_aggregation_stats = {'hits': 0, 'misses': 0}
+
+
+class _FileSource():
+    pass
+
+
+# le voci calcolate a partire da un file sono legate a questo oggetto, che resta in vita finchè il modulo è caricato
+_FILE_OWNER = _FileSource()
+
+
+class AggregationCache():
+    """
+        Cache LRU delle aggregazioni: quando viene superato il numero massimo di voci viene eliminata quella usata meno
+        di recente. Ogni voce mantiene un riferimento debole all'oggetto da cui è stata calcolata, così una voce non può
+        essere restituita per un dataframe diverso che ha ottenuto lo stesso id dopo che il primo è stato eliminato.
+    """
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def get(self, key, owner):
+        entry = self._entries.get(key)
+        if entry is None or entry[0]() is not owner:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, owner, value):
+        self._entries[key] = (weakref.ref(owner), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_cache = AggregationCache()
+
+
+def aggregation_cache_stats():
+    """
+        La funzione restituisce un dizionario con il numero di aggregazioni trovate in cache (hits), il numero di
+        aggregazioni calcolate (misses) e il numero di voci attualmente in cache (size).
+    """
+    return dict(_aggregation_stats, size=len(_cache))
+
+
+def clear_aggregation_cache():
+    """
+        La funzione svuota la cache delle aggregazioni e ne azzera i contatori.
+    """
+    _cache.clear()
+    for key in _aggregation_stats:
+        _aggregation_stats[key] = 0
+
+
+def set_aggregation_cache_size(maxsize):
+    """
+        La funzione imposta il numero massimo di aggregazioni mantenute in cache.
+    """
+    _cache.maxsize = maxsize
+    while len(_cache._entries) > maxsize:
+        _cache._entries.popitem(last=False)
+
+
+def _source_key(df):
+    """
+        Restituisce la chiave che identifica i dati di partenza e l'oggetto a cui legare la voce della cache:
+            - dataframe e CovidDataset sono identificati dall'oggetto stesso e dall'impronta del contenuto (vedi
+              frame_fingerprint), così una modifica del dataframe (es. df.loc[...] = ...) non restituisce totali
+              calcolati sui dati precedenti;
+            - una Query è identificata dalla sua sorgente e dai filtri, così più grafici della stessa Query condividono
+              le aggregazioni anche se ogni esecuzione della Query restituisce un nuovo dataframe.
+    """
+    if isinstance(df, Query):
+        source = df.source
+        if source is None:
+            raise ValueError('Nessuna sorgente indicata per la query!')
+        if isinstance(source, str):
+            # per un file la voce resta valida finchè il file non viene modificato
+            stat = os.stat(source)
+            source_key, owner = ('file', os.path.abspath(source), stat.st_size, stat.st_mtime_ns), _FILE_OWNER
+        else:
+            source_key, owner = _source_key(source)
+        columns = None if df._columns is None else tuple(df._columns)
+        return ('query', source_key, df.describe(), columns), owner
+    if isinstance(df, CovidDataset):
+        df = df.df
+    return ('frame', id(df), frame_fingerprint(df)), df
+
+
+def _cached(kind, df, compute):
+    key, owner = _source_key(df)
+    key = (kind,) + key
+    value = _cache.get(key, owner)
+    if value is None:
+        _aggregation_stats['misses'] += 1
+        frame = as_frame(df)
+        with stage('aggregation', len(frame)) as current:
+            value = compute(frame)
+            current.rows_out = len(value)
+        _cache.put(key, owner, value)
+    else:
+        _aggregation_stats['hits'] += 1
+    return value
+
+
+def daily_totals(df, columns):
+    """
+        La funzione restituisce i totali nazionali giornalieri (somma di tutte le regioni per ogni data) delle colonne
+        indicate. Vengono aggregate solo le colonne richieste e non ancora presenti in cache: i grafici a linee che
+        usano colonne diverse dello stesso dataframe condividono un'unica voce della cache.
+    """
+    columns = list(columns)
+    key, owner = _source_key(df)
+    key = ('daily',) + key
+    totals = _cache.get(key, owner)
+    missing = columns if totals is None else [column for column in columns if column not in totals.columns]
+    if not missing:
+        _aggregation_stats['hits'] += 1
+        return totals[columns]
+
+    _aggregation_stats['misses'] += 1
+    frame = as_frame(df)
+    with stage('aggregation', len(frame)) as current:
+        new_totals = frame.groupby('data')[missing].sum()
+        current.rows_out = len(new_totals)
+    totals = new_totals if totals is None else pd.concat([totals, new_totals], axis=1)
+    _cache.put(key, owner, totals)
+    return totals[columns]
+
+
+def latest_snapshot(df):
+    """
+        La funzione restituisce i dati dell'ultimo giorno presente nel dataframe per ogni regione (colonne
+        SNAPSHOT_COLUMNS), con l'indice sulla colonna denominazione_regione e in ordine decrescente di totale dei casi.
+    """
+    def compute(frame):
+        frame = frame.loc[frame['data'] == frame['data'].max(), ['denominazione_regione'] + SNAPSHOT_COLUMNS]
+        return frame.set_index('denominazione_regione').sort_values('totale_casi', ascending=False)
+    return _cached('snapshot', df, compute)
+
+
+def period_totals(df, freq='M', columns=None, cumulative=True):
+    """
+        Versione memorizzata in cache di resample_totals: totali nazionali per settimana ('W'), mese ('M') o anno ('Y').
+        Di default vengono calcolati i deceduti e i nuovi casi di ogni mese usati da Graphics.bar.
+        Con un AnalyticsBackend l'aggregazione viene eseguita nel database (non in cache: il risultato è già calcolato
+        dal motore leggendo solo le colonne necessarie).
+    """
+    columns = MONTHLY_COLUMNS if columns is None else list(columns)
+    if isinstance(df, AnalyticsBackend):
+        with stage('aggregation'):
+            return df.period_totals(columns, freq, cumulative)
+    return _cached(('period', freq, tuple(columns), cumulative), df,
+                   lambda frame: resample_totals(frame, columns, freq, cumulative))
@@ -0,0 +1,84 @@
+import os
+import pandas as pd
+from .check_csv_extension import check_csv_extension
+from .deltas import daily_variation
+from .get_dataset import read_covid_dataset, read_covid_dataset_chunks
+from .query import as_frame
+from .schema import PROVINCE_SCHEMA, narrowest_integer
+from .instrumentation import instrumented, stage
+
+
+def download_province_dataset(path=None, name=None):
+    """
+        Come download_covid_dataset, ma per il file delle province (covid19_italy_province.csv).
+        Esempio:
+            download_province_dataset(path='/Users/user_name/Desktop')
+    """
+    from .sources import KaggleSource, PROVINCE_FILE_NAME
+    # import locale: il pacchetto kaggle viene importato solo se si tenta un download
+
+    if path is None:
+        path = os.getcwd()
+    file_path = KaggleSource(download_dir=path).fetch(PROVINCE_FILE_NAME)
+
+    if name is not None:
+        os.replace(file_path, os.path.join(path, check_csv_extension(name)))
+
+
+def read_province_dataset(path=None, name=None, **kwargs):
+    """
+        La funzione legge il file delle province con read_covid_dataset (stessi argomenti: cache, colonne, ...) e lo
+        schema PROVINCE_SCHEMA: una riga per provincia e per data con le colonne data, denominazione_regione,
+        denominazione_provincia, totale_casi e variazione_totale_casi (variazione giornaliera della provincia).
+        Le righe dei casi non ancora attribuiti a una provincia hanno il nome della regione tra parentesi, es.
+        'In fase di definizione/aggiornamento (veneto)'.
+        Il dataframe può essere passato alle funzioni subset_*, a subset_by_province, a CovidDataset, a Query e ad
+        Analyzer.analyze, che in questo caso raggruppa le statistiche per provincia.
+        Esempio:
+            province_df = read_province_dataset('/Users/user_name/Desktop')
+    """
+    return read_covid_dataset(path, name, schema=PROVINCE_SCHEMA, **kwargs)
+
+
+def read_province_dataset_chunks(path=None, name=None, chunksize=100000, compact=True):
+    """
+        Versione a blocchi di read_province_dataset (vedi read_covid_dataset_chunks).
+    """
+    return read_covid_dataset_chunks(path, name, chunksize, compact, schema=PROVINCE_SCHEMA)
+
+
+@instrumented('rollup_provinces')
+def rollup_provinces(df, columns=None):
+    """
+        La funzione aggrega i dati delle province a livello di regione: per ogni data e regione somma le colonne
+        numeriche (o solo quelle indicate in columns) di tutte le sue province, con un unico raggruppamento vettoriale.
+        Le variazioni giornaliere (es. variazione_totale_casi) non vengono sommate ma ricalcolate sui totali della
+        regione, così sono corrette anche se una provincia manca in alcuni giorni.
+        Il dataframe restituito ha le colonne data, denominazione_regione e quelle aggregate, ed è ordinato per data:
+        può essere analizzato e filtrato come quello delle regioni.
+        Esempio:
+            regions_df = rollup_provinces(read_province_dataset('/Users/user_name/Desktop'))
+    """
+    df = as_frame(df)
+    schema = PROVINCE_SCHEMA
+    keys = ['data', schema.parent_column]
+    excluded = set(keys) | {schema.group_column} | set(schema.derived_columns)
+    if columns is None:
+        columns = [column for column in df.columns
+                   if column not in excluded and pd.api.types.is_numeric_dtype(df[column].dtype)]
+    else:
+        columns = [column for column in columns if column not in schema.derived_columns]
+
+    with stage('rollup_groupby', len(df)) as current:
+        # observed=True: solo le coppie (data, regione) presenti; sort=False: regioni nell'ordine in cui compaiono
+        totals = df.groupby(keys, observed=True, sort=False)[columns].sum().reset_index()
+        totals = totals.iloc[totals['data'].argsort(kind='stable')].reset_index(drop=True)
+        current.rows_out = len(totals)
+
+    with stage('rollup_derived', len(totals)):
+        for derived, source in schema.derived_columns.items():
+            if source in totals.columns:
+                totals[derived] = daily_variation(totals, source, by=schema.parent_column)
+        for column in totals.columns:
+            totals[column] = narrowest_integer(totals[column])
+    return totals
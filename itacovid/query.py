@@ -0,0 +1,227 @@
+import os
+import numpy as np
+from .dataset import CovidDataset
+from .backends import AnalyticsBackend
+from .get_dataset import read_covid_dataset
+from .schema import SCHEMAS
+from .subset import ITA_MONTHS, _check_regions, _check_provinces, _month_numbers, _parse_period, _check_period, _period_mask
+
+
+class Query():
+    """
+        Interrogazione "pigra" del dataset: i filtri per regione, mese e periodo e le colonne da mantenere vengono solo
+        registrati e applicati tutti insieme al momento dell'esecuzione, con un'unica maschera (o un'unica selezione di
+        posizioni se la sorgente è un CovidDataset) e un'unica copia dei dati, qualunque sia il numero di filtri.
+        Più filtri dello stesso tipo si sommano come se si concatenassero le funzioni subset_*.
+
+        La sorgente può essere un dataframe, un CovidDataset oppure il percorso del file csv: in quest'ultimo caso
+        vengono lette dal file (o dalla cache) solo le colonne richieste.
+        Un oggetto Query può essere passato direttamente ad Analyzer.analyze e ai metodi di Graphics.
+        Esempio:
+            query = Query(df).regions('Veneto', 'piemonte').months('aprile', 'maggio').columns('totale_casi', 'deceduti')
+            analyzer.analyze(query)
+    """
+    def __init__(self, source=None):
+        self.source = source
+        self._regions = []
+        self._provinces = []
+        self._months = []
+        self._periods = []
+        self._columns = None
+
+    def _copy(self):
+        query = Query(self.source)
+        query._regions = list(self._regions)
+        query._provinces = list(self._provinces)
+        query._months = list(self._months)
+        query._periods = list(self._periods)
+        query._columns = None if self._columns is None else list(self._columns)
+        return query
+
+    def regions(self, *regions):
+        """
+            Aggiunge un filtro per regione (i nomi non sono case sensitive).
+        """
+        query = self._copy()
+        query._regions.append(list(map(lambda x: x.capitalize(), regions)))
+        return query
+
+    def provinces(self, *provinces):
+        """
+            Aggiunge un filtro per provincia (solo per il dataset delle province, i nomi non sono case sensitive).
+        """
+        query = self._copy()
+        query._provinces.append(list(map(lambda x: x.capitalize(), provinces)))
+        return query
+
+    def months(self, *months):
+        """
+            Aggiunge un filtro per mese (nomi in italiano, non case sensitive).
+        """
+        query = self._copy()
+        query._months.append(_month_numbers(months))
+        return query
+
+    def period(self, start, end):
+        """
+            Aggiunge un filtro per periodo (formato 'gg/mm/aaaa', estremi compresi).
+        """
+        query = self._copy()
+        query._periods.append(_parse_period(start, end))
+        return query
+
+    def columns(self, *columns):
+        """
+            Indica le colonne da mantenere oltre a data e denominazione_regione (e denominazione_provincia), che sono
+            sempre presenti.
+        """
+        query = self._copy()
+        query._columns = list(columns)
+        return query
+
+    def _selected_columns(self, available):
+        if self._columns is None:
+            return None
+        selected = {key for schema in SCHEMAS.values() for key in schema.key_columns} | set(self._columns)
+        return [column for column in available if column in selected]
+
+    def _read_source(self, file_path):
+        # le colonne richieste vengono passate al lettore, così quelle non necessarie non vengono nemmeno lette
+        path, name = os.path.split(os.path.abspath(file_path))
+        return read_covid_dataset(path, name, columns=self._columns)
+
+    def execute(self, source=None):
+        """
+            Esegue l'interrogazione sulla sorgente indicata (o su quella passata al costruttore) e restituisce il dataframe
+            filtrato.
+        """
+        if source is None:
+            source = self.source
+        if source is None:
+            raise ValueError('Nessuna sorgente indicata per la query!')
+        if isinstance(source, str):
+            source = self._read_source(source)
+        if isinstance(source, CovidDataset):
+            return self._execute_dataset(source)
+        return self._execute_frame(source)
+
+    def _execute_frame(self, df):
+        mask = None
+        if self._regions:
+            regions_check = df['denominazione_regione'].unique()
+            for regions in self._regions:
+                _check_regions(regions, regions_check)
+                region_mask = df['denominazione_regione'].isin(regions).to_numpy()
+                mask = region_mask if mask is None else mask & region_mask
+        if self._provinces:
+            provinces_check = df['denominazione_provincia'].unique()
+            for provinces in self._provinces:
+                _check_provinces(provinces, provinces_check)
+                province_mask = df['denominazione_provincia'].isin(provinces).to_numpy()
+                mask = province_mask if mask is None else mask & province_mask
+        if self._months:
+            month = df['data'].dt.month
+            for month_numbers in self._months:
+                month_mask = month.isin(month_numbers).to_numpy()
+                mask = month_mask if mask is None else mask & month_mask
+        if self._periods:
+            min_date, max_date = df['data'].min().date(), df['data'].max().date()
+            for start, end in self._periods:
+                _check_period(start, end, min_date, max_date)
+                period_mask = _period_mask(df['data'], start, end).to_numpy()
+                mask = period_mask if mask is None else mask & period_mask
+
+        columns = self._selected_columns(df.columns)
+        if mask is None:
+            return df if columns is None else df[columns]
+        if columns is None:
+            return df[mask]
+        return df.loc[mask, columns]
+
+    def _execute_dataset(self, dataset):
+        df = dataset.df
+        positions = self.positions(dataset)
+        columns = self._selected_columns(df.columns)
+        if columns is None:
+            return df.iloc[positions]
+        return df.iloc[positions, [df.columns.get_loc(column) for column in columns]]
+
+    def positions(self, dataset):
+        """
+            Restituisce le posizioni delle righe del CovidDataset che soddisfano tutti i filtri (uno slice se c'è solo il
+            filtro per periodo, altrimenti un array ordinato di posizioni).
+        """
+        # parto dal blocco contiguo del periodo e restringo le posizioni con gli altri filtri, senza scandire il dataframe
+        first, last = 0, len(dataset)
+        for start, end in self._periods:
+            period_first, period_last = dataset.period_bounds(start.strftime('%d/%m/%Y'), end.strftime('%d/%m/%Y'))
+            first, last = max(first, period_first), min(last, period_last)
+
+        positions = None
+        for regions in self._regions:
+            region_positions = dataset.region_positions(*regions)
+            positions = region_positions if positions is None else np.intersect1d(positions, region_positions, assume_unique=True)
+        for provinces in self._provinces:
+            province_positions = dataset.province_positions(*provinces)
+            positions = province_positions if positions is None else np.intersect1d(positions, province_positions, assume_unique=True)
+        for month_numbers in self._months:
+            month_positions = dataset.month_positions(*[ITA_MONTHS[m - 1] for m in month_numbers])
+            positions = month_positions if positions is None else np.intersect1d(positions, month_positions, assume_unique=True)
+
+        if positions is None:
+            return slice(first, max(first, last))
+        return positions[np.searchsorted(positions, first):np.searchsorted(positions, last)]
+
+    def describe(self):
+        """
+            Restituisce una breve descrizione testuale dei filtri, usata ad esempio per identificare le interrogazioni
+            nei risultati di Analyzer.analyze_batch.
+        """
+        parts = []
+        for regions in self._regions:
+            parts.append('regioni=' + ','.join(regions))
+        for provinces in self._provinces:
+            parts.append('province=' + ','.join(provinces))
+        for month_numbers in self._months:
+            parts.append('mesi=' + ','.join(ITA_MONTHS[m - 1].lower() for m in month_numbers))
+        for start, end in self._periods:
+            parts.append('periodo=' + start.strftime('%d/%m/%Y') + '-' + end.strftime('%d/%m/%Y'))
+        return '; '.join(parts) if parts else 'tutto'
+
+    @classmethod
+    def from_spec(cls, spec, source=None):
+        """
+            Crea una Query a partire da un dizionario con le chiavi opzionali 'regions', 'provinces', 'months', 'period'
+            (coppia di date 'gg/mm/aaaa') e 'columns'. Se spec è già una Query viene restituita invariata.
+            Esempio:
+                Query.from_spec({'regions': ['Veneto'], 'period': ('01/03/2020', '31/03/2020')})
+        """
+        if isinstance(spec, Query):
+            return spec
+        query = cls(source)
+        if spec.get('regions'):
+            query = query.regions(*spec['regions'])
+        if spec.get('provinces'):
+            query = query.provinces(*spec['provinces'])
+        if spec.get('months'):
+            query = query.months(*spec['months'])
+        if spec.get('period'):
+            query = query.period(*spec['period'])
+        if spec.get('columns'):
+            query = query.columns(*spec['columns'])
+        return query
+
+
+def as_frame(df):
+    """
+        La funzione restituisce il dataframe corrispondente all'oggetto passato in input: una Query viene eseguita, di un
+        CovidDataset viene restituito il dataframe, le righe selezionate di un AnalyticsBackend vengono lette dal
+        database (to_frame), un dataframe viene restituito invariato.
+    """
+    if isinstance(df, Query):
+        return df.execute()
+    if isinstance(df, CovidDataset):
+        return df.df
+    if isinstance(df, AnalyticsBackend):
+        return df.to_frame()
+    return df
@@ -0,0 +1,139 @@
+import os
+import re
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from .batch import SharedFrame, _prepare_specs, _as_dataset, _init_worker, _worker_state
+from .graphics import Graphics, DAILY_COLUMNS
+from .preaggregation import daily_totals
+
+# grafici disponibili per il report: nome del grafico -> metodo di Graphics
+CHARTS = {'bar': Graphics.bar,
+          'barh': Graphics.barh,
+          'line': Graphics.line,
+          'line_nuovi_positivi': Graphics.line_nuovi_positivi,
+          'line_variazione_totale_positivi': Graphics.line_variazione_totale_positivi,
+          'pie_three_most_affected_regions': Graphics.pie_three_most_affected_regions,
+          'nested_pie_three_most_affected_regions': Graphics.nested_pie_three_most_affected_regions}
+
+REPORT_FORMATS = ('png', 'svg')
+
+
+class ChartError(ValueError):
+    pass
+
+
+def _file_name(chart, name):
+    # il nome dell'interrogazione può contenere spazi, virgole, '/' delle date, ...
+    return chart + '_' + re.sub(r'[^0-9A-Za-z]+', '_', name).strip('_')
+
+
+def _group_jobs(jobs):
+    """
+        Raggruppa i lavori per sottoinsieme di dati (filtri e colonne della query, non il solo nome): ogni sottoinsieme
+        viene estratto una sola volta e riutilizzato per tutti i grafici che lo richiedono.
+        Lo stesso nome non può indicare sottoinsiemi diversi, perchè i file dei grafici verrebbero sovrascritti.
+        Restituisce la lista di (query, nome, [(posizione del lavoro, grafico), ...]).
+    """
+    charts = [chart for chart, _ in jobs]
+    for chart in charts:
+        if chart not in CHARTS:
+            raise ChartError('Grafico non disponibile: ' + str(chart) + '! Per favore inserisci uno dei seguenti grafici:\n'
+                             + str(list(CHARTS)))
+    queries, names = _prepare_specs([{} if spec is None else spec for _, spec in jobs])
+    groups, filters = {}, {}
+    for position, (chart, query, name) in enumerate(zip(charts, queries, names)):
+        key = (query.describe(), None if query._columns is None else tuple(query._columns))
+        if filters.setdefault(name, key) != key:
+            raise ChartError('Il nome "' + str(name) + '" è stato assegnato a sottoinsiemi diversi: ' + filters[name][0] +
+                             ' e ' + key[0] + '! Per favore assegna un nome diverso a ogni sottoinsieme')
+        groups.setdefault((name, key), (query, name, []))[2].append((position, chart))
+    return list(groups.values())
+
+
+def _render_group(dataset, query, name, charts, output_dir, formats):
+    df = query.execute(dataset)
+    # i totali giornalieri di tutti i grafici a linee del sottoinsieme vengono calcolati con un'unica aggregazione,
+    # i grafici li trovano poi nella cache delle aggregazioni
+    daily_columns = [column for _, chart in charts for column in DAILY_COLUMNS.get(chart, [])]
+    if daily_columns:
+        daily_totals(df, list(dict.fromkeys(daily_columns)))
+    paths = []
+    for position, chart in charts:
+        fig = CHARTS[chart](df)
+        base = os.path.join(output_dir, _file_name(chart, name))
+        for file_format in formats:
+            fig.savefig(base + '.' + file_format, format=file_format)
+        paths.append((position, [base + '.' + file_format for file_format in formats]))
+    return paths
+
+
+@contextmanager
+def _headless():
+    # backend Agg anche nel processo corrente, ripristinando poi quello dell'utente (es. quello del notebook)
+    import matplotlib.pyplot as plt
+    previous = plt.get_backend()
+    if previous.lower() == 'agg':
+        yield
+        return
+    plt.switch_backend('Agg')
+    try:
+        yield
+    finally:
+        plt.switch_backend(previous)
+
+
+def _init_report_worker(descriptor):
+    # i processi figli non hanno un display: uso il backend Agg, che disegna solo su file
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+    _init_worker(descriptor)
+
+
+def _worker_render(query, name, charts, output_dir, formats):
+    return _render_group(_worker_state['dataset'], query, name, charts, output_dir, formats)
+
+
+def render_report(df, jobs, output_dir, formats=('png',), processes=None):
+    """
+        La funzione genera i grafici di Graphics per un elenco di lavori e li salva nella cartella indicata.
+        Ogni lavoro è una coppia (grafico, sottoinsieme): il grafico è il nome di un metodo di Graphics (vedi CHARTS),
+        il sottoinsieme è una Query, un dizionario come quelli di Analyzer.analyze_batch oppure None per l'intero dataset.
+        Es.
+            jobs = [('line', {'regions': ['Veneto'], 'months': ['aprile']}), ('barh', None)]
+            render_report(df, jobs, '/Users/user_name/Desktop/report', formats=('png', 'svg'))
+
+        I grafici vengono generati senza interfaccia grafica (backend Agg) da più processi, che condividono il dataframe
+        tramite memoria condivisa; ogni sottoinsieme viene estratto una sola volta per tutti i grafici che lo usano.
+        Con processes=1 i grafici vengono generati nel processo corrente, sempre con il backend Agg (al termine viene
+        ripristinato il backend precedente).
+        I file si chiamano grafico_nome.formato, dove il nome è la chiave 'name' del dizionario oppure la descrizione
+        dei filtri. Restituisce, per ogni lavoro, la lista dei file creati.
+    """
+    for file_format in formats:
+        if file_format not in REPORT_FORMATS:
+            raise ChartError('Formato non disponibile: ' + str(file_format) + '! Per favore inserisci uno dei seguenti '
+                             'formati:\n' + str(list(REPORT_FORMATS)))
+    os.makedirs(output_dir, exist_ok=True)
+    groups = _group_jobs(jobs)
+    dataset = _as_dataset(df)
+
+    n_workers = min(processes or os.cpu_count() or 1, len(groups))
+    if n_workers <= 1:
+        with _headless():
+            results = [_render_group(dataset, query, name, charts, output_dir, formats)
+                       for query, name, charts in groups]
+    else:
+        shared = SharedFrame.from_frame(dataset.df)
+        try:
+            with ProcessPoolExecutor(n_workers, initializer=_init_report_worker, initargs=(shared.descriptor,)) as executor:
+                futures = [executor.submit(_worker_render, query, name, charts, output_dir, formats)
+                           for query, name, charts in groups]
+                results = [future.result() for future in futures]
+        finally:
+            shared.close()
+
+    paths = [None] * len(jobs)
+    for group_paths in results:
+        for position, files in group_paths:
+            paths[position] = files
+    return paths
@@ -0,0 +1,46 @@
+# frequenze disponibili: codice del periodo di pandas -> (etichetta dell'asse, nome del periodo, formato delle date)
+PERIOD_FREQUENCIES = {'W': ('Settimane', 'settimana', '%d/%m/%Y'),
+                      'M': ('Mesi', 'mese', '%m/%Y'),
+                      'Y': ('Anni', 'anno', '%Y')}
+
+
+class FrequencyError(ValueError):
+    pass
+
+
+def _check_frequency(freq):
+    if freq not in PERIOD_FREQUENCIES:
+        raise FrequencyError('Frequenza non disponibile: ' + str(freq) + '! Per favore inserisci una delle seguenti '
+                             'frequenze:\n' + str(list(PERIOD_FREQUENCIES)))
+
+
+def resample_totals(df, columns, freq='M', cumulative=True, by='denominazione_regione', date='data'):
+    """
+        La funzione restituisce i totali nazionali delle colonne indicate per settimana ('W'), mese ('M') o anno ('Y').
+        I periodi sono periodi reali (pandas.Period): lo stesso mese di anni diversi resta separato.
+            - cumulative=True (colonne cumulative come deceduti o totale_casi): per ogni regione viene preso il valore
+              massimo del periodo, i valori delle regioni vengono sommati e a ogni periodo viene sottratto il
+              precedente, così i valori si riferiscono esclusivamente al periodo indicato;
+            - cumulative=False (colonne giornaliere come nuovi_positivi): i valori del periodo vengono sommati.
+        Tutti i calcoli sono vettoriali: un raggruppamento per (periodo, regione), uno per periodo e una differenza.
+        Es.
+            resample_totals(df, ['deceduti', 'totale_casi'], freq='W')
+    """
+    _check_frequency(freq)
+    columns = list(columns)
+    periods = df[date].dt.to_period(freq)
+    if not cumulative:
+        return df[columns].groupby(periods.rename(date)).sum()
+
+    by_region = df[columns].groupby([periods.rename(date), df[by]], observed=True).max()
+    totals = by_region.groupby(level=date).sum()
+    return totals - totals.shift(fill_value=0)
+
+
+def period_labels(index, freq='M'):
+    """
+        Restituisce le etichette dei periodi da mostrare sull'asse dei grafici (es. '03/2020' per i mesi, la data del
+        primo giorno per le settimane).
+    """
+    _check_frequency(freq)
+    return index.start_time.strftime(PERIOD_FREQUENCIES[freq][2])
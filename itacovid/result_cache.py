@@ -0,0 +1,208 @@
+import os
+import json
+import hashlib
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# da incrementare ogni volta che cambia il calcolo di Analyzer.analyze, in modo da invalidare anche le voci su disco
+RESULT_CACHE_VERSION = 2
+
+_result_stats = {'hits': 0, 'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+
+def _update_array(digest, values):
+    values = np.ascontiguousarray(values)
+    if values.dtype == object:
+        # stringhe o oggetti: uso l'hash vettoriale di pandas, un intero a 64 bit per valore
+        values = pd.util.hash_array(values)
+    elif values.dtype.kind in 'mM':
+        values = values.view(np.int64)
+    digest.update(values.dtype.str.encode())
+    digest.update(memoryview(values).cast('B'))
+
+
+def frame_fingerprint(df):
+    """
+        La funzione restituisce un'impronta (stringa esadecimale) del contenuto del dataframe: nomi e tipi delle colonne,
+        indice e valori. Viene calcolata direttamente sui buffer degli array numerici (le categorie tramite l'elenco
+        delle categorie e i codici), senza convertire le righe in oggetti Python, per cui il costo è trascurabile
+        rispetto a quello di un'analisi.
+        Due dataframe con lo stesso contenuto hanno la stessa impronta: se il file csv da cui sono stati letti cambia,
+        cambia anche l'impronta.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((list(df.columns), [str(dtype) for dtype in df.dtypes], len(df))).encode())
+    if isinstance(df.index, pd.RangeIndex):
+        digest.update(repr((df.index.start, df.index.stop, df.index.step)).encode())
+    else:
+        _update_array(digest, df.index.to_numpy())
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # str(dtype) è solo 'category': le categorie (e se sono ordinate) vanno incluse insieme ai codici, altrimenti
+            # due colonne con gli stessi codici e categorie diverse avrebbero la stessa impronta
+            digest.update(repr((series.cat.ordered, len(series.cat.categories))).encode())
+            _update_array(digest, series.cat.categories.to_numpy())
+            _update_array(digest, series.cat.codes.to_numpy())
+        else:
+            _update_array(digest, series.to_numpy())
+    return digest.hexdigest()
+
+
+def result_key(df, statistics, by='denominazione_regione'):
+    """
+        Chiave di una voce della cache: impronta del dataframe, statistiche richieste (già normalizzate) e colonna di
+        raggruppamento.
+    """
+    text = repr((RESULT_CACHE_VERSION, frame_fingerprint(df), [name for name, _ in statistics], by))
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def _copy_results(results):
+    # copia dei soli dizionari annidati: i valori sono numeri e stringhe immutabili, non serve deepcopy
+    return {key: value if not isinstance(value, dict) else _copy_results(value) for key, value in results.items()}
+
+
+class ResultCache():
+    """
+        Cache dei risultati di Analyzer.analyze a due livelli:
+            - in memoria: LRU con al massimo maxsize voci (0 per disattivarla);
+            - su disco (opzionale, se si indica directory): un file JSON per voce, al massimo disk_maxsize file; quando il
+              limite viene superato vengono eliminati i file letti meno di recente. Le voci su disco sono condivise tra
+              sessioni e processi diversi.
+        Le voci sono identificate dal contenuto del dataframe (vedi frame_fingerprint) e non dall'oggetto, per cui non
+        diventano mai obsolete: se il file del dataset cambia cambia anche la chiave, e le voci vecchie vengono eliminate
+        dai limiti di dimensione.
+    """
+    def __init__(self, maxsize=128, directory=None, disk_maxsize=1024):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.disk_maxsize = disk_maxsize
+        self._entries = OrderedDict()
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+            _result_stats['hits'] += 1
+            _result_stats['memory_hits'] += 1
+            return _copy_results(value)
+
+        if self.directory is not None:
+            file_path = self._disk_path(key)
+            try:
+                with open(file_path) as f_obj:
+                    value = json.load(f_obj)
+                # aggiorno la data di modifica: su disco viene eliminato per primo il file usato meno di recente
+                os.utime(file_path)
+            except (OSError, ValueError):
+                value = None
+            if value is not None:
+                self._put_memory(key, value)
+                _result_stats['hits'] += 1
+                _result_stats['disk_hits'] += 1
+                return _copy_results(value)
+
+        _result_stats['misses'] += 1
+        return None
+
+    def put(self, key, value):
+        value = _copy_results(value)
+        self._put_memory(key, value)
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            file_path = self._disk_path(key)
+            tmp_path = file_path + '.' + str(os.getpid()) + '.tmp'
+            with open(tmp_path, 'w') as f_obj:
+                json.dump(value, f_obj)
+            os.replace(tmp_path, file_path)
+            self._trim_disk()
+
+    def _put_memory(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _disk_files(self):
+        if self.directory is None or not os.path.isdir(self.directory):
+            return []
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')]
+
+    def _trim_disk(self):
+        files = self._disk_files()
+        if len(files) <= self.disk_maxsize:
+            return
+        files.sort(key=lambda entry: entry.stat().st_mtime_ns)
+        for entry in files[:len(files) - self.disk_maxsize]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def clear(self, disk=False):
+        self._entries.clear()
+        if disk:
+            for entry in self._disk_files():
+                os.remove(entry.path)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_cache = ResultCache()
+
+
+def analyze_cache_stats():
+    """
+        La funzione restituisce un dizionario con il numero di risultati trovati in cache (hits, di cui memory_hits in
+        memoria e disk_hits su disco), il numero di analisi calcolate (misses), il numero di voci in memoria (size) e
+        su disco (disk_size).
+    """
+    return dict(_result_stats, size=len(_cache), disk_size=len(_cache._disk_files()))
+
+
+def clear_analyze_cache(disk=False):
+    """
+        La funzione svuota la cache dei risultati in memoria (e, con disk=True, anche i file su disco) e ne azzera i contatori.
+    """
+    _cache.clear(disk)
+    for key in _result_stats:
+        _result_stats[key] = 0
+
+
+def set_analyze_cache(maxsize=128, directory=None, disk_maxsize=1024):
+    """
+        La funzione imposta i limiti della cache dei risultati di Analyzer.analyze: numero massimo di voci in memoria
+        (0 per disattivarla) e, in via opzionale, la cartella e il numero massimo di file della cache su disco.
+        Esempio:
+            set_analyze_cache(maxsize=256, directory='/Users/user_name/Desktop/.itacovid_results_cache')
+    """
+    _cache.maxsize = maxsize
+    _cache.directory = directory
+    _cache.disk_maxsize = disk_maxsize
+    while len(_cache._entries) > max(maxsize, 0):
+        _cache._entries.popitem(last=False)
+    _cache._trim_disk()
+
+
+def cached_results(df, statistics, compute, by='denominazione_regione'):
+    """
+        Restituisce i risultati in cache per il dataframe, le statistiche e il raggruppamento indicati, oppure li calcola
+        con compute e li memorizza. Se la cache è disattivata (nessuna voce in memoria e nessuna cartella su disco)
+        calcola direttamente.
+    """
+    if _cache.maxsize <= 0 and _cache.directory is None:
+        return compute()
+    key = result_key(df, statistics, by)
+    value = _cache.get(key)
+    if value is None:
+        value = compute()
+        _cache.put(key, value)
+    return value
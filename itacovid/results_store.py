@@ -0,0 +1,298 @@
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from .instrumentation import stage
+
+RESULTS_INDEX = ['unique_identification', 'periodo', 'regioni']
+
+
+# valore è dichiarata senza tipo: i conteggi (es. valori massimi e minimi) restano interi e le medie restano reali, mentre
+# con REAL anche gli interi verrebbero memorizzati e riletti come float
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS saves (
+        id INTEGER PRIMARY KEY,
+        unique_identification TEXT NOT NULL UNIQUE,
+        periodo TEXT
+    );
+    CREATE TABLE IF NOT EXISTS results (
+        save_id INTEGER NOT NULL REFERENCES saves (id),
+        regione TEXT NOT NULL,
+        colonna TEXT NOT NULL,
+        statistica TEXT NOT NULL,
+        valore
+    );
+    CREATE INDEX IF NOT EXISTS results_save ON results (save_id);
+    CREATE INDEX IF NOT EXISTS results_region ON results (regione, save_id);
+"""
+
+
+def _sql_value(value):
+    """
+        Valore di una cella nel formato memorizzato nel database: None per i valori mancanti, int per gli interi (anche
+        numpy), float per gli altri numeri.
+    """
+    if value is None or value != value:
+        return None
+    if isinstance(value, (int, np.integer)) and not isinstance(value, (bool, np.bool_)):
+        return int(value)
+    return float(value)
+
+
+class DuplicatedStringError (ValueError):
+    pass
+
+
+class ResultsStore():
+    """
+        Archivio dei risultati di Analyzer.analyze in un database SQLite, in cui i salvataggi vengono solo aggiunti.
+            - la tabella saves contiene un salvataggio per riga, con un indice univoco su unique_identification: il controllo
+              dei duplicati è una ricerca nell'indice e non richiede di rileggere tutti i risultati già memorizzati;
+            - la tabella results contiene i valori in formato "lungo" (salvataggio, regione, colonna, statistica, valore),
+              con gli indici per salvataggio e per regione, così si possono leggere solo i risultati richiesti.
+        Esempio:
+            store = ResultsStore('/Users/user_name/Desktop/covid19_result.sqlite')
+            store.save(analyzer.analyze(df), 'mio salvataggio')
+            store.load(regions=['Veneto'])
+    """
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._created = False
+
+    def _connect(self):
+        # le tabelle vengono create alla prima connessione: il file del database viene creato solo dalle scritture (le
+        # letture di un database che non esiste restituiscono un risultato vuoto, vedi _exists)
+        create = not (self._created and self._exists())
+        connection = sqlite3.connect(self.file_path)
+        if create:
+            try:
+                connection.executescript(_SCHEMA)
+            except sqlite3.Error:
+                connection.close()
+                raise
+            self._created = True
+        return connection
+
+    def _exists(self):
+        return os.path.isfile(self.file_path)
+
+    def __contains__(self, unique_identification):
+        if not self._exists():
+            return False
+        connection = self._connect()
+        try:
+            row = connection.execute('SELECT 1 FROM saves WHERE unique_identification = ?',
+                                     (str(unique_identification),)).fetchone()
+        finally:
+            connection.close()
+        return row is not None
+
+    @staticmethod
+    def _long_rows(dictionary):
+        """
+            Converte il dizionario di Analyzer.analyze, cella per cella, nelle righe (regione, colonna, statistica,
+            valore), senza copie del dizionario nè passaggi intermedi per dataframe.
+        """
+        return [(region, column, statistic, _sql_value(value))
+                for region, statistics in dictionary.items() if region != 'periodo'
+                for statistic, values in statistics.items()
+                for column, value in values.items()]
+
+    @staticmethod
+    def _frame_rows(frame):
+        """
+            Righe (regione, colonna, statistica, valore) del dataframe di results_frame, una colonna (colonna, statistica)
+            alla volta: ogni colonna viene convertita con un'unica chiamata a tolist. Le celle mancanti (NaN) diventano
+            NULL e le colonne intere restano intere, come in _long_rows.
+        """
+        regions = frame.index.tolist()
+        return [(region, column, statistic, _sql_value(value))
+                for (column, statistic), values in frame.items()
+                for region, value in zip(regions, values.tolist())]
+
+    @staticmethod
+    def _insert_save(connection, unique_identification, period):
+        try:
+            cursor = connection.execute('INSERT INTO saves (unique_identification, periodo) VALUES (?, ?)',
+                                        (str(unique_identification), period))
+        except sqlite3.IntegrityError:
+            raise DuplicatedStringError(unique_identification)
+        return cursor.lastrowid
+
+    @staticmethod
+    def _insert_results(connection, save_id, rows):
+        connection.executemany('INSERT INTO results (save_id, regione, colonna, statistica, valore) '
+                               'VALUES (?, ?, ?, ?, ?)', ((save_id,) + row for row in rows))
+
+    def save(self, dictionary, unique_identification):
+        """
+            Aggiunge i risultati di Analyzer.analyze con l'identificativo indicato.
+            Se l'identificativo è già presente viene sollevata l'eccezione DuplicatedStringError e non viene salvato nulla.
+        """
+        self.save_many([(unique_identification, dictionary)])
+
+    def save_many(self, items):
+        """
+            Aggiunge in un'unica transazione più risultati di Analyzer.analyze, indicati come dizionario
+            {identificativo: risultati} oppure come lista di coppie (identificativo, risultati).
+            Se uno degli identificativi è già presente (o ripetuto) viene sollevata l'eccezione DuplicatedStringError e non
+            viene salvato nessuno dei risultati.
+            Esempio:
+                store.save_many({'marzo': analyzer.analyze(march_df), 'aprile': analyzer.analyze(april_df)})
+        """
+        items = list(items.items()) if isinstance(items, dict) else list(items)
+        connection = self._connect()
+        try:
+            with stage('results_write', len(items)), connection:
+                for unique_identification, dictionary in items:
+                    save_id = self._insert_save(connection, unique_identification, dictionary.get('periodo'))
+                    self._insert_results(connection, save_id, self._frame_rows(results_frame(dictionary)))
+        finally:
+            connection.close()
+
+    def save_batch(self, batch, prefix=None):
+        """
+            Aggiunge in un'unica transazione il dataframe restituito da Analyzer.analyze_batch (colonne interrogazione,
+            periodo, regione, statistica, colonna, valore): ogni interrogazione diventa un salvataggio con identificativo
+            il nome dell'interrogazione, preceduto da prefix se indicato. Le righe vengono inserite direttamente dalle
+            colonne del dataframe, senza passare per i dizionari dei risultati.
+            Restituisce la lista degli identificativi salvati.
+            Esempio:
+                store.save_batch(analyzer.analyze_batch(df, specs), prefix='2020-05-01')
+        """
+        names = pd.unique(batch['interrogazione'])
+        ids = [str(name) if prefix is None else str(prefix) + ' ' + str(name) for name in names]
+        periods = batch.groupby('interrogazione', sort=False)['periodo'].first()
+        groups = batch.groupby('interrogazione', sort=False).indices
+        regions = batch['regione'].astype(str).to_numpy()
+        columns = batch['colonna'].astype(str).to_numpy()
+        statistics = batch['statistica'].astype(str).to_numpy()
+        values = batch['valore'].astype(float).to_numpy()
+
+        connection = self._connect()
+        try:
+            with stage('results_write', len(batch)), connection:
+                for name, unique_identification in zip(names, ids):
+                    save_id = self._insert_save(connection, unique_identification, periods[name])
+                    positions = groups[name]
+                    rows = zip(regions[positions].tolist(), columns[positions].tolist(),
+                               statistics[positions].tolist(), values[positions].tolist())
+                    # i valori mancanti (NaN) vengono salvati come NULL, come in save
+                    self._insert_results(connection, save_id,
+                                         ((r, c, s, None if v != v else v) for r, c, s, v in rows))
+        finally:
+            connection.close()
+        return ids
+
+    def load(self, unique_identification=None, period=None, regions=None):
+        """
+            Restituisce i risultati memorizzati nello stesso formato del file csv di Analyzer.save_results: un dataframe
+            con indice (unique_identification, periodo, regioni) e colonne (colonna, statistica). Le colonne con soli valori
+            interi (es. i valori massimi dei conteggi) sono intere; se il database non esiste il dataframe è vuoto.
+            In via opzionale si possono leggere solo i risultati di uno o più identificativi, di uno o più periodi
+            (stringhe 'gg/mm/aaaa - gg/mm/aaaa' come in analyze) e di una o più regioni.
+        """
+        conditions, parameters = [], []
+        for field, values in (('s.unique_identification', unique_identification), ('s.periodo', period),
+                              ('r.regione', regions)):
+            if values is None:
+                continue
+            if isinstance(values, str):
+                values = [values]
+            values = [str(value) for value in values]
+            conditions.append(field + ' IN (' + ', '.join('?' * len(values)) + ')')
+            parameters.extend(values)
+
+        query = ('SELECT s.unique_identification, s.periodo, r.regione AS regioni, r.colonna, r.statistica, r.valore, '
+                 "typeof(r.valore) = 'integer' AS intero FROM results r JOIN saves s ON s.id = r.save_id")
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY r.save_id, r.rowid'
+
+        if not self._exists():
+            # nessun salvataggio: il database non viene creato da una lettura
+            return self._wide_frame(pd.DataFrame(columns=RESULTS_INDEX + ['colonna', 'statistica', 'valore', 'intero']))
+        connection = self._connect()
+        try:
+            long_df = pd.read_sql_query(query, connection, params=parameters)
+        finally:
+            connection.close()
+        return self._wide_frame(long_df)
+
+    @staticmethod
+    def _wide_frame(long_df):
+        # unstack ordina righe e colonne: le riporto nell'ordine in cui sono state salvate, con le colonne raggruppate
+        # per colonna del dataset (es. (deceduti, valori massimi), (deceduti, valori medi), ...) come nel file csv
+        rows = pd.MultiIndex.from_frame(long_df[RESULTS_INDEX]).unique()
+        columns = pd.MultiIndex.from_frame(long_df[['colonna', 'statistica']]).unique()
+        column_order = {column: i for i, column in enumerate(pd.unique(columns.get_level_values(0)))}
+        columns = columns[np.argsort([column_order[column] for column in columns.get_level_values(0)], kind='stable')]
+        wide = long_df.set_index(RESULTS_INDEX + ['colonna', 'statistica'])['valore'].unstack(['colonna', 'statistica'])
+        wide = wide.reindex(index=rows, columns=columns).astype(float)
+        # le colonne con soli valori interi (e nessun valore mancante) tornano intere, come nel file csv
+        integer = long_df.groupby(['colonna', 'statistica'], sort=False)['intero'].all()
+        integer = [column for column in columns if integer[column] and not wide[column].isna().any()]
+        if integer:
+            wide[integer] = wide[integer].astype('int64')
+        wide.columns.names = [None, None]
+        return wide
+
+    def import_csv(self, file_path):
+        """
+            Importa nel database i risultati di un file csv creato dalle versioni precedenti di Analyzer.save_results.
+            Gli identificativi già presenti nel database vengono ignorati.
+        """
+        legacy = pd.read_csv(file_path, index_col=[0, 1, 2], header=[0, 1])
+        for (unique_identification, period), group in legacy.groupby(level=[0, 1], sort=False):
+            if unique_identification in self:
+                continue
+            dictionary = {'periodo': period}
+            # itertuples legge i valori colonna per colonna: a differenza di iterrows le colonne intere restano intere
+            for (_, _, region), *values in group.itertuples(name=None):
+                statistics = dictionary.setdefault(region, {})
+                for (column, statistic), value in zip(group.columns, values):
+                    statistics.setdefault(statistic, {})[column] = value
+            self.save(dictionary, unique_identification)
+
+
+def results_frame(dictionary):
+    """
+        La funzione converte il dizionario di Analyzer.analyze in un dataframe con una riga per regione e colonne
+        (colonna, statistica), nello stesso ordine di ResultsStore.load, senza modificare nè copiare il dizionario: i
+        valori vengono letti una sola volta e inseriti in un unico array. Come in ResultsStore.load le colonne con soli
+        valori interi restano intere.
+        Esempio:
+            results_frame(analyzer.analyze(df))['deceduti']['valori massimi']
+    """
+    regions = [region for region in dictionary if region != 'periodo']
+    keys = list(dict.fromkeys((column, statistic) for region in regions
+                              for statistic, values in dictionary[region].items() for column in values))
+    # colonne raggruppate per colonna del dataset, come nel file csv dei risultati (vedi ResultsStore._wide_frame)
+    column_order = {column: i for i, column in enumerate(dict.fromkeys(column for column, _ in keys))}
+    keys.sort(key=lambda key: column_order[key[0]])
+    positions = {key: i for i, key in enumerate(keys)}
+    cells = [(i, positions[(column, statistic)], np.nan if value is None else value)
+             for i, region in enumerate(regions)
+             for statistic, values in dictionary[region].items()
+             for column, value in values.items()]
+    data = np.full((len(regions), len(keys)), np.nan)
+    # una colonna resta intera solo se ha un valore intero per ogni regione (vedi ResultsStore._wide_frame)
+    integer_cells = np.zeros(len(keys), dtype=np.int64)
+    if cells:
+        rows, columns, values = zip(*cells)
+        data[list(rows), list(columns)] = values
+        for column, value in zip(columns, values):
+            if isinstance(_sql_value(value), int):
+                integer_cells[column] += 1
+    frame = pd.DataFrame(data, index=pd.Index(regions, name='regioni'), columns=pd.MultiIndex.from_tuples(keys))
+    integer = [key for key, count in zip(keys, integer_cells) if regions and count == len(regions)]
+    if integer:
+        frame[integer] = frame[integer].astype('int64')
+    return frame
+
+
+def results_store_path(path, name):
+    """
+        Percorso del database dei risultati: stessa cartella e stesso nome del file csv dei risultati, con estensione .sqlite.
+    """
+    return os.path.join(path, os.path.splitext(name)[0] + '.sqlite')
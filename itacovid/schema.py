@@ -0,0 +1,186 @@
+import pandas as pd
+
+# da incrementare ogni volta che cambiano colonne o tipi di dato del dataframe restituito da read_covid_dataset
+SCHEMA_VERSION = 1
+
+
+class ColumnError(ValueError):
+    pass
+
+
+class DatasetSchema():
+    """
+        Descrizione del file csv e del dataframe che se ne ottiene:
+            - names: nomi assegnati alle colonne del file csv, nell'ordine in cui compaiono;
+            - usecols: colonne effettivamente lette dal file (le altre vengono scartate già in lettura);
+            - index_col: colonna da usare come indice;
+            - date_columns: colonne convertite in date durante la lettura;
+            - category_columns: colonne di testo memorizzate come categorie;
+            - fill_values: valori con cui sostituire i dati mancanti, per colonna;
+            - derived_columns: colonne calcolate dopo la lettura come variazione giornaliera di un'altra colonna
+              (nome colonna calcolata: nome colonna di partenza);
+            - group_column: colonna che identifica una serie (regione o provincia), usata per le variazioni giornaliere
+              e come raggruppamento di default delle statistiche;
+            - parent_column: colonna del livello superiore della gerarchia (la regione di ogni provincia), se esiste;
+            - name e file_name: nome dello schema e nome del file csv su Kaggle.
+        Tutte le altre colonne lette sono considerate numeriche e vengono ridotte al tipo intero più piccolo in grado di
+        contenerne i valori.
+    """
+    def __init__(self, names, usecols, index_col, date_columns, category_columns, fill_values, derived_columns=None,
+                 group_column='denominazione_regione', parent_column=None, name='regioni',
+                 file_name='covid19_italy_region.csv', version=SCHEMA_VERSION):
+        self.names = list(names)
+        self.usecols = list(usecols)
+        self.index_col = index_col
+        self.date_columns = list(date_columns)
+        self.category_columns = list(category_columns)
+        self.fill_values = dict(fill_values)
+        self.derived_columns = dict(derived_columns or {})
+        self.group_column = group_column
+        self.parent_column = parent_column
+        self.name = name
+        self.file_name = file_name
+        self.version = version
+
+    @property
+    def numeric_columns(self):
+        excluded = set(self.date_columns) | set(self.category_columns) | {self.index_col}
+        return [column for column in self.usecols if column not in excluded]
+
+    @property
+    def key_columns(self):
+        """
+            Colonne sempre presenti nel dataframe, anche quando se ne richiede solo una parte: date e categorie.
+        """
+        return self.date_columns + self.category_columns
+
+    def required_columns(self, columns):
+        """
+            Prende in input le colonne richieste e restituisce quelle da leggere dal file per poterle ottenere,
+            comprese le colonne chiave e quelle da cui vengono calcolate le colonne derivate.
+        """
+        available = self.usecols + list(self.derived_columns)
+        for column in columns:
+            if column not in available:
+                raise ColumnError('Colonna non disponibile: ' + str(column) + '! Per favore inserisci una o più delle '
+                                  'seguenti colonne:\n' + str(available))
+        required = set(self.key_columns) | {self.index_col}
+        for column in columns:
+            required.add(self.derived_columns.get(column, column))
+        return [column for column in self.usecols if column in required]
+
+    def read_options(self, usecols=None):
+        """
+            Restituisce gli argomenti da passare a pandas.read_csv per leggere il file secondo lo schema.
+            In via opzionale si può indicare un sottoinsieme delle colonne da leggere.
+        """
+        return {'names': self.names,
+                'header': 0,
+                'usecols': self.usecols if usecols is None else usecols,
+                'index_col': self.index_col,
+                'parse_dates': self.date_columns,
+                'dtype': {column: 'category' for column in self.category_columns}}
+
+
+REGION_SCHEMA = DatasetSchema(
+    names=['sno', 'data', 'stato', 'codice_regione', 'denominazione_regione', 'lat', 'long',
+           'ricoverati_con_sintomi', 'terapia_intensiva', 'totale_ospedalizzati', 'isolamento_domiciliare',
+           'totale_positivi', 'nuovi_positivi', 'dimessi_guariti', 'deceduti', 'totale_casi', 'casi_testati'],
+    usecols=['sno', 'data', 'denominazione_regione',
+             'ricoverati_con_sintomi', 'terapia_intensiva', 'totale_ospedalizzati', 'isolamento_domiciliare',
+             'totale_positivi', 'nuovi_positivi', 'dimessi_guariti', 'deceduti', 'totale_casi', 'casi_testati'],
+    index_col='sno',
+    date_columns=['data'],
+    category_columns=['denominazione_regione'],
+    fill_values={'casi_testati': 0},
+    derived_columns={'variazione_totale_positivi': 'totale_positivi'})
+
+PROVINCE_SCHEMA = DatasetSchema(
+    names=['sno', 'data', 'stato', 'codice_regione', 'denominazione_regione', 'codice_provincia',
+           'denominazione_provincia', 'sigla_provincia', 'lat', 'long', 'totale_casi'],
+    usecols=['sno', 'data', 'denominazione_regione', 'denominazione_provincia', 'totale_casi'],
+    index_col='sno',
+    date_columns=['data'],
+    category_columns=['denominazione_regione', 'denominazione_provincia'],
+    fill_values={'totale_casi': 0},
+    derived_columns={'variazione_totale_casi': 'totale_casi'},
+    group_column='denominazione_provincia',
+    parent_column='denominazione_regione',
+    name='province',
+    file_name='covid19_italy_province.csv')
+
+SCHEMAS = {schema.name: schema for schema in (REGION_SCHEMA, PROVINCE_SCHEMA)}
+
+
+def schema_of(df):
+    """
+        La funzione restituisce lo schema a cui appartiene il dataframe: quello delle province se contiene la colonna
+        denominazione_provincia, altrimenti quello delle regioni.
+    """
+    if PROVINCE_SCHEMA.group_column in df.columns:
+        return PROVINCE_SCHEMA
+    return REGION_SCHEMA
+
+
+def narrowest_integer(series):
+    """
+        La funzione restituisce la serie intera convertita nel tipo intero con segno più piccolo che può contenerne tutti
+        i valori. Vengono usati solo interi con segno, così le differenze tra valori (es. variazioni giornaliere) restano
+        corrette. Le serie non intere vengono restituite invariate.
+    """
+    if pd.api.types.is_bool_dtype(series.dtype) or not pd.api.types.is_integer_dtype(series.dtype):
+        return series
+    return pd.to_numeric(series, downcast='integer')
+
+
+def optimize_dtypes(df, category_columns=None):
+    """
+        La funzione restituisce una copia del dataframe con tipi di dato compatti:
+            - le colonne di testo (o quelle indicate in category_columns) diventano categorie;
+            - le colonne numeriche intere vengono ridotte al tipo intero più piccolo in grado di contenerne i valori.
+    """
+    df = df.copy()
+    for column in df.columns:
+        if (category_columns is not None and column in category_columns) or df[column].dtype == object:
+            df[column] = df[column].astype('category')
+        else:
+            df[column] = narrowest_integer(df[column])
+    return df
+
+
+def memory_usage(df):
+    """
+        La funzione restituisce la memoria occupata dal dataframe in byte, indice e contenuto delle stringhe compresi.
+    """
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def memory_report(df):
+    """
+        La funzione prende in input un dataframe e restituisce un dataframe con, per ciascuna colonna, il tipo di dato e la
+        memoria occupata (in byte) prima e dopo la conversione nei tipi compatti di optimize_dtypes.
+        L'ultima riga ("totale") riporta la memoria complessiva, indice compreso.
+        Esempio:
+            memory_report(read_covid_dataset(compact=False))
+    """
+    optimized = optimize_dtypes(df)
+    report = pd.DataFrame({'tipo_prima': df.dtypes.astype(str),
+                           'byte_prima': df.memory_usage(index=False, deep=True),
+                           'tipo_dopo': optimized.dtypes.astype(str),
+                           'byte_dopo': optimized.memory_usage(index=False, deep=True)})
+    report.loc['totale'] = ['', memory_usage(df), '', memory_usage(optimized)]
+    report['riduzione_%'] = (100 * (1 - report['byte_dopo'] / report['byte_prima'])).round(1)
+    return report
+
+
+def expand_dtypes(df):
+    """
+        Operazione inversa di optimize_dtypes: le categorie tornano stringhe (object) e gli interi vengono convertiti in int64.
+    """
+    df = df.copy()
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+        elif pd.api.types.is_integer_dtype(df[column].dtype):
+            df[column] = df[column].astype('int64')
+    return df
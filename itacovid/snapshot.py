@@ -0,0 +1,126 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from .schema import SCHEMA_VERSION
+from .instrumentation import instrumented, stage
+
+# da incrementare ogni volta che cambia il formato della cartella dello snapshot
+SNAPSHOT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def _column_values(series):
+    """
+        Restituisce l'array da salvare per la colonna e le eventuali categorie: le categorie (e le stringhe) vengono
+        salvate come codici numerici, perchè un array di oggetti Python non può essere mappato in memoria.
+    """
+    if series.dtype == object:
+        series = series.astype('category')
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), list(series.cat.categories)
+    return series.to_numpy(), None
+
+
+@instrumented('write_snapshot')
+def write_snapshot(df, directory):
+    """
+        La funzione salva il dataframe elaborato (es. quello restituito da read_covid_dataset) nella cartella indicata,
+        con un file .npy per colonna (indice compreso) e un file manifest.json con nomi, tipi e categorie.
+        Lo snapshot può poi essere aperto da altri processi con open_snapshot senza rileggere nè copiare i dati.
+
+        La cartella viene scritta accanto a quella finale e sostituita solo al termine: i processi che hanno già aperto
+        lo snapshot precedente continuano a leggerlo (su Linux e macOS i file mappati restano validi anche se eliminati).
+        Esempio:
+            write_snapshot(read_covid_dataset('/Users/user_name/Desktop'), '/Users/user_name/Desktop/snapshot')
+    """
+    directory = os.path.abspath(directory)
+    tmp_dir = directory + '.tmp-' + str(os.getpid())
+    if os.path.isdir(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    columns = []
+    frame = df.reset_index()
+    with stage('snapshot_columns', len(df)) as current:
+        for i, column in enumerate(frame.columns):
+            values, categories = _column_values(frame[column])
+            file_name = str(i) + '.npy'
+            np.save(os.path.join(tmp_dir, file_name), np.ascontiguousarray(values), allow_pickle=False)
+            columns.append({'name': column, 'file': file_name, 'dtype': values.dtype.str, 'categories': categories})
+        current.rows_out = len(frame)
+
+    manifest = {'version': SNAPSHOT_VERSION, 'schema_version': SCHEMA_VERSION, 'rows': len(frame),
+                'index': df.index.name if df.index.name is not None else 'index', 'columns': columns}
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w') as f_obj:
+        json.dump(manifest, f_obj, default=str)
+
+    # sostituisco la cartella precedente: prima la sposto, poi rinomino quella nuova ed elimino quella vecchia
+    old_dir = None
+    if os.path.isdir(directory):
+        old_dir = directory + '.old-' + str(os.getpid())
+        os.replace(directory, old_dir)
+    os.replace(tmp_dir, directory)
+    if old_dir is not None:
+        shutil.rmtree(old_dir, ignore_errors=True)
+    return directory
+
+
+def read_manifest(directory):
+    """
+        La funzione restituisce il contenuto del file manifest.json dello snapshot, dopo averne controllato la versione.
+    """
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.isfile(manifest_path):
+        raise FileNotFoundError('Snapshot non trovato: ' + str(manifest_path))
+    with open(manifest_path) as f_obj:
+        manifest = json.load(f_obj)
+    if manifest.get('version') != SNAPSHOT_VERSION or manifest.get('schema_version') != SCHEMA_VERSION:
+        raise SnapshotError('Lo snapshot ' + str(directory) + ' è stato scritto da una versione diversa del pacchetto! '
+                            'Per favore rigeneralo con write_snapshot')
+    return manifest
+
+
+@instrumented('open_snapshot')
+def open_snapshot(directory, columns=None):
+    """
+        La funzione apre in sola lettura lo snapshot scritto con write_snapshot e restituisce il dataframe, le cui colonne
+        sono mappate in memoria (numpy.load con mmap_mode='r'): i dati non vengono letti nè copiati, e tutti i processi
+        che aprono lo stesso snapshot condividono un'unica copia fisica (la cache delle pagine del sistema operativo).
+        Le colonne di tipo categoria sono ricostruite a partire dai codici mappati.
+        Con columns si possono indicare le sole colonne di interesse (oltre a data e denominazione_regione).
+
+        Il dataframe può essere passato alle funzioni subset_*, a Query, CovidDataset e Analyzer.analyze come quello
+        restituito da read_covid_dataset; i filtri producono copie delle sole righe selezionate. Le colonne non sono
+        modificabili: per modificarle occorre prima copiare il dataframe (df.copy()).
+        Esempio:
+            df = open_snapshot('/Users/user_name/Desktop/snapshot')
+            analyzer.analyze(subset_by_region(df, 'Veneto'))
+    """
+    manifest = read_manifest(directory)
+    selected = None
+    if columns is not None:
+        selected = {manifest['index'], 'data', 'denominazione_regione'} | set(columns)
+        missing = set(columns) - {column['name'] for column in manifest['columns']}
+        if missing:
+            raise SnapshotError('Colonne non presenti nello snapshot: ' + str(sorted(missing)))
+
+    data, index = {}, None
+    for column in manifest['columns']:
+        if selected is not None and column['name'] not in selected:
+            continue
+        # vista come ndarray: la mappatura resta aperta finchè esiste la vista, ma pandas non riceve la sottoclasse memmap
+        values = np.load(os.path.join(directory, column['file']), mmap_mode='r', allow_pickle=False).view(np.ndarray)
+        if column['categories'] is not None:
+            values = pd.Categorical.from_codes(values, column['categories'])
+        if column['name'] == manifest['index']:
+            index = pd.Index(values, name=column['name'], copy=False)
+        else:
+            data[column['name']] = values
+    # indice passato al costruttore: set_index copierebbe tutte le colonne
+    return pd.DataFrame(data, index=index, copy=False)
@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import zipfile
+import http.client
+import urllib.error
+import urllib.request
+
+KAGGLE_DATASET = 'sudalairajkumar/covid19-in-italy'
+REGION_FILE_NAME = 'covid19_italy_region.csv'
+PROVINCE_FILE_NAME = 'covid19_italy_province.csv'
+
+
+class SourceError(OSError):
+    pass
+
+
+class DatasetSource():
+    """
+        Sorgente da cui recuperare il file csv aggiornato del dataset.
+        Le sottoclassi devono implementare il metodo fetch, che restituisce il percorso di un file locale con il contenuto
+        aggiornato del file richiesto. In questo modo l'aggiornamento incrementale (update_covid_dataset) non dipende da
+        dove si trovano i dati: Kaggle, una cartella locale, un mirror, ...
+    """
+    def fetch(self, file_name=REGION_FILE_NAME):
+        raise NotImplementedError
+
+    def key(self, file_name=REGION_FILE_NAME):
+        """
+            Identificativo del file richiesto a questa sorgente, usato da fetch_all per ricordare l'hash dell'ultima copia
+            recuperata.
+        """
+        return type(self).__name__ + ':' + file_name
+
+
+class LocalSource(DatasetSource):
+    """
+        Sorgente locale: una cartella che contiene il file richiesto oppure direttamente il percorso di un file csv.
+        Utile per lavorare offline o per usare una copia del dataset già scaricata altrove.
+        Esempio:
+            LocalSource('/Users/user_name/Desktop/mirror')
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def key(self, file_name=REGION_FILE_NAME):
+        return 'file:' + os.path.abspath(self._file_path(file_name))
+
+    def _file_path(self, file_name):
+        return self.path if os.path.isfile(self.path) else os.path.join(self.path, file_name)
+
+    def fetch(self, file_name=REGION_FILE_NAME):
+        file_path = self.path if os.path.isfile(self.path) else os.path.join(self.path, file_name)
+        if not os.path.isfile(file_path):
+            raise SourceError('File non trovato: ' + file_path)
+        return file_path
+
+
+class KaggleSource(DatasetSource):
+    """
+        Sorgente Kaggle: scarica solo il file richiesto (non l'intero archivio) in una cartella temporanea.
+        Richiede il pacchetto kaggle e le credenziali (vedi my_kaggle_api).
+    """
+    def __init__(self, dataset=KAGGLE_DATASET, download_dir=None):
+        self.dataset = dataset
+        self.download_dir = download_dir
+
+    def key(self, file_name=REGION_FILE_NAME):
+        return 'kaggle:' + self.dataset + '/' + file_name
+
+    def fetch(self, file_name=REGION_FILE_NAME):
+        from kaggle.api.kaggle_api_extended import KaggleApi
+        # import locale per lo stesso motivo di download_covid_dataset: le credenziali possono essere impostate dopo l'import del pacchetto
+
+        api = KaggleApi()
+        api.authenticate()
+
+        download_dir = self.download_dir or tempfile.mkdtemp(prefix='itacovid-')
+        api.dataset_download_file(dataset=self.dataset, file_name=file_name, path=download_dir, force=True)
+
+        # a seconda della dimensione Kaggle restituisce il file compresso (file_name.zip) oppure il csv
+        # (la cartella può essere quella dell'utente, per cui considero solo l'archivio del file richiesto)
+        archive = os.path.join(download_dir, file_name + '.zip')
+        if os.path.isfile(archive):
+            with zipfile.ZipFile(archive) as zip_obj:
+                zip_obj.extract(file_name, download_dir)
+            os.remove(archive)
+
+        file_path = os.path.join(download_dir, file_name)
+        if not os.path.isfile(file_path):
+            raise SourceError('Il file ' + file_name + ' non è stato scaricato da Kaggle')
+        return file_path
+
+
+def _sha256(file_path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f_obj:
+        for block in iter(lambda: f_obj.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_meta(meta, meta_path):
+    with open(meta_path, 'w') as f_obj:
+        json.dump(meta, f_obj)
+
+
+class HttpSource(DatasetSource):
+    """
+        Sorgente HTTP: un indirizzo che termina con '/' è la cartella di un mirror (il nome del file richiesto viene
+        aggiunto all'indirizzo), altrimenti è l'indirizzo del file stesso.
+        Il file viene scaricato nella cartella download_dir (di default una cartella temporanea) e:
+            - viene richiesto al server solo se è cambiato, inviando l'ETag (o la data di modifica) della copia già
+              scaricata, memorizzati accanto al file;
+            - un download interrotto riprende dal punto in cui si era fermato (richiesta Range sul file .part);
+            - in caso di errori di rete la richiesta viene ripetuta fino a retries volte, con attesa crescente;
+            - se si indica sha256 il contenuto scaricato viene verificato prima di sostituire la copia già presente, e
+              scartato se non corrisponde (la copia precedente resta invariata).
+        Esempio:
+            HttpSource('https://mirror.example.org/covid/', download_dir='/Users/user_name/Desktop/download')
+    """
+    def __init__(self, url, download_dir=None, sha256=None, retries=3, timeout=60, headers=None):
+        self.url = url
+        self.download_dir = download_dir
+        self.sha256 = sha256
+        self.retries = retries
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+
+    def file_url(self, file_name=REGION_FILE_NAME):
+        return self.url + file_name if self.url.endswith('/') else self.url
+
+    def key(self, file_name=REGION_FILE_NAME):
+        return self.file_url(file_name)
+
+    def _paths(self, file_name):
+        if self.download_dir is None:
+            self.download_dir = tempfile.mkdtemp(prefix='itacovid-')
+        os.makedirs(self.download_dir, exist_ok=True)
+        file_path = os.path.join(self.download_dir, file_name)
+        return file_path, file_path + '.part', file_path + '.http.json'
+
+    def fetch(self, file_name=REGION_FILE_NAME):
+        file_path, part_path, meta_path = self._paths(file_name)
+        for attempt in range(self.retries + 1):
+            try:
+                downloaded = self._download(self.file_url(file_name), file_path, part_path, meta_path)
+                break
+            except (urllib.error.URLError, http.client.HTTPException, ConnectionError, TimeoutError) as error:
+                # gli errori HTTP 4xx non vengono ripetuti: la richiesta stessa non è valida
+                if isinstance(error, urllib.error.HTTPError) and error.code < 500 or attempt == self.retries:
+                    raise SourceError('Download non riuscito: ' + self.file_url(file_name) + ' (' + str(error) + ')')
+                time.sleep(min(2 ** attempt, 30))
+
+        if not downloaded:
+            # file non modificato sul server (304): verifico la copia già presente, senza eliminarla
+            self._check_sha256(file_path, self.file_url(file_name))
+        return file_path
+
+    def _check_sha256(self, file_path, url):
+        if self.sha256 is not None and _sha256(file_path) != self.sha256.lower():
+            raise SourceError('Il contenuto scaricato da ' + url + ' non corrisponde al checksum')
+
+    def _download(self, url, file_path, part_path, meta_path):
+        """
+            Esegue una richiesta e restituisce True se il file è stato scaricato (e verificato), False se la copia già
+            presente è aggiornata (risposta 304).
+        """
+        meta = {}
+        if os.path.isfile(meta_path):
+            with open(meta_path) as f_obj:
+                meta = json.load(f_obj)
+
+        headers = dict(self.headers)
+        offset = os.path.getsize(part_path) if os.path.isfile(part_path) else 0
+        if not offset and os.path.isfile(file_path) and meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        elif not offset and os.path.isfile(file_path) and meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        if offset:
+            headers['Range'] = 'bytes=' + str(offset) + '-'
+            # la ripresa è valida solo se il file sul server è ancora quello del download interrotto
+            if meta.get('partial_etag'):
+                headers['If-Range'] = meta['partial_etag']
+
+        request = urllib.request.Request(url, headers=headers)
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as error:
+            if error.code == 304:
+                # file non modificato: la copia già scaricata è aggiornata
+                return False
+            if error.code == 416 and offset:
+                # il file .part non è più valido (es. il file sul server si è accorciato): riparto da zero
+                os.remove(part_path)
+                return self._download(url, file_path, part_path, meta_path)
+            raise
+
+        with response:
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            append = offset and response.status == 206
+            # l'ETag della copia completa viene aggiornato solo a download terminato
+            meta['partial_etag'] = etag
+            _write_meta(meta, meta_path)
+            with open(part_path, 'ab' if append else 'wb') as f_obj:
+                shutil.copyfileobj(response, f_obj, 1 << 20)
+                received = f_obj.tell() - (offset if append else 0)
+            # se la connessione si interrompe la lettura termina senza errori: controllo la lunghezza ricevuta
+            length = response.headers.get('Content-Length')
+            if length is not None and received < int(length):
+                raise http.client.IncompleteRead(b'', int(length) - received)
+
+        try:
+            self._check_sha256(part_path, url)
+        except SourceError:
+            # download completo ma con un contenuto diverso da quello atteso: lo scarto e mantengo la copia precedente
+            os.remove(part_path)
+            raise
+        os.replace(part_path, file_path)
+        _write_meta({'etag': etag, 'last_modified': last_modified}, meta_path)
+        return True
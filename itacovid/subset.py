@@ -1,4 +1,6 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+import pandas as pd
+from .instrumentation import instrumented
 
 class RegionError (ValueError):
     pass
@@ -9,6 +11,19 @@ class MonthError (ValueError):
 class PeriodError (ValueError):
     pass
 
+class ProvinceError (ValueError):
+    pass
+
+ITA_MONTHS = ('Gennaio', 'Febbraio', 'Marzo', 'Aprile', 'Maggio', 'Giugno', 'Luglio', 'Agosto', 'Settembre', 'Ottobre', 'Novembre', 'Dicembre')
+
+def _is_dataset(df):
+    # import locale per evitare l'import circolare: i moduli dataset e backends utilizzano le funzioni di controllo
+    # definite qui. Entrambi gli oggetti hanno i metodi by_region, by_province, by_month e by_period
+    from .dataset import CovidDataset
+    from .backends import AnalyticsBackend
+    return isinstance(df, (CovidDataset, AnalyticsBackend))
+
+@instrumented('subset_by_region')
 def subset_by_region(df, *regions):
     """
         La funzione prende in input il dataframe e un numero varibile di regioni e ritorna il dataframe filtrato.
@@ -16,37 +31,52 @@ def subset_by_region(df, *regions):
         subset_by_region(region_df, 'Veneto', 'piemonte')
     """
     regions = list(map(lambda x: x.capitalize(), regions))
-    regions_check = df['denominazione_regione'].unique()
+    if _is_dataset(df):
+        return df.by_region(*regions)
+    if not isinstance(df, pd.DataFrame):
+        return _subset_chunks_by_region(df, regions)
 
-    for region in regions:
-        if region not in regions_check:
-            raise RegionError('Uno o più nomi di Regione inseriti non sono corretti! Per favore inserisci '
-                              'uno o più dei seguenti nomi:\n' + str(regions_check))
+    _check_regions(regions, df['denominazione_regione'].unique())
 
     return df[df.denominazione_regione.isin(regions)]
 
+@instrumented('subset_by_province')
+def subset_by_province(df, *provinces):
+    """
+        La funzione prende in input il dataframe delle province (vedi read_province_dataset) e un numero varibile di
+        province e ritorna il dataframe filtrato.
+        Esempio:
+        subset_by_province(province_df, 'Padova', 'treviso')
+    """
+    provinces = list(map(lambda x: x.capitalize(), provinces))
+    if _is_dataset(df):
+        return df.by_province(*provinces)
+    if not isinstance(df, pd.DataFrame):
+        return _subset_chunks_by_group(df, provinces, 'denominazione_provincia', _check_provinces)
+
+    _check_provinces(provinces, df['denominazione_provincia'].unique())
+
+    return df[df.denominazione_provincia.isin(provinces)]
+
+@instrumented('subset_by_month')
 def subset_by_month(df, *months):
     """
         La funzione prende in input il dataframe e un numero varibile di mesi e ritorna il dataframe filtrato.
         Esempio:
         subset_by_region(region_df, 'marzo', 'aprile')
     """
+    if _is_dataset(df):
+        return df.by_month(*months)
 
-    eng_month = ('January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December')
-    ita_month = ('Gennaio', 'Febbraio', 'Marzo', 'Aprile', 'Maggio', 'Giugno', 'Luglio', 'Agosto', 'Settembre', 'Ottobre', 'Novembre', 'Dicembre')
-    ita_eng_month = dict(zip(ita_month, eng_month))
-    months = map(lambda x: x.capitalize(), months)
-    months_list = list(months)
-
-    for month in months_list:
-        if month not in ita_month:
-            raise MonthError('Uno o più nomi di mesi inseriti non sono corretti! Per favore inserisci correttamente i mesi in italiano')
+    # confronto direttamente il numero del mese invece di convertire ogni data nel nome del mese con strftime
+    month_numbers = _month_numbers(months)
 
-    translated_month = list(map(lambda x: ita_eng_month[x], months_list))
-    #translated_month = map(lambda x: ita_eng_month[x], map(lambda x: x.capitalize(), months))
+    if not isinstance(df, pd.DataFrame):
+        return (chunk[chunk.data.dt.month.isin(month_numbers)] for chunk in df)
 
-    return df[df.data.dt.strftime("%B").isin(translated_month)]
+    return df[df.data.dt.month.isin(month_numbers)]
 
+@instrumented('subset_by_period')
 def subset_by_period(df, start, end):
     """
         La funzione prende in input il dataframe la data di inizio e di fine del periodo desiderato (estremi compresi).
@@ -54,17 +84,93 @@ def subset_by_period(df, start, end):
         Esempio:
         subset_by_period(basic_df, '25/02/2020', '27/02/2020'):
     """
-    start = datetime.strptime(start, '%d/%m/%Y').date()
-    end = datetime.strptime(end, '%d/%m/%Y').date()
+    if _is_dataset(df):
+        return df.by_period(start, end)
+
+    start, end = _parse_period(start, end)
+    if not isinstance(df, pd.DataFrame):
+        return _subset_chunks_by_period(df, start, end)
     min_date = df['data'].min().date()
     max_date = df['data'].max().date()
 
+    _check_period(start, end, min_date, max_date)
+
+    return df[_period_mask(df['data'], start, end)]
+
+def _check_regions(regions, regions_check):
+    # con la colonna categorica unique restituisce un Categorical: nel messaggio va mostrato l'elenco dei nomi
+    regions_check = list(regions_check)
+    for region in regions:
+        if region not in regions_check:
+            raise RegionError('Uno o più nomi di Regione inseriti non sono corretti! Per favore inserisci '
+                              'uno o più dei seguenti nomi:\n' + str(regions_check))
+
+def _check_provinces(provinces, provinces_check):
+    provinces_check = sorted(provinces_check)
+    missing = set(provinces).difference(provinces_check)
+    if missing:
+        raise ProvinceError('Uno o più nomi di Provincia inseriti non sono corretti: ' + str(sorted(missing)) +
+                            '! Per favore inserisci uno o più dei seguenti nomi:\n' + str(provinces_check))
+
+def _month_numbers(months):
+    """
+        Converte i nomi dei mesi in italiano (non case sensitive) nel numero del mese (1-12).
+    """
+    months_list = list(map(lambda x: x.capitalize(), months))
+
+    for month in months_list:
+        if month not in ITA_MONTHS:
+            raise MonthError('Uno o più nomi di mesi inseriti non sono corretti! Per favore inserisci correttamente i mesi in italiano')
+
+    return [ITA_MONTHS.index(month) + 1 for month in months_list]
+
+def _parse_period(start, end):
+    start = datetime.strptime(start, '%d/%m/%Y').date()
+    end = datetime.strptime(end, '%d/%m/%Y').date()
+    return start, end
+
+def _period_mask(dates, start, end):
+    """
+        Maschera booleana delle righe comprese tra start ed end (estremi compresi).
+        Confronto le date come datetime64 invece di creare un oggetto date per ogni riga con .dt.date: l'estremo
+        superiore è escluso ed è la mezzanotte del giorno successivo ad end.
+    """
+    return (dates >= pd.Timestamp(start)) & (dates < pd.Timestamp(end + timedelta(days=1)))
+
+def _check_period(start, end, min_date, max_date):
     if (start < min_date) or (end > max_date):
         raise PeriodError(f'Le date inserite sono fuori intervallo!\nInserisci una data compresa tra il '
                           f'{min_date.strftime("%d/%m/%Y")} e il {max_date.strftime("%d/%m/%Y")}')
 
-    #Creo una maschera con dei valori booleani
-    mask = (df['data'].dt.date >= start) & (df['data'].dt.date <= end)
-    # uso l'attributo .dt per accedere alle componenti date/day/time altrimenti ritornerebbe il seguente errore: 'Series' object has no attribute 'date'
+def _subset_chunks_by_region(chunks, regions):
+    return _subset_chunks_by_group(chunks, regions, 'denominazione_regione', _check_regions)
+
+def _subset_chunks_by_group(chunks, names, column, check):
+    """
+        Filtra per regione (o per provincia) un iteratore di dataframe, un blocco alla volta.
+        Poichè l'elenco completo dei nomi è noto solo dopo aver letto tutti i blocchi, il controllo sui nomi inseriti
+        viene effettuato alla fine dell'iterazione.
+    """
+    names_check = set()
+    for chunk in chunks:
+        names_check.update(chunk[column].unique())
+        yield chunk[chunk[column].isin(names)]
+
+    check(names, sorted(names_check))
+
+def _subset_chunks_by_period(chunks, start, end):
+    """
+        Filtra per periodo un iteratore di dataframe, un blocco alla volta.
+        Il controllo sull'intervallo di date viene effettuato alla fine dell'iterazione, quando sono note la data minima e massima.
+    """
+    min_date = max_date = None
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        chunk_min, chunk_max = chunk['data'].min().date(), chunk['data'].max().date()
+        min_date = chunk_min if min_date is None else min(min_date, chunk_min)
+        max_date = chunk_max if max_date is None else max(max_date, chunk_max)
+        yield chunk[_period_mask(chunk['data'], start, end)]
 
-    return df[mask]
+    if min_date is not None:
+        _check_period(start, end, min_date, max_date)
@@ -0,0 +1,110 @@
+import io
+import os
+import csv
+import shutil
+import pandas as pd
+from .get_dataset import read_covid_dataset, _dataset_file_path, _clean_columns, _add_derived_columns, _last_rows
+from .cache import default_cache_dir, load_cached_frame, store_cached_frame
+from .schema import REGION_SCHEMA, optimize_dtypes
+
+
+def _last_line(file_path, block_size=1 << 16):
+    """
+        Restituisce l'ultima riga non vuota del file leggendo solo la parte finale, senza scorrere tutto il file.
+    """
+    with open(file_path, 'rb') as f_obj:
+        f_obj.seek(0, os.SEEK_END)
+        position = f_obj.tell()
+        tail = b''
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            f_obj.seek(position)
+            tail = f_obj.read(step) + tail
+            lines = tail.rstrip(b'\r\n').splitlines()
+            if len(lines) > 1 or position == 0:
+                return lines[-1].decode('utf-8') if lines else ''
+    return ''
+
+
+def last_stored_date(path=None, name=None):
+    """
+        La funzione restituisce la data più recente presente nel file csv locale (None se il file non esiste o è vuoto).
+        Il file di Kaggle è in ordine cronologico, per cui è sufficiente leggere l'ultima riga.
+    """
+    _, file_path = _dataset_file_path(path, name)
+    if not os.path.isfile(file_path):
+        return None
+    values = next(csv.reader([_last_line(file_path)]), [])
+    date_position = REGION_SCHEMA.names.index('data')
+    if len(values) <= date_position:
+        return None
+    try:
+        return pd.Timestamp(values[date_position])
+    except ValueError:
+        # il file contiene solo l'intestazione
+        return None
+
+
+def update_covid_dataset(source, path=None, name=None, use_cache=True, cache_dir=None):
+    """
+        Aggiornamento incrementale del file csv locale: recupera il file aggiornato dalla sorgente indicata (vedi sources,
+        ad esempio KaggleSource(), HttpSource('https://mirror/covid/') o LocalSource('/percorso/mirror')), individua
+        l'ultima data già memorizzata e aggiunge in coda al file locale solo le righe successive.
+        Se il file locale non esiste viene semplicemente copiato quello della sorgente.
+
+        Anche la cache di read_covid_dataset viene aggiornata in modo incrementale: le colonne derivate delle nuove righe
+        vengono calcolate a partire dall'ultima riga già memorizzata di ciascuna regione, senza rielaborare l'intero file.
+
+        Restituisce il dataframe elaborato (come read_covid_dataset) con le sole righe aggiunte, che può essere usato per
+        aggiornare le statistiche già calcolate con Analyzer.analyze_incremental.
+        Esempio:
+            new_rows = update_covid_dataset(LocalSource('/Users/user_name/Desktop/mirror'))
+            results, partial = analyzer.analyze_incremental(new_rows, partial)
+    """
+    path, file_path = _dataset_file_path(path, name)
+    source_path = source.fetch()
+
+    if not os.path.isfile(file_path):
+        shutil.copyfile(source_path, file_path)
+        return read_covid_dataset(path, os.path.basename(file_path), use_cache=use_cache, cache_dir=cache_dir)
+
+    last_date = last_stored_date(path, os.path.basename(file_path))
+    # leggo la sorgente come testo per riscrivere le nuove righe esattamente come sono nel file originale
+    raw = pd.read_csv(source_path, dtype=str, keep_default_na=False)
+    dates = pd.to_datetime(raw.iloc[:, REGION_SCHEMA.names.index('data')])
+    new_raw = raw[dates > last_date] if last_date is not None else raw
+    if new_raw.empty:
+        return read_covid_dataset(path, os.path.basename(file_path), use_cache=use_cache, cache_dir=cache_dir).iloc[0:0]
+
+    # dati già memorizzati: servono le ultime righe di ogni regione per calcolare le variazioni giornaliere
+    if cache_dir is None:
+        cache_dir = default_cache_dir(path)
+    stored = load_cached_frame(file_path, cache_dir) if use_cache else None
+    previous = stored
+    if previous is None:
+        previous = read_covid_dataset(path, os.path.basename(file_path), use_cache=False,
+                                      columns=list(REGION_SCHEMA.derived_columns.values()))
+    last_rows = _last_rows(previous)
+
+    # aggiungo le nuove righe in coda al file, andando prima a capo se l'ultima riga non termina con il carattere di nuova riga
+    with open(file_path, 'rb') as f_obj:
+        f_obj.seek(0, os.SEEK_END)
+        needs_newline = False
+        if f_obj.tell() > 0:
+            f_obj.seek(-1, os.SEEK_END)
+            needs_newline = f_obj.read(1) != b'\n'
+    with open(file_path, 'a', newline='') as f_obj:
+        if needs_newline:
+            f_obj.write('\n')
+        new_raw.to_csv(f_obj, header=False, index=False, lineterminator='\n')
+
+    new_rows = pd.read_csv(io.StringIO(new_raw.to_csv(index=False)), **REGION_SCHEMA.read_options())
+    new_rows = _clean_columns(new_rows)
+    new_rows, _ = _add_derived_columns(new_rows, last_rows)
+    new_rows = optimize_dtypes(new_rows)
+
+    if stored is not None:
+        store_cached_frame(optimize_dtypes(pd.concat([stored, new_rows])), file_path, cache_dir)
+
+    return new_rows
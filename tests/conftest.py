@@ -0,0 +1,66 @@
+"""
+    Fixture comuni ai test: file csv sintetici (vedi benchmarks.synthetic) scritti in una cartella temporanea e
+    confronto tra dizionari dei risultati di Analyzer.analyze.
+"""
+import math
+import os
+import pytest
+
+from benchmarks.synthetic import write_region_csv, write_province_csv
+
+REGION_FILE_NAME = 'covid19_italy_region.csv'
+PROVINCE_FILE_NAME = 'covid19_italy_province.csv'
+STATISTICS = ['max', 'min', 'mean', 'std', 'sum', 'count']
+
+
+@pytest.fixture(scope='session')
+def data_dir(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp('dati'))
+    # righe mancanti: le regioni hanno giorni diversi e i blocchi non contengono tutti lo stesso numero di righe
+    write_region_csv(os.path.join(directory, REGION_FILE_NAME), n_regions=21, n_days=400, missing_rate=0.05)
+    write_province_csv(os.path.join(directory, PROVINCE_FILE_NAME), n_regions=21, provinces_per_region=5, n_days=120)
+    return directory
+
+
+@pytest.fixture(scope='session')
+def region_df(data_dir):
+    from itacovid.get_dataset import read_covid_dataset
+    return read_covid_dataset(data_dir, REGION_FILE_NAME, use_cache=False)
+
+
+@pytest.fixture(scope='session')
+def province_df(data_dir):
+    from itacovid.province import read_province_dataset
+    return read_province_dataset(data_dir, PROVINCE_FILE_NAME, use_cache=False)
+
+
+def _same_value(expected, actual, rel_tol):
+    if isinstance(expected, float) and math.isnan(expected):
+        return isinstance(actual, float) and math.isnan(actual)
+    if isinstance(expected, float) or isinstance(actual, float):
+        return math.isclose(expected, actual, rel_tol=rel_tol)
+    return expected == actual
+
+
+def assert_same_results(expected, actual, rel_tol=1e-9):
+    """
+        Verifica che due dizionari con la struttura di Analyzer.analyze abbiano gli stessi gruppi (nello stesso ordine),
+        le stesse statistiche e colonne e gli stessi valori: gli interi devono coincidere, i decimali a meno degli errori
+        di arrotondamento.
+    """
+    assert list(expected) == list(actual)
+    for group, stats in expected.items():
+        if group == 'periodo':
+            assert stats == actual[group]
+            continue
+        assert list(stats) == list(actual[group]), group
+        for label, values in stats.items():
+            assert list(values) == list(actual[group][label]), (group, label)
+            for column, value in values.items():
+                assert _same_value(value, actual[group][label][column], rel_tol), \
+                    (group, label, column, value, actual[group][label][column])
+
+
+@pytest.fixture
+def same_results():
+    return assert_same_results
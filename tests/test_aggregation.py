@@ -0,0 +1,44 @@
+import pytest
+
+from itacovid.aggregation import analysis_columns
+from itacovid.analyzer import Analyzer
+from itacovid.get_dataset import read_covid_dataset_chunks
+from itacovid.province import read_province_dataset_chunks
+from itacovid.subset import subset_by_region, subset_by_period
+
+from conftest import STATISTICS, REGION_FILE_NAME, PROVINCE_FILE_NAME
+
+
+@pytest.mark.parametrize('chunksize', [500, 3000])
+def test_chunks_equal_full_frame(data_dir, region_df, same_results, chunksize):
+    # blocchi compatti (compact=True): ogni blocco ha i propri tipi interi ristretti
+    analyzer = Analyzer()
+    chunks = read_covid_dataset_chunks(data_dir, REGION_FILE_NAME, chunksize=chunksize)
+    same_results(analyzer.analyze(region_df, STATISTICS, use_cache=False), analyzer.analyze(chunks, STATISTICS))
+
+
+def test_province_chunks_equal_full_frame(data_dir, province_df, same_results):
+    analyzer = Analyzer()
+    chunks = read_province_dataset_chunks(data_dir, PROVINCE_FILE_NAME, chunksize=1000)
+    same_results(analyzer.analyze(province_df, STATISTICS, use_cache=False), analyzer.analyze(chunks, STATISTICS))
+
+
+def test_filtered_chunks_equal_filtered_frame(data_dir, region_df, same_results):
+    analyzer = Analyzer()
+    chunks = read_covid_dataset_chunks(data_dir, REGION_FILE_NAME, chunksize=700)
+    chunks = subset_by_period(subset_by_region(chunks, 'Veneto', 'Lazio'), '01/04/2020', '30/09/2020')
+    expected = subset_by_period(subset_by_region(region_df, 'Veneto', 'Lazio'), '01/04/2020', '30/09/2020')
+    same_results(analyzer.analyze(expected, STATISTICS, use_cache=False), analyzer.analyze(chunks, STATISTICS))
+
+
+def test_incremental_equals_full_frame(region_df, same_results):
+    analyzer = Analyzer()
+    partial = None
+    for start in range(0, len(region_df), 900):
+        results, partial = analyzer.analyze_incremental(region_df.iloc[start:start + 900], partial, STATISTICS)
+    same_results(analyzer.analyze(region_df, STATISTICS, use_cache=False), results)
+
+
+def test_province_analysis_columns(province_df):
+    # le colonne derivate non vengono analizzate, come variazione_totale_positivi per le regioni
+    assert analysis_columns(province_df) == ['totale_casi']
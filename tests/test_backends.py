@@ -0,0 +1,97 @@
+import os
+import pandas as pd
+import pytest
+
+from itacovid.analyzer import Analyzer
+from itacovid.backends import AnalyticsBackend, SQLBackend, SQLiteBackend, DuckDBBackend
+from itacovid.preaggregation import period_totals
+from itacovid.resample import resample_totals
+from itacovid.schema import PROVINCE_SCHEMA
+from itacovid.subset import subset_by_region, subset_by_province, subset_by_month, subset_by_period
+
+from conftest import STATISTICS, REGION_FILE_NAME, PROVINCE_FILE_NAME
+
+
+def _duckdb_backend():
+    pytest.importorskip('duckdb')
+    return DuckDBBackend
+
+
+@pytest.fixture(scope='module', params=['sqlite', 'duckdb'])
+def backend_class(request):
+    return SQLiteBackend if request.param == 'sqlite' else _duckdb_backend()
+
+
+@pytest.fixture(scope='module')
+def region_backend(backend_class, data_dir, tmp_path_factory):
+    # chunksize minore del numero di righe: il file viene caricato in più blocchi
+    database = os.path.join(str(tmp_path_factory.mktemp('database')), 'regioni.db')
+    return backend_class.from_csv(database, data_dir, REGION_FILE_NAME, chunksize=1000)
+
+
+@pytest.fixture(scope='module')
+def province_backend(backend_class, data_dir, tmp_path_factory):
+    database = os.path.join(str(tmp_path_factory.mktemp('database')), 'province.db')
+    return backend_class.from_csv(database, data_dir, PROVINCE_FILE_NAME, schema=PROVINCE_SCHEMA, chunksize=1000)
+
+
+SUBSETS = [lambda data: data,
+           lambda data: subset_by_region(data, 'veneto', 'Lazio'),
+           lambda data: subset_by_month(data, 'marzo', 'dicembre'),
+           lambda data: subset_by_period(subset_by_region(data, 'Lombardia'), '15/03/2020', '20/10/2020')]
+
+
+@pytest.mark.parametrize('subset', SUBSETS)
+def test_analyze_equals_pandas(region_df, region_backend, same_results, subset):
+    analyzer = Analyzer()
+    same_results(analyzer.analyze(subset(region_df), STATISTICS, use_cache=False),
+                 analyzer.analyze(subset(region_backend), STATISTICS))
+
+
+@pytest.mark.parametrize('subset', SUBSETS)
+def test_to_frame_equals_pandas(region_df, region_backend, subset):
+    pd.testing.assert_frame_equal(subset(region_df), subset(region_backend).to_frame(), check_index_type=False,
+                                  check_names=False)
+
+
+def test_to_frame_columns(region_df, region_backend):
+    expected = region_df[['data', 'denominazione_regione', 'deceduti']]
+    pd.testing.assert_frame_equal(expected, region_backend.to_frame(['deceduti']), check_index_type=False,
+                                  check_names=False)
+
+
+@pytest.mark.parametrize('freq', ['W', 'M', 'Y'])
+@pytest.mark.parametrize('cumulative', [True, False])
+def test_period_totals_equals_pandas(region_df, region_backend, freq, cumulative):
+    columns = ['deceduti', 'totale_casi']
+    expected = resample_totals(region_df, columns, freq, cumulative)
+    pd.testing.assert_frame_equal(expected, period_totals(region_backend, freq, columns, cumulative),
+                                  check_dtype=False, check_freq=False)
+
+
+def test_provinces_equal_pandas(province_df, province_backend, same_results):
+    analyzer = Analyzer()
+    same_results(analyzer.analyze(province_df, STATISTICS, use_cache=False),
+                 analyzer.analyze(province_backend, STATISTICS))
+    provinces = sorted(province_df['denominazione_provincia'].unique())[:3]
+    same_results(analyzer.analyze(subset_by_province(province_df, *provinces), STATISTICS, use_cache=False),
+                 analyzer.analyze(subset_by_province(province_backend, *provinces), STATISTICS))
+    pd.testing.assert_frame_equal(province_df, province_backend.to_frame(), check_index_type=False, check_names=False)
+
+
+def test_incomplete_backends_cannot_be_instantiated(tmp_path):
+    class NoQueries(AnalyticsBackend):
+        pass
+
+    class NoInsert(SQLBackend):
+        @classmethod
+        def _open(cls, database):
+            return None
+
+        def _connect(self):
+            return None
+
+    with pytest.raises(TypeError):
+        NoQueries()
+    with pytest.raises(TypeError):
+        NoInsert(str(tmp_path / 'vuoto.db'))
@@ -0,0 +1,79 @@
+import pytest
+
+from itacovid.analyzer import Analyzer
+from itacovid.batch import batch_statistics, parallel_batch_statistics, RESULT_COLUMNS
+from itacovid.query import Query
+from itacovid.schema import optimize_dtypes
+
+from conftest import STATISTICS
+
+REGION_SPECS = [{'name': 'tutto'},
+                {'name': 'veneto_lazio', 'regions': ['veneto', 'Lazio']},
+                {'name': 'marzo', 'period': ('01/03/2020', '31/03/2020')},
+                {'name': 'estate', 'months': ['giugno', 'luglio'], 'regions': ['Lombardia']},
+                {'name': 'colonne', 'columns': ['totale_positivi', 'deceduti']}]
+
+
+def nested_results(tidy, name):
+    """
+        Converte le righe di un'interrogazione del dataframe "tidy" nel dizionario di Analyzer.analyze.
+    """
+    rows = tidy[tidy['interrogazione'] == name]
+    results = {}
+    for region, label, column, value in zip(rows['regione'], rows['statistica'], rows['colonna'], rows['valore']):
+        results.setdefault(region, {}).setdefault(label, {})[column] = value
+    results['periodo'] = rows['periodo'].iloc[0]
+    return results
+
+
+def expected_results(df, spec):
+    frame = Query.from_spec(spec, df).execute()
+    results = Analyzer().analyze(frame, STATISTICS, use_cache=False)
+    if spec.get('columns'):
+        results = {group: stats if group == 'periodo' else
+                   {label: {column: values[column] for column in spec['columns']} for label, values in stats.items()}
+                   for group, stats in results.items()}
+    return results
+
+
+def assert_batch_equals_analyze(df, specs, tidy):
+    assert list(tidy.columns) == RESULT_COLUMNS
+    for spec in specs:
+        # nel dataframe "tidy" i valori sono tutti decimali: il confronto è a meno degli errori di arrotondamento
+        expected = expected_results(df, spec)
+        actual = nested_results(tidy, spec['name'])
+        assert list(expected) == list(actual), spec['name']
+        for group, stats in expected.items():
+            if group == 'periodo':
+                assert stats == actual[group]
+                continue
+            assert stats.keys() == actual[group].keys()
+            for label, values in stats.items():
+                assert values == pytest.approx(actual[group][label], rel=1e-9, nan_ok=True), (spec['name'], group, label)
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_batch_equals_analyze(region_df, compact):
+    df = optimize_dtypes(region_df) if compact else region_df
+    assert_batch_equals_analyze(df, REGION_SPECS, batch_statistics(df, REGION_SPECS, STATISTICS))
+
+
+def test_batch_provinces_equals_analyze(province_df):
+    specs = [{'name': 'tutto'}, {'name': 'aprile', 'period': ('01/04/2020', '30/04/2020')}]
+    assert_batch_equals_analyze(province_df, specs, batch_statistics(province_df, specs, STATISTICS))
+
+
+def test_parallel_batch_equals_serial(region_df):
+    serial = batch_statistics(region_df, REGION_SPECS, STATISTICS)
+    parallel = parallel_batch_statistics(region_df, REGION_SPECS, STATISTICS, processes=2)
+    assert serial.equals(parallel)
+
+
+def test_parallel_batch_provinces(province_df):
+    specs = [{'name': 'tutto'}, {'name': 'maggio', 'months': ['maggio']}]
+    assert batch_statistics(province_df, specs).equals(parallel_batch_statistics(province_df, specs, processes=2))
+
+
+def test_parallel_batch_without_specs(region_df):
+    result = parallel_batch_statistics(region_df, [])
+    assert result.empty and list(result.columns) == RESULT_COLUMNS
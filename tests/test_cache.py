@@ -0,0 +1,95 @@
+import os
+import shutil
+import pandas as pd
+import pytest
+
+from itacovid.cache import cache_stats, reset_cache_stats, default_cache_dir, clear_cache
+from itacovid.get_dataset import read_covid_dataset
+
+from conftest import REGION_FILE_NAME
+
+
+@pytest.fixture
+def csv_dir(tmp_path, data_dir):
+    shutil.copy(os.path.join(data_dir, REGION_FILE_NAME), str(tmp_path))
+    reset_cache_stats()
+    return str(tmp_path)
+
+
+def read(directory, **kwargs):
+    return read_covid_dataset(directory, REGION_FILE_NAME, **kwargs)
+
+
+def test_hit_equals_csv(csv_dir, region_df):
+    first = read(csv_dir)
+    assert cache_stats() == {'hits': 0, 'misses': 1, 'writes': 1}
+    second = read(csv_dir)
+    assert cache_stats() == {'hits': 1, 'misses': 1, 'writes': 1}
+    pd.testing.assert_frame_equal(first, region_df)
+    pd.testing.assert_frame_equal(second, region_df)
+    pd.testing.assert_frame_equal(read(csv_dir, columns=['deceduti']), region_df[['data', 'denominazione_regione',
+                                                                                  'deceduti']])
+
+
+def _rewrite(file_path, old, new):
+    with open(file_path) as f_obj:
+        text = f_obj.read()
+    assert old in text
+    with open(file_path, 'w') as f_obj:
+        f_obj.write(text.replace(old, new, 1))
+
+
+def test_size_change_invalidates(csv_dir, region_df):
+    read(csv_dir)
+    file_path = os.path.join(csv_dir, REGION_FILE_NAME)
+    with open(file_path) as f_obj:
+        lines = f_obj.readlines()
+    with open(file_path, 'w') as f_obj:
+        f_obj.writelines(lines[:-1])
+    df = read(csv_dir)
+    assert cache_stats()['misses'] == 2 and len(df) == len(region_df) - 1
+
+
+def test_mtime_change_same_content_is_hit(csv_dir, region_df):
+    read(csv_dir)
+    file_path = os.path.join(csv_dir, REGION_FILE_NAME)
+    stat = os.stat(file_path)
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    pd.testing.assert_frame_equal(read(csv_dir), region_df)
+    assert cache_stats()['hits'] == 1
+    # l'hash coincide: la data di modifica viene aggiornata nei metadati e la lettura successiva non lo ricalcola
+    pd.testing.assert_frame_equal(read(csv_dir), region_df)
+    assert cache_stats()['hits'] == 2
+
+
+def test_content_change_same_size_invalidates(csv_dir, region_df):
+    read(csv_dir)
+    file_path = os.path.join(csv_dir, REGION_FILE_NAME)
+    stat = os.stat(file_path)
+    with open(file_path) as f_obj:
+        last = f_obj.readlines()[-1]
+    # stesso numero di caratteri: cambia solo l'ultima cifra dei test effettuati dell'ultima riga
+    digit = last.rstrip('\n')[-1]
+    _rewrite(file_path, last, last.rstrip('\n')[:-1] + str((int(digit) + 1) % 10) + '\n')
+    assert os.stat(file_path).st_size == stat.st_size
+    df = read(csv_dir)
+    assert cache_stats()['misses'] == 2
+    assert not df.equals(region_df)
+    pd.testing.assert_frame_equal(df, read(csv_dir, use_cache=False))
+
+
+def test_unwritable_cache_dir(csv_dir, region_df):
+    # la cartella della cache non può essere creata (il percorso passa per un file): la lettura deve riuscire comunque
+    blocker = os.path.join(csv_dir, 'file')
+    open(blocker, 'w').close()
+    df = read(csv_dir, cache_dir=os.path.join(blocker, 'cache'))
+    pd.testing.assert_frame_equal(df, region_df)
+    assert cache_stats()['writes'] == 0
+
+
+def test_clear_cache(csv_dir):
+    read(csv_dir)
+    cache_dir = default_cache_dir(csv_dir)
+    assert os.listdir(cache_dir)
+    clear_cache(cache_dir)
+    assert not os.path.exists(cache_dir)
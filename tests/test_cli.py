@@ -0,0 +1,62 @@
+import json
+import os
+import pytest
+
+from itacovid.cli import main, EXIT_OK, EXIT_USAGE, EXIT_INVALID_INPUT, EXIT_IO
+
+from conftest import REGION_FILE_NAME
+
+
+@pytest.fixture
+def dataset_args(data_dir):
+    return ['--path', data_dir, '--name', REGION_FILE_NAME, '--no-cache']
+
+
+@pytest.fixture
+def results_args(tmp_path):
+    return ['--results-path', str(tmp_path), '--results-name', 'risultati.csv']
+
+
+def test_analyze_and_save(tmp_path, dataset_args, results_args):
+    output = str(tmp_path / 'risultati.json')
+    assert main(['analyze'] + dataset_args + results_args +
+                ['--regions', 'Veneto', '--months', 'aprile', '--save', 'aprile', '--output', output]) == EXIT_OK
+    with open(output) as f_obj:
+        results = json.load(f_obj)
+    assert set(results) == {'Veneto', 'periodo'}
+
+    assert main(['results'] + results_args + ['--id', 'aprile', '--output', str(tmp_path / 'letti.csv')]) == EXIT_OK
+    assert os.path.isfile(str(tmp_path / 'letti.csv'))
+
+
+def test_duplicate_save(tmp_path, dataset_args, results_args):
+    args = ['analyze'] + dataset_args + results_args + ['--save', 'doppio', '--output', str(tmp_path / 'r.json')]
+    assert main(args) == EXIT_OK
+    assert main(args) == EXIT_INVALID_INPUT
+
+
+def test_invalid_region(dataset_args, capsys):
+    assert main(['read'] + dataset_args + ['--regions', 'Atlantide']) == EXIT_INVALID_INPUT
+    assert 'RegionError' in capsys.readouterr().err
+
+
+def test_missing_file(tmp_path, capsys):
+    assert main(['read', '--path', str(tmp_path), '--name', 'mancante.csv', '--no-cache']) == EXIT_IO
+    assert 'Errore' in capsys.readouterr().err
+
+
+def test_invalid_arguments():
+    with pytest.raises(SystemExit) as error:
+        main(['analyze', '--period', '01/03/2020'])
+    assert error.value.code == EXIT_USAGE
+
+
+def test_read_with_trace(tmp_path, dataset_args):
+    output, trace = str(tmp_path / 'riepilogo.json'), str(tmp_path / 'trace.json')
+    assert main(['--trace', trace, 'read'] + dataset_args + ['--period', '01/03/2020', '31/03/2020',
+                                                             '--output', output]) == EXIT_OK
+    with open(output) as f_obj:
+        summary = json.load(f_obj)
+    assert summary['data minima'] == '01/03/2020' and summary['data massima'] == '31/03/2020'
+    with open(trace) as f_obj:
+        assert 'read_covid_dataset' in {record['stage'] for record in json.load(f_obj)}
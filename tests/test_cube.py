@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from itacovid.aggregation import analysis_columns
+from itacovid.analyzer import Analyzer
+from itacovid.cube import StatisticsCube
+from itacovid.subset import subset_by_period
+
+from conftest import STATISTICS
+
+
+@pytest.mark.parametrize('period', [('24/02/2020', '24/02/2020'), ('01/03/2020', '31/03/2020'),
+                                    ('15/05/2020', '02/11/2020'), ('24/02/2020', '29/03/2021')])
+def test_window_equals_analyze_subset(region_df, same_results, period):
+    cube = StatisticsCube(region_df)
+    expected = Analyzer().analyze(subset_by_period(region_df, *period), STATISTICS, use_cache=False)
+    same_results(expected, cube.window(*period, statistics=STATISTICS))
+
+
+def test_window_regions(region_df, same_results):
+    cube = StatisticsCube(region_df)
+    period = ('01/04/2020', '30/06/2020')
+    subset = subset_by_period(region_df, *period)
+    expected = Analyzer().analyze(subset[subset['denominazione_regione'].isin(['Veneto', 'Lazio'])], STATISTICS,
+                                  use_cache=False)
+    same_results(expected, cube.window(*period, regions=['lazio', 'Veneto'], statistics=STATISTICS))
+
+
+def _expected_calendar(df, freq):
+    columns = analysis_columns(df)
+    periods = df['data'].dt.to_period(freq).dt.start_time.rename('data')
+    grouped = df[columns].groupby([df['denominazione_regione'], periods], observed=True)
+    return grouped.agg(['max', 'min', 'mean', 'sum', 'count'])
+
+
+@pytest.mark.parametrize('freq', ['W', 'M', 'Y'])
+@pytest.mark.parametrize('n_days', [90, 365])
+def test_calendar_equals_groupby(region_df, freq, n_days):
+    # con meno giorni il primo periodo inizia prima del primo giorno dei dati e l'ultimo è incompleto
+    df = region_df[region_df['data'] < region_df['data'].min() + pd.Timedelta(days=n_days)]
+    result = StatisticsCube(df).calendar(freq, statistics=['max', 'min', 'mean', 'sum', 'count'])
+    expected = _expected_calendar(df, freq)
+    assert len(result) == len(expected)
+
+    expected = expected.sort_index()
+    result = result.copy()
+    result.index = pd.MultiIndex.from_arrays([result.index.get_level_values(0).astype(str),
+                                              result.index.get_level_values(1).normalize()])
+    result = result.sort_index()
+    for name, label in [('max', 'valori massimi'), ('min', 'valori minimi'), ('mean', 'valori medi'),
+                        ('sum', 'somma'), ('count', 'conteggio')]:
+        np.testing.assert_allclose(result[label].to_numpy(dtype=float),
+                                   expected.xs(name, axis=1, level=1)[result[label].columns].to_numpy(dtype=float))
+
+
+def test_rolling_equals_pandas_rolling(region_df):
+    result = StatisticsCube(region_df, columns=['nuovi_positivi']).rolling(7, statistics=['mean', 'max'])
+    for region in ['Abruzzo', 'Veneto']:
+        series = region_df[region_df['denominazione_regione'] == region].set_index('data')['nuovi_positivi']
+        series.index = series.index.normalize()
+        expected = series.rolling('7D')
+        values = result.xs(region, level=0)
+        np.testing.assert_allclose(values['valori medi']['nuovi_positivi'].to_numpy(), expected.mean().to_numpy())
+        np.testing.assert_allclose(values['valori massimi']['nuovi_positivi'].to_numpy(), expected.max().to_numpy())
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+from itacovid.decimation import decimate, DecimationError
+
+
+@pytest.fixture(scope='module')
+def series_df():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(rng.normal(size=(2000, 3)).cumsum(axis=0), index=pd.date_range('2020-02-24', periods=2000),
+                        columns=['totale_positivi', 'dimessi_guariti', 'deceduti'])
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax'])
+@pytest.mark.parametrize('max_points', [12, 30, 50, 301])
+def test_decimate_within_max_points(series_df, method, max_points):
+    decimated = decimate(series_df, max_points, method)
+    assert 0 < len(decimated) <= max_points
+    assert decimated.index.is_monotonic_increasing
+    assert decimated.index[0] == series_df.index[0] and decimated.index[-1] == series_df.index[-1]
+
+
+def test_decimate_short_frame_unchanged(series_df):
+    pd.testing.assert_frame_equal(decimate(series_df.head(40), 50), series_df.head(40))
+
+
+def test_decimate_budget_too_small(series_df):
+    with pytest.raises(DecimationError):
+        decimate(series_df, 8)
+
+
+def test_line_within_max_points(region_df):
+    from itacovid.graphics import Graphics
+    figure = Graphics.line(region_df, max_points=30)
+    assert all(len(line.get_xdata()) <= 30 for line in figure.axes[0].lines)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from itacovid.deltas import daily_variation, growth_rate, rolling_window, WindowError
+
+
+@pytest.fixture(scope='module')
+def shuffled_df(region_df):
+    """
+        Dati non bilanciati e in ordine casuale: oltre ai giorni già mancanti viene eliminato il 20% delle righe, poi le
+        righe vengono mescolate.
+    """
+    rng = np.random.default_rng(3)
+    df = region_df[['data', 'denominazione_regione', 'totale_positivi', 'deceduti']]
+    df = df[rng.random(len(df)) > 0.2]
+    df = df.iloc[rng.permutation(len(df))].copy()
+    df['deceduti'] = df['deceduti'].astype('float64')
+    df.loc[df.index[rng.random(len(df)) < 0.05], 'deceduti'] = np.nan
+    return df
+
+
+def _previous(df, column):
+    ordered = df.sort_values(['denominazione_regione', 'data'])
+    return ordered.groupby('denominazione_regione', observed=True)[column].shift().reindex(df.index)
+
+
+def test_daily_variation_equals_groupby_diff(shuffled_df):
+    ordered = shuffled_df.sort_values(['denominazione_regione', 'data'])
+    expected = ordered.groupby('denominazione_regione', observed=True)['totale_positivi'].diff().fillna(0)
+    result = daily_variation(shuffled_df, 'totale_positivi')
+    assert result.index.equals(shuffled_df.index)
+    np.testing.assert_array_equal(result.to_numpy(), expected.reindex(shuffled_df.index).to_numpy())
+
+
+def test_growth_rate_equals_groupby_shift(shuffled_df):
+    previous = _previous(shuffled_df, 'totale_positivi').astype('float64')
+    expected = ((shuffled_df['totale_positivi'] - previous) / previous).where(previous != 0)
+    np.testing.assert_allclose(growth_rate(shuffled_df, 'totale_positivi').to_numpy(), expected.to_numpy(),
+                               rtol=1e-12)
+
+
+@pytest.mark.parametrize('column, how', [('totale_positivi', 'sum'), ('totale_positivi', 'mean'),
+                                         ('deceduti', 'mean')])
+@pytest.mark.parametrize('window', [1, 7, 30])
+def test_rolling_window_equals_rolling_days(shuffled_df, column, how, window):
+    ordered = shuffled_df.sort_values(['denominazione_regione', 'data'])
+    rolling = ordered.set_index('data').groupby('denominazione_regione', observed=True)[column] \
+        .rolling(str(window) + 'D')
+    expected = getattr(rolling, how)().to_numpy()
+    result = rolling_window(shuffled_df, column, window=window, how=how).reindex(ordered.index)
+    np.testing.assert_allclose(result.to_numpy(), expected, rtol=1e-9)
+
+
+def test_rolling_window_errors(shuffled_df):
+    with pytest.raises(WindowError):
+        rolling_window(shuffled_df, 'totale_positivi', how='max')
+    with pytest.raises(WindowError):
+        rolling_window(shuffled_df, 'totale_positivi', window=0)
@@ -0,0 +1,97 @@
+import tracemalloc
+import pytest
+
+from itacovid.instrumentation import enable, disable, is_enabled, profile
+
+
+@pytest.fixture(autouse=True)
+def stop_tracing():
+    yield
+    disable()
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def test_disable_stops_tracing_started_by_enable():
+    enable(memory=True)
+    assert is_enabled() and tracemalloc.is_tracing()
+    disable()
+    assert not is_enabled() and not tracemalloc.is_tracing()
+
+
+def test_disable_keeps_tracing_started_by_caller():
+    tracemalloc.start()
+    enable(memory=True)
+    disable()
+    assert not is_enabled() and tracemalloc.is_tracing()
+
+
+def test_profile_inside_enable_keeps_tracing():
+    enable(memory=True)
+    with profile(memory=True) as trace:
+        pass
+    assert is_enabled() and tracemalloc.is_tracing()
+    assert trace.records == []
+    disable()
+    assert not tracemalloc.is_tracing()
+
+
+def _read_and_analyze(data_dir):
+    from conftest import REGION_FILE_NAME
+    from itacovid import read_covid_dataset, Analyzer
+    df = read_covid_dataset(data_dir, REGION_FILE_NAME, use_cache=False)
+    Analyzer().analyze(df, use_cache=False)
+    return df
+
+
+def test_profile_records_stages(data_dir):
+    with profile() as trace:
+        df = _read_and_analyze(data_dir)
+    stages = [(record['stage'], record['parent'], record['depth']) for record in trace.records]
+    # le fasi interne vengono registrate prima di quella che le contiene
+    assert stages == [('parse_csv', 'read_covid_dataset', 1), ('clean_columns', 'read_covid_dataset', 1),
+                      ('derived_columns', 'read_covid_dataset', 1), ('optimize_dtypes', 'read_covid_dataset', 1),
+                      ('read_covid_dataset', None, 0), ('aggregation', 'analyze', 1), ('analyze', None, 0)]
+    records = {record['stage']: record for record in trace.records}
+    assert records['parse_csv']['rows_out'] == len(df)
+    assert records['read_covid_dataset']['rows_in'] is None and records['read_covid_dataset']['rows_out'] == len(df)
+    assert records['optimize_dtypes']['rows_in'] == records['optimize_dtypes']['rows_out'] == len(df)
+    assert records['analyze']['rows_in'] == records['aggregation']['rows_in'] == len(df)
+    assert all(record['seconds'] >= 0 and record['error'] is None for record in trace.records)
+    assert all(record['peak_memory_delta'] is None for record in trace.records)
+    assert trace.total('read_covid_dataset') >= trace.total('parse_csv')
+    assert not is_enabled()
+
+
+def test_hooks_receive_records(data_dir):
+    from itacovid.instrumentation import add_hook, remove_hook
+    received, registered = [], []
+    with profile(hooks=[received.append]) as trace:
+        _read_and_analyze(data_dir)
+    assert received == trace.records and len(received) == 7
+
+    add_hook(registered.append)
+    try:
+        enable()
+        _read_and_analyze(data_dir)
+    finally:
+        remove_hook(registered.append)
+    assert [record['stage'] for record in registered] == [record['stage'] for record in received]
+
+
+def test_nothing_recorded_when_disabled(data_dir):
+    from itacovid.instrumentation import add_hook, remove_hook, stage
+    received = []
+    add_hook(received.append)
+    try:
+        _read_and_analyze(data_dir)
+        with stage('manual', rows_in=1) as current:
+            current.rows_out = 1
+    finally:
+        remove_hook(received.append)
+    assert received == [] and not is_enabled()
+
+    with profile() as trace:
+        pass
+    _read_and_analyze(data_dir)
+    assert trace.records == []
@@ -0,0 +1,43 @@
+import subprocess
+import sys
+import pytest
+
+
+def run_python(code):
+    # interprete separato: il test deve partire da un pacchetto non ancora importato
+    return subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+
+
+@pytest.mark.parametrize('name', ['graphics', 'subset', 'get_dataset', 'schema'])
+def test_submodule_attribute_before_import(name):
+    result = run_python('import types, itacovid\n'
+                        'module = itacovid.' + name + '\n'
+                        'assert isinstance(module, types.ModuleType), module\n'
+                        'assert module.__name__ == "itacovid.' + name + '"\n'
+                        'assert itacovid.' + name + ' is module')
+    assert result.returncode == 0, result.stderr
+
+
+def test_shadowed_submodules_keep_public_names():
+    result = run_python('import itacovid, itacovid.analyzer, itacovid.check_csv_extension\n'
+                        'from itacovid.analyzer import Analyzer\n'
+                        'assert isinstance(itacovid.analyzer, Analyzer)\n'
+                        'assert callable(itacovid.check_csv_extension)')
+    assert result.returncode == 0, result.stderr
+
+
+def test_import_does_not_load_heavy_dependencies():
+    result = run_python('import sys, itacovid\n'
+                        'assert "pandas" not in sys.modules and "matplotlib" not in sys.modules')
+    assert result.returncode == 0, result.stderr
+
+
+def test_unknown_attribute():
+    result = run_python('import itacovid\n'
+                        'try:\n'
+                        '    itacovid.non_esiste\n'
+                        'except AttributeError:\n'
+                        '    pass\n'
+                        'else:\n'
+                        '    raise SystemExit(1)')
+    assert result.returncode == 0, result.stderr
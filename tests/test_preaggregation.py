@@ -0,0 +1,52 @@
+import pytest
+
+from itacovid.preaggregation import daily_totals, period_totals, latest_snapshot, clear_aggregation_cache, \
+    aggregation_cache_stats
+from itacovid.resample import resample_totals
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_aggregation_cache()
+    yield
+    clear_aggregation_cache()
+
+
+def test_daily_totals_cached(region_df):
+    expected = region_df.groupby('data')[['deceduti', 'totale_casi']].sum()
+    assert daily_totals(region_df, ['deceduti', 'totale_casi']).equals(expected)
+    assert daily_totals(region_df, ['totale_casi']).equals(expected[['totale_casi']])
+    assert aggregation_cache_stats()['hits'] == 1
+
+
+def test_in_place_edit_invalidates_totals(region_df):
+    df = region_df.copy()
+    before = daily_totals(df, ['deceduti'])
+    snapshot = latest_snapshot(df)
+    monthly = period_totals(df)
+    df.loc[df.index[-1], 'deceduti'] += 1000
+    df.loc[df.index[-1], 'totale_casi'] += 1000
+
+    after = daily_totals(df, ['deceduti'])
+    assert after['deceduti'].iloc[-1] == before['deceduti'].iloc[-1] + 1000
+    assert after.equals(df.groupby('data')[['deceduti']].sum())
+    assert not latest_snapshot(df).equals(snapshot)
+    assert period_totals(df).equals(resample_totals(df, ['deceduti', 'totale_casi'], 'M', True))
+    assert not period_totals(df).equals(monthly)
+    assert aggregation_cache_stats()['hits'] == 1
+
+
+def test_renamed_categories_invalidate_totals(region_df):
+    # stessi codici, categorie diverse: la voce calcolata prima della modifica non può essere restituita
+    df = region_df.copy()
+    before = latest_snapshot(df)
+    daily_totals(df, ['deceduti'])
+    regions = df['denominazione_regione'].cat.categories
+    df['denominazione_regione'] = df['denominazione_regione'].cat.rename_categories(['Regione ' + r for r in regions])
+
+    after = latest_snapshot(df)
+    assert list(after.index) == ['Regione ' + region for region in before.index]
+    assert after.to_numpy().tolist() == before.to_numpy().tolist()
+    assert aggregation_cache_stats()['hits'] == 0
+    daily_totals(df, ['deceduti'])
+    assert aggregation_cache_stats()['hits'] == 0
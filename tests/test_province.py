@@ -0,0 +1,38 @@
+import numpy as np
+
+from itacovid.province import rollup_provinces
+
+KEYS = ['data', 'denominazione_regione']
+
+
+def _gapped(province_df):
+    # mancano alcune province in alcuni giorni e tutte le province di una regione in un giorno
+    rng = np.random.default_rng(3)
+    gapped = province_df[rng.random(len(province_df)) > 0.1]
+    region, day = gapped['denominazione_regione'].iloc[0], gapped['data'].unique()[10]
+    return gapped[~((gapped['denominazione_regione'] == region) & (gapped['data'] == day))]
+
+
+def test_rollup_matches_groupby(province_df):
+    gapped = _gapped(province_df)
+    totals = rollup_provinces(gapped, ['totale_casi'])
+    expected = gapped.groupby(KEYS, observed=True)['totale_casi'].sum()
+    actual = totals.set_index(KEYS)['totale_casi']
+    assert len(actual) == len(expected) and actual.index.is_unique
+    assert actual.reindex(expected.index).tolist() == expected.tolist()
+    assert totals['data'].is_monotonic_increasing
+
+
+def test_variation_recomputed_on_regional_totals(province_df):
+    gapped = _gapped(province_df)
+    totals = rollup_provinces(gapped, ['totale_casi', 'variazione_totale_casi'])
+    assert 'variazione_totale_casi' in totals.columns
+
+    regional = gapped.groupby(KEYS, observed=True)['totale_casi'].sum().sort_index()
+    expected = regional.groupby(level=1, observed=True).diff().fillna(0)
+    actual = totals.set_index(KEYS)['variazione_totale_casi'].reindex(expected.index)
+    assert actual.tolist() == expected.astype(actual.dtype).tolist()
+
+    # la somma delle variazioni delle province non è la variazione della regione quando mancano delle province
+    summed = gapped.groupby(KEYS, observed=True)['variazione_totale_casi'].sum().reindex(expected.index)
+    assert (summed != actual).any()
@@ -0,0 +1,62 @@
+import os
+import pytest
+
+from itacovid.query import Query
+from itacovid.report import render_report, ChartError
+
+NORD = {'regions': ['Veneto', 'Lombardia', 'Piemonte'], 'period': ('01/03/2020', '31/05/2020'), 'name': 'nord'}
+JOBS = [('line', NORD), ('barh', NORD), ('bar', None), ('line_nuovi_positivi', {'months': ['aprile']}),
+        ('line', Query().months('aprile'))]
+FILE_NAMES = [['line_nord.png', 'line_nord.svg'], ['barh_nord.png', 'barh_nord.svg'], ['bar_tutto.png', 'bar_tutto.svg'],
+              ['line_nuovi_positivi_mesi_aprile.png', 'line_nuovi_positivi_mesi_aprile.svg'],
+              ['line_mesi_aprile.png', 'line_mesi_aprile.svg']]
+
+
+@pytest.fixture(scope='module')
+def df(region_df):
+    return region_df[region_df['data'] < '2020-07-01']
+
+
+def _names(paths):
+    return [[os.path.basename(file_path) for file_path in files] for files in paths]
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_render_report(df, tmp_path, processes):
+    import matplotlib.pyplot as plt
+    previous = plt.get_backend()
+    paths = render_report(df, JOBS, str(tmp_path), formats=('png', 'svg'), processes=processes)
+    assert _names(paths) == FILE_NAMES
+    assert all(os.path.getsize(file_path) > 0 for files in paths for file_path in files)
+    assert sorted(os.listdir(str(tmp_path))) == sorted(name for names in FILE_NAMES for name in names)
+    assert plt.get_backend() == previous
+
+
+def test_parallel_equals_serial(df, tmp_path):
+    serial = render_report(df, JOBS, str(tmp_path / 'serie'), processes=1)
+    parallel = render_report(df, JOBS, str(tmp_path / 'parallelo'), processes=2)
+    for serial_files, parallel_files in zip(serial, parallel):
+        for serial_file, parallel_file in zip(serial_files, parallel_files):
+            with open(serial_file, 'rb') as first, open(parallel_file, 'rb') as second:
+                assert first.read() == second.read(), serial_file
+
+
+def test_same_filters_share_files(df, tmp_path):
+    # stessi filtri (dizionario e Query equivalenti): un solo sottoinsieme e un solo file per grafico
+    paths = render_report(df, [('line', {'regions': ['veneto']}), ('line', Query().regions('Veneto'))], str(tmp_path),
+                          processes=1)
+    assert paths[0] == paths[1]
+    assert os.listdir(str(tmp_path)) == [os.path.basename(paths[0][0])]
+
+
+def test_name_with_different_filters(df, tmp_path):
+    jobs = [('line', {'regions': ['Veneto'], 'name': 'report'}), ('bar', {'regions': ['Lazio'], 'name': 'report'})]
+    with pytest.raises(ChartError):
+        render_report(df, jobs, str(tmp_path), processes=1)
+
+
+def test_invalid_chart_and_format(df, tmp_path):
+    with pytest.raises(ChartError):
+        render_report(df, [('istogramma', None)], str(tmp_path), processes=1)
+    with pytest.raises(ChartError):
+        render_report(df, [('line', None)], str(tmp_path), formats=('jpg',), processes=1)
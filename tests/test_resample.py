@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+
+from itacovid.resample import resample_totals, period_labels, FrequencyError
+
+COLUMNS = ['deceduti', 'totale_casi']
+
+
+def test_same_month_of_different_years_is_separate(region_df):
+    totals = resample_totals(region_df, COLUMNS, 'M')
+    assert pd.Period('2020-03', 'M') in totals.index and pd.Period('2021-03', 'M') in totals.index
+    assert totals.index.is_unique and totals.index.is_monotonic_increasing
+
+    # calcolo esplicito per (anno, mese): massimo di ogni regione, somma delle regioni, differenza con il mese precedente
+    year_month = [region_df['data'].dt.year, region_df['data'].dt.month]
+    maxima = region_df.groupby(year_month + [region_df['denominazione_regione']], observed=True)[COLUMNS].max()
+    expected = maxima.groupby(level=[0, 1]).sum()
+    expected = expected - expected.shift(fill_value=0)
+    assert totals.to_numpy().tolist() == expected.to_numpy().tolist()
+    assert [(period.year, period.month) for period in totals.index] == list(expected.index)
+
+
+def test_daily_columns_are_summed(region_df):
+    totals = resample_totals(region_df, ['nuovi_positivi'], 'M', cumulative=False)
+    expected = region_df.groupby([region_df['data'].dt.year, region_df['data'].dt.month])['nuovi_positivi'].sum()
+    assert totals['nuovi_positivi'].tolist() == expected.tolist()
+    assert totals.loc[pd.Period('2020-03', 'M'), 'nuovi_positivi'] != totals.loc[pd.Period('2021-03', 'M'),
+                                                                                  'nuovi_positivi']
+
+
+@pytest.mark.parametrize('freq', ['W', 'M', 'Y'])
+def test_cumulative_totals_add_up(region_df, freq):
+    # la somma dei valori dei periodi è il totale dell'ultimo periodo di ogni regione
+    totals = resample_totals(region_df, COLUMNS, freq)
+    periods = region_df['data'].dt.to_period(freq)
+    last = region_df[periods == periods.max()].groupby('denominazione_regione', observed=True)[COLUMNS].max().sum()
+    assert totals.sum().tolist() == last.tolist()
+
+
+def test_labels_and_errors(region_df):
+    totals = resample_totals(region_df, COLUMNS, 'Y')
+    assert list(period_labels(totals.index, 'Y')) == ['2020', '2021']
+    assert list(period_labels(resample_totals(region_df, COLUMNS, 'M').index, 'M'))[:2] == ['02/2020', '03/2020']
+    with pytest.raises(FrequencyError):
+        resample_totals(region_df, COLUMNS, 'D')
@@ -0,0 +1,99 @@
+import os
+import pytest
+
+from benchmarks.synthetic import write_region_csv
+from itacovid.analyzer import Analyzer
+from itacovid.get_dataset import read_covid_dataset
+from itacovid.result_cache import analyze_cache_stats, clear_analyze_cache, set_analyze_cache
+from itacovid.subset import subset_by_region
+
+from conftest import STATISTICS, REGION_FILE_NAME
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_analyze_cache(disk=True)
+    yield
+    clear_analyze_cache(disk=True)
+    set_analyze_cache()
+
+
+def test_cached_equals_uncached(region_df, same_results):
+    analyzer = Analyzer()
+    expected = analyzer.analyze(region_df, STATISTICS, use_cache=False)
+    same_results(expected, analyzer.analyze(region_df, STATISTICS))
+    cached = analyzer.analyze(region_df, STATISTICS)
+    same_results(expected, cached)
+    assert analyze_cache_stats()['memory_hits'] == 1 and analyze_cache_stats()['misses'] == 1
+
+    # i risultati restituiti sono copie: modificarli non altera la cache
+    cached['Veneto']['valori massimi']['deceduti'] = -1
+    same_results(expected, analyzer.analyze(region_df, STATISTICS))
+
+
+def test_same_content_shares_entry(region_df, same_results):
+    analyzer = Analyzer()
+    expected = analyzer.analyze(subset_by_region(region_df, 'Veneto'), STATISTICS)
+    same_results(expected, analyzer.analyze(subset_by_region(region_df, 'veneto'), STATISTICS))
+    assert analyze_cache_stats()['hits'] == 1
+
+
+def test_in_place_edit_invalidates(region_df, same_results):
+    analyzer = Analyzer()
+    df = region_df.copy()
+    before = analyzer.analyze(df, STATISTICS)
+    df.loc[df.index[-1], 'deceduti'] += 1000
+    after = analyzer.analyze(df, STATISTICS)
+    assert after != before
+    same_results(analyzer.analyze(df, STATISTICS, use_cache=False), after)
+    assert analyze_cache_stats()['misses'] == 2
+
+
+def test_disk_tier_equals_uncached(tmp_path, region_df, same_results):
+    set_analyze_cache(directory=str(tmp_path / 'risultati'))
+    analyzer = Analyzer()
+    expected = analyzer.analyze(region_df, STATISTICS, use_cache=False)
+    analyzer.analyze(region_df, STATISTICS)
+    clear_analyze_cache()
+    same_results(expected, analyzer.analyze(region_df, STATISTICS))
+    stats = analyze_cache_stats()
+    assert stats['disk_hits'] == 1 and stats['disk_size'] == 1
+
+
+def test_file_change_invalidates(tmp_path, same_results):
+    analyzer = Analyzer()
+    file_path = os.path.join(str(tmp_path), REGION_FILE_NAME)
+    write_region_csv(file_path, n_regions=5, n_days=60, seed=1)
+    before = analyzer.analyze(read_covid_dataset(str(tmp_path), REGION_FILE_NAME, use_cache=False), STATISTICS)
+    write_region_csv(file_path, n_regions=5, n_days=60, seed=2)
+    df = read_covid_dataset(str(tmp_path), REGION_FILE_NAME, use_cache=False)
+    after = analyzer.analyze(df, STATISTICS)
+    assert after != before
+    same_results(analyzer.analyze(df, STATISTICS, use_cache=False), after)
+    assert analyze_cache_stats()['hits'] == 0
+
+
+def test_size_limits(region_df):
+    set_analyze_cache(maxsize=2)
+    analyzer = Analyzer()
+    for region in ['Veneto', 'Lazio', 'Lombardia']:
+        analyzer.analyze(subset_by_region(region_df, region), STATISTICS)
+    assert analyze_cache_stats()['size'] == 2
+    set_analyze_cache(maxsize=0)
+    analyzer.analyze(region_df, STATISTICS)
+    assert analyze_cache_stats()['size'] == 0
+
+
+def test_renamed_categories_do_not_share_entry(region_df, same_results):
+    # stessi codici, categorie diverse: le regioni sono diverse e i risultati non possono essere condivisi
+    analyzer = Analyzer()
+    a = region_df[region_df['denominazione_regione'].isin(['Lazio', 'Veneto'])].copy()
+    a['denominazione_regione'] = a['denominazione_regione'].cat.remove_unused_categories()
+    b = a.copy()
+    b['denominazione_regione'] = b['denominazione_regione'].cat.rename_categories(['Puglia', 'Sicilia'])
+    assert (a['denominazione_regione'].cat.codes == b['denominazione_regione'].cat.codes).all()
+
+    assert set(analyzer.analyze(a, STATISTICS)) == {'Lazio', 'Veneto', 'periodo'}
+    results = analyzer.analyze(b, STATISTICS)
+    assert set(results) == {'Puglia', 'Sicilia', 'periodo'}
+    same_results(analyzer.analyze(b, STATISTICS, use_cache=False), results)
@@ -0,0 +1,152 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+from itacovid.analyzer import Analyzer
+from itacovid.batch import batch_statistics
+from itacovid.results_store import ResultsStore, DuplicatedStringError, results_frame
+from itacovid.subset import subset_by_period
+
+from conftest import STATISTICS
+
+
+def legacy_frame(dictionary, unique_identification):
+    """
+        Dataframe scritto nel file csv dalle versioni precedenti di Analyzer.save_results.
+    """
+    dictionary = dict(dictionary)
+    period = dictionary.pop('periodo')
+    df = pd.DataFrame(dictionary).T.stack().apply(pd.Series).unstack(level=-1)
+    df = df.reindex(df.index.set_names('regioni'))
+    return df.assign(periodo=period, unique_identification=unique_identification) \
+        .set_index(['periodo', 'unique_identification'], append=True).swaplevel(0, 2)
+
+
+@pytest.fixture
+def results(region_df):
+    return Analyzer().analyze(subset_by_period(region_df, '01/03/2020', '31/05/2020'), STATISTICS, use_cache=False)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultsStore(os.path.join(str(tmp_path), 'risultati.sqlite'))
+
+
+def assert_same_frame(expected, actual):
+    assert list(expected.index) == list(actual.index)
+    assert list(expected.columns) == list(actual.columns)
+    np.testing.assert_allclose(expected.to_numpy(dtype=float), actual.to_numpy(dtype=float), rtol=1e-12)
+
+
+def test_load_equals_legacy_csv_layout(store, results):
+    store.save(results, 'marzo-maggio')
+    assert_same_frame(legacy_frame(results, 'marzo-maggio'), store.load())
+
+
+def test_import_csv(tmp_path, store, results):
+    csv_path = os.path.join(str(tmp_path), 'risultati.csv')
+    legacy_frame(results, 'legacy').to_csv(csv_path)
+    store.import_csv(csv_path)
+    assert_same_frame(pd.read_csv(csv_path, index_col=[0, 1, 2], header=[0, 1]), store.load())
+
+
+def test_save_batch_equals_save_many(tmp_path, region_df):
+    specs = [{'name': 'marzo', 'period': ('01/03/2020', '31/03/2020')},
+             {'name': 'nord', 'regions': ['Veneto', 'Lombardia', 'Piemonte']}]
+    batch_store = ResultsStore(os.path.join(str(tmp_path), 'batch.sqlite'))
+    batch_store.save_batch(batch_statistics(region_df, specs, STATISTICS))
+
+    analyzer = Analyzer()
+    many_store = ResultsStore(os.path.join(str(tmp_path), 'many.sqlite'))
+    many_store.save_many([('marzo', analyzer.analyze(subset_by_period(region_df, '01/03/2020', '31/03/2020'),
+                                                     STATISTICS, use_cache=False)),
+                          ('nord', analyzer.analyze(region_df[region_df['denominazione_regione'].isin(
+                              ['Veneto', 'Lombardia', 'Piemonte'])], STATISTICS, use_cache=False))])
+    assert_same_frame(many_store.load(), batch_store.load())
+
+
+def test_load_filters(store, results):
+    store.save(results, 'primo')
+    store.save(results, 'secondo')
+    loaded = store.load(unique_identification='secondo', regions=['Veneto'])
+    assert list(loaded.index) == [('secondo', results['periodo'], 'Veneto')]
+    assert 'primo' in store and 'terzo' not in store
+
+
+def test_save_does_not_modify_input(store, results):
+    expected = {group: stats if group == 'periodo' else
+                {label: dict(values) for label, values in stats.items()} for group, stats in results.items()}
+    store.save(results, 'marzo-maggio')
+    assert results == expected
+
+
+def test_save_many_equals_single_saves(tmp_path, region_df):
+    analyzer = Analyzer()
+    items = [(str(month), analyzer.analyze(region_df[region_df['data'].dt.month == month], STATISTICS,
+                                           use_cache=False)) for month in (3, 4, 5)]
+    single = ResultsStore(os.path.join(str(tmp_path), 'singoli.sqlite'))
+    for unique_identification, dictionary in items:
+        single.save(dictionary, unique_identification)
+    many = ResultsStore(os.path.join(str(tmp_path), 'insieme.sqlite'))
+    many.save_many(dict(items))
+    assert_same_frame(single.load(), many.load())
+
+
+def test_save_many_duplicate_saves_nothing(store, results):
+    store.save(results, 'primo')
+    with pytest.raises(DuplicatedStringError):
+        store.save_many([('secondo', results), ('primo', results)])
+    assert 'secondo' not in store
+    assert list(store.load().index.get_level_values(0).unique()) == ['primo']
+
+
+def test_results_frame_equals_long_rows(results):
+    frame = results_frame(results)
+    cells = {(region, column, statistic): value for region, column, statistic, value in ResultsStore._long_rows(results)}
+    assert frame.size == len(cells)
+    for (region, column, statistic), value in cells.items():
+        assert frame.loc[region, (column, statistic)] == pytest.approx(value, rel=1e-12, nan_ok=True)
+    assert sorted(ResultsStore._frame_rows(frame), key=repr) == sorted(ResultsStore._long_rows(results), key=repr)
+
+
+def test_results_frame_layout(store, results):
+    store.save(results, 'marzo-maggio')
+    assert_same_frame(store.load().droplevel([0, 1]), results_frame(results))
+    legacy = legacy_frame(results, 'marzo-maggio').droplevel([0, 1])
+    assert_same_frame(legacy, results_frame(results))
+
+
+def test_integers_stay_integers(store, results):
+    store.save(results, 'marzo-maggio')
+    loaded = store.load()
+    assert list(loaded.dtypes) == list(results_frame(results).dtypes)
+    assert loaded[('deceduti', 'valori massimi')].dtype == np.int64
+    assert loaded[('deceduti', 'valori medi')].dtype == np.float64
+    assert loaded.loc[('marzo-maggio', results['periodo'], 'Veneto'), ('deceduti', 'valori massimi')] == \
+        results['Veneto']['valori massimi']['deceduti']
+
+
+def test_missing_database_is_not_created(tmp_path, store):
+    analyzer = Analyzer(str(tmp_path), 'risultati.csv')
+    assert analyzer.load_results().empty and store.load().empty
+    assert 'primo' not in store
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_analyzer_reuses_store(tmp_path, results):
+    analyzer = Analyzer(str(tmp_path), 'risultati.csv')
+    store = analyzer.results_store
+    assert analyzer.results_store is store
+    analyzer.save_results(results, 'primo')
+    assert analyzer.results_store is store and 'primo' in store
+    analyzer.name_to_results = 'altri_risultati.csv'
+    assert analyzer.results_store is not store and analyzer.load_results().empty
+
+
+def test_import_csv_keeps_integers(tmp_path, store, results):
+    csv_path = os.path.join(str(tmp_path), 'risultati.csv')
+    results_frame(results).assign(periodo=results['periodo'], unique_identification='legacy') \
+        .set_index(['periodo', 'unique_identification'], append=True).swaplevel(0, 2).to_csv(csv_path)
+    store.import_csv(csv_path)
+    assert list(store.load().dtypes) == list(pd.read_csv(csv_path, index_col=[0, 1, 2], header=[0, 1]).dtypes)
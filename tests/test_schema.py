@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+from itacovid.get_dataset import read_covid_dataset, read_covid_dataset_chunks
+from itacovid.province import read_province_dataset, read_province_dataset_chunks
+from itacovid.schema import REGION_SCHEMA, expand_dtypes, optimize_dtypes, memory_usage, memory_report
+
+from conftest import REGION_FILE_NAME, PROVINCE_FILE_NAME
+
+
+def test_compact_dtypes(region_df):
+    assert isinstance(region_df['denominazione_regione'].dtype, pd.CategoricalDtype)
+    assert region_df['data'].dtype == 'datetime64[ns]'
+    for column in REGION_SCHEMA.numeric_columns:
+        assert region_df[column].dtype.itemsize < 8 or region_df[column].dtype.kind == 'f', column
+
+
+def test_compact_equals_classic_read(data_dir, region_df):
+    classic = read_covid_dataset(data_dir, REGION_FILE_NAME, use_cache=False, compact=False)
+    assert (classic.dtypes[REGION_SCHEMA.numeric_columns] != object).all()
+    pd.testing.assert_frame_equal(classic, expand_dtypes(region_df))
+    pd.testing.assert_frame_equal(optimize_dtypes(classic), region_df)
+    assert memory_usage(region_df) < memory_usage(classic)
+    # confronto per colonna: memory_usage dell'indice dipende anche dalle strutture di ricerca già create da pandas
+    report = memory_report(classic).drop('totale')
+    assert report['byte_dopo'].equals(region_df.memory_usage(index=False, deep=True))
+
+
+@pytest.mark.parametrize('chunksize', [500, 3000])
+def test_chunks_equal_full_read(data_dir, region_df, chunksize):
+    # ogni blocco ha i propri tipi compatti (e le proprie categorie): il confronto è sui tipi classici
+    chunks = list(read_covid_dataset_chunks(data_dir, REGION_FILE_NAME, chunksize=chunksize))
+    assert len(chunks) > 1
+    pd.testing.assert_frame_equal(expand_dtypes(pd.concat(chunks)), expand_dtypes(region_df))
+
+
+def test_province_chunks_equal_full_read(data_dir, province_df):
+    chunks = list(read_province_dataset_chunks(data_dir, PROVINCE_FILE_NAME, chunksize=1000))
+    assert len(chunks) > 1
+    pd.testing.assert_frame_equal(expand_dtypes(pd.concat(chunks)), expand_dtypes(province_df))
+    pd.testing.assert_frame_equal(read_province_dataset(data_dir, PROVINCE_FILE_NAME, use_cache=False, compact=False),
+                                  expand_dtypes(province_df))
+
+
+@pytest.mark.parametrize('columns', [['deceduti'], ['totale_casi', 'variazione_totale_positivi']])
+def test_columns_equal_full_read(data_dir, region_df, columns):
+    selected = read_covid_dataset(data_dir, REGION_FILE_NAME, use_cache=False, columns=columns)
+    expected = region_df[REGION_SCHEMA.key_columns + columns]
+    pd.testing.assert_frame_equal(expand_dtypes(selected), expand_dtypes(expected))
@@ -0,0 +1,73 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+from itacovid.analyzer import Analyzer
+from itacovid.snapshot import write_snapshot, open_snapshot, read_manifest, SnapshotError, MANIFEST_NAME
+
+from conftest import STATISTICS
+
+
+def _mapped_array(series):
+    values = series.cat.codes.to_numpy() if isinstance(series.dtype, pd.CategoricalDtype) else series.to_numpy()
+    base = values
+    while base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    return values, base
+
+
+@pytest.mark.parametrize('frame', ['region_df', 'province_df'])
+def test_round_trip(tmp_path, request, frame):
+    df = request.getfixturevalue(frame)
+    snapshot = open_snapshot(write_snapshot(df, str(tmp_path / 'snapshot')))
+    pd.testing.assert_frame_equal(snapshot, df)
+
+
+def test_columns_are_read_only_memmaps(tmp_path, region_df):
+    snapshot = open_snapshot(write_snapshot(region_df, str(tmp_path / 'snapshot')))
+    for column in snapshot.columns:
+        values, base = _mapped_array(snapshot[column])
+        assert isinstance(base, np.memmap), column
+        assert not values.flags.writeable, column
+        with pytest.raises(ValueError):
+            values[0] = values[1]
+    assert not snapshot.index.to_numpy().flags.writeable
+
+
+def test_analyze_snapshot(tmp_path, region_df, same_results):
+    snapshot = open_snapshot(write_snapshot(region_df, str(tmp_path / 'snapshot')))
+    analyzer = Analyzer()
+    same_results(analyzer.analyze(region_df, STATISTICS, use_cache=False),
+                 analyzer.analyze(snapshot, STATISTICS, use_cache=False))
+
+
+def test_columns(tmp_path, region_df):
+    directory = write_snapshot(region_df, str(tmp_path / 'snapshot'))
+    pd.testing.assert_frame_equal(open_snapshot(directory, columns=['deceduti']),
+                                  region_df[['data', 'denominazione_regione', 'deceduti']])
+    with pytest.raises(SnapshotError):
+        open_snapshot(directory, columns=['non_esiste'])
+
+
+def test_replace_open_snapshot(tmp_path, region_df):
+    directory = str(tmp_path / 'snapshot')
+    first = open_snapshot(write_snapshot(region_df, directory))
+    write_snapshot(region_df.iloc[:100], directory)
+    # lo snapshot già aperto resta leggibile, quello nuovo contiene i nuovi dati
+    pd.testing.assert_frame_equal(first, region_df)
+    pd.testing.assert_frame_equal(open_snapshot(directory), region_df.iloc[:100])
+    assert sorted(os.listdir(str(tmp_path))) == ['snapshot']
+
+
+def test_version_mismatch(tmp_path, region_df):
+    directory = write_snapshot(region_df, str(tmp_path / 'snapshot'))
+    manifest = read_manifest(directory)
+    manifest['version'] = -1
+    with open(os.path.join(directory, MANIFEST_NAME), 'w') as f_obj:
+        json.dump(manifest, f_obj)
+    with pytest.raises(SnapshotError):
+        open_snapshot(directory)
+    with pytest.raises(FileNotFoundError):
+        open_snapshot(str(tmp_path / 'mancante'))
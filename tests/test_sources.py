@@ -0,0 +1,170 @@
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+from itacovid.fetch import fetch_all
+from itacovid.sources import HttpSource, LocalSource, SourceError
+
+FILE_NAME = 'covid19_italy_region.csv'
+CONTENT = b''.join(b'2020-03-%02dT18:00:00,Veneto,%d\n' % (day % 28 + 1, day) for day in range(5000))
+
+
+def _sha256(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+class MirrorHandler(BaseHTTPRequestHandler):
+    """
+        Mirror HTTP minimo: ETag e If-None-Match, Range e If-Range, errori 500 e risposte interrotte a comando.
+    """
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        if server.failures:
+            server.failures -= 1
+            self.send_error(500)
+            return
+        content = server.files.get(self.path.lstrip('/'))
+        if content is None:
+            self.send_error(404)
+            return
+        etag = '"' + _sha256(content)[:16] + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        start = 0
+        requested = self.headers.get('Range')
+        if requested and self.headers.get('If-Range', etag) == etag:
+            start = int(requested.split('=')[1].rstrip('-'))
+            if start >= len(content):
+                self.send_error(416)
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, len(content) - 1, len(content)))
+        else:
+            self.send_response(200)
+        body = content[start:]
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if server.truncations:
+            # la connessione si interrompe a metà del corpo della risposta
+            server.truncations -= 1
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def mirror(monkeypatch):
+    monkeypatch.setattr('itacovid.sources.time.sleep', lambda seconds: None)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MirrorHandler)
+    server.files = {FILE_NAME: CONTENT}
+    server.requests = []
+    server.failures = server.truncations = 0
+    server.url = 'http://127.0.0.1:%d/' % server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def read(file_path):
+    with open(file_path, 'rb') as f_obj:
+        return f_obj.read()
+
+
+def test_download_and_not_modified(mirror, tmp_path):
+    source = HttpSource(mirror.url, download_dir=str(tmp_path))
+    file_path = source.fetch()
+    assert read(file_path) == CONTENT
+    mtime = os.stat(file_path).st_mtime_ns
+
+    assert source.fetch() == file_path
+    assert mirror.requests[-1]['If-None-Match'].startswith('"')
+    assert os.stat(file_path).st_mtime_ns == mtime
+
+    mirror.files[FILE_NAME] = CONTENT + b'2020-04-01T18:00:00,Veneto,1\n'
+    assert read(source.fetch()) == mirror.files[FILE_NAME]
+
+
+def test_interrupted_download_resumes(mirror, tmp_path):
+    mirror.truncations = 1
+    file_path = HttpSource(mirror.url, download_dir=str(tmp_path), retries=2).fetch()
+    assert read(file_path) == CONTENT
+    assert len(mirror.requests) == 2
+    assert mirror.requests[1]['Range'] == 'bytes=%d-' % (len(CONTENT) // 2)
+    assert 'If-Range' in mirror.requests[1]
+    assert not os.path.exists(file_path + '.part')
+
+
+def test_resume_of_changed_file_restarts(mirror, tmp_path):
+    mirror.truncations = 1
+    with pytest.raises(SourceError):
+        HttpSource(mirror.url, download_dir=str(tmp_path), retries=0).fetch()
+    assert os.path.isfile(os.path.join(str(tmp_path), FILE_NAME + '.part'))
+
+    # il file sul server cambia: If-Range non corrisponde e il server invia di nuovo tutto il file
+    mirror.files[FILE_NAME] = CONTENT.replace(b'Veneto', b'Lazio')
+    file_path = HttpSource(mirror.url, download_dir=str(tmp_path), retries=0).fetch()
+    assert read(file_path) == mirror.files[FILE_NAME]
+
+
+def test_retries(mirror, tmp_path):
+    mirror.failures = 2
+    assert read(HttpSource(mirror.url, download_dir=str(tmp_path), retries=2).fetch()) == CONTENT
+
+    mirror.failures = 5
+    with pytest.raises(SourceError):
+        HttpSource(mirror.url, download_dir=str(tmp_path / 'altro'), retries=1).fetch()
+    assert mirror.failures == 3
+
+
+def test_client_errors_are_not_retried(mirror, tmp_path):
+    with pytest.raises(SourceError):
+        HttpSource(mirror.url + 'non_esiste.csv', download_dir=str(tmp_path), retries=3).fetch()
+    assert len(mirror.requests) == 1
+
+
+def test_checksum(mirror, tmp_path):
+    assert read(HttpSource(mirror.url, download_dir=str(tmp_path), sha256=_sha256(CONTENT)).fetch()) == CONTENT
+
+    # il server pubblica un contenuto diverso da quello atteso: la copia già scaricata non deve essere sostituita
+    mirror.files[FILE_NAME] = b'contenuto corrotto\n'
+    source = HttpSource(mirror.url, download_dir=str(tmp_path), sha256=_sha256(CONTENT))
+    with pytest.raises(SourceError):
+        source.fetch()
+    file_path = os.path.join(str(tmp_path), FILE_NAME)
+    assert read(file_path) == CONTENT
+    assert not os.path.exists(file_path + '.part')
+
+    # il contenuto torna quello atteso: la copia presente risulta aggiornata (304) e supera la verifica
+    mirror.files[FILE_NAME] = CONTENT
+    assert read(source.fetch()) == CONTENT
+
+
+def test_fetch_all_detects_changes(mirror, tmp_path):
+    local_dir = tmp_path / 'mirror'
+    local_dir.mkdir()
+    (local_dir / FILE_NAME).write_bytes(b'locale\n')
+    state_path = str(tmp_path / 'stato.json')
+    requests = [HttpSource(mirror.url, download_dir=str(tmp_path / 'download')), LocalSource(str(local_dir))]
+
+    first = fetch_all(requests, state_path=state_path)
+    assert [result['changed'] for result in first] == [True, True]
+    assert [result['sha256'] for result in first] == [_sha256(CONTENT), _sha256(b'locale\n')]
+    assert [result['changed'] for result in fetch_all(requests, state_path=state_path)] == [False, False]
+
+    mirror.files[FILE_NAME] = CONTENT + b'2020-04-01T18:00:00,Veneto,1\n'
+    third = fetch_all(requests, state_path=state_path)
+    assert [result['changed'] for result in third] == [True, False]
+    assert read(third[0]['path']) == mirror.files[FILE_NAME]
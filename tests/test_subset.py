@@ -0,0 +1,26 @@
+import pytest
+
+from itacovid.subset import subset_by_region, subset_by_province, RegionError, ProvinceError
+
+
+def test_region_error_lists_names(region_df):
+    assert region_df['denominazione_regione'].dtype == 'category'
+    with pytest.raises(RegionError) as error:
+        subset_by_region(region_df, 'Atlantide')
+    message = str(error.value)
+    assert 'Categories' not in message
+    assert message.endswith('\n' + str(region_df['denominazione_regione'].unique().tolist()))
+
+
+def test_province_error_lists_names(province_df):
+    with pytest.raises(ProvinceError) as error:
+        subset_by_province(province_df, 'Atlantide')
+    names = sorted(province_df['denominazione_provincia'].unique().tolist())
+    assert str(error.value).endswith('\n' + str(names))
+
+
+def test_chunks_error_lists_names(region_df):
+    chunks = (region_df.iloc[start:start + 1000] for start in range(0, len(region_df), 1000))
+    with pytest.raises(RegionError) as error:
+        list(subset_by_region(chunks, 'Atlantide'))
+    assert str(error.value).endswith('\n' + str(sorted(region_df['denominazione_regione'].unique().tolist())))
@@ -0,0 +1,68 @@
+import csv
+import os
+import pandas as pd
+import pytest
+
+from itacovid.analyzer import Analyzer
+from itacovid.cache import cache_stats, reset_cache_stats
+from itacovid.get_dataset import read_covid_dataset
+from itacovid.schema import REGION_SCHEMA, expand_dtypes
+from itacovid.sources import LocalSource
+from itacovid.update import update_covid_dataset, last_stored_date
+
+from conftest import STATISTICS, REGION_FILE_NAME
+
+CUTOFF = pd.Timestamp('2020-11-15')
+
+
+@pytest.fixture
+def local_dir(tmp_path, data_dir):
+    """
+        Copia locale "vecchia" del file: solo le righe fino a CUTOFF. La sorgente (data_dir) contiene il file completo.
+    """
+    date_position = REGION_SCHEMA.names.index('data')
+    with open(os.path.join(data_dir, REGION_FILE_NAME), newline='') as f_obj:
+        rows = list(csv.reader(f_obj))
+    directory = tmp_path / 'locale'
+    directory.mkdir()
+    with open(str(directory / REGION_FILE_NAME), 'w', newline='') as f_obj:
+        csv.writer(f_obj, lineterminator='\n').writerows(
+            [rows[0]] + [row for row in rows[1:] if pd.Timestamp(row[date_position]).normalize() <= CUTOFF])
+    return str(directory)
+
+
+@pytest.mark.parametrize('use_cache', [True, False])
+def test_update_equals_full_read(data_dir, local_dir, region_df, use_cache):
+    old = read_covid_dataset(local_dir, REGION_FILE_NAME, use_cache=use_cache)
+    assert last_stored_date(local_dir, REGION_FILE_NAME).normalize() == CUTOFF
+
+    reset_cache_stats()
+    new_rows = update_covid_dataset(LocalSource(data_dir), local_dir, REGION_FILE_NAME, use_cache=use_cache)
+    assert len(old) + len(new_rows) == len(region_df)
+    pd.testing.assert_frame_equal(expand_dtypes(new_rows), expand_dtypes(region_df.iloc[len(old):]))
+
+    # il file aggiornato coincide con quello della sorgente, la cache aggiornata con la sua lettura completa
+    with open(os.path.join(local_dir, REGION_FILE_NAME)) as updated, \
+            open(os.path.join(data_dir, REGION_FILE_NAME)) as source:
+        assert updated.read().splitlines() == source.read().splitlines()
+    pd.testing.assert_frame_equal(read_covid_dataset(local_dir, REGION_FILE_NAME, use_cache=use_cache), region_df)
+    if use_cache:
+        assert cache_stats()['hits'] >= 1 and cache_stats()['writes'] == 1
+
+
+def test_update_without_new_rows(data_dir, local_dir):
+    update_covid_dataset(LocalSource(data_dir), local_dir, REGION_FILE_NAME)
+    assert update_covid_dataset(LocalSource(data_dir), local_dir, REGION_FILE_NAME).empty
+
+
+def test_update_missing_local_file(tmp_path, data_dir, region_df):
+    df = update_covid_dataset(LocalSource(data_dir), str(tmp_path), REGION_FILE_NAME, use_cache=False)
+    pd.testing.assert_frame_equal(df, region_df)
+
+
+def test_analyze_incremental_equals_full_analyze(data_dir, local_dir, region_df, same_results):
+    analyzer = Analyzer()
+    _, partial = analyzer.analyze_incremental(read_covid_dataset(local_dir, REGION_FILE_NAME))
+    new_rows = update_covid_dataset(LocalSource(data_dir), local_dir, REGION_FILE_NAME)
+    results, _ = analyzer.analyze_incremental(new_rows, partial, STATISTICS)
+    same_results(analyzer.analyze(region_df, STATISTICS, use_cache=False), results)